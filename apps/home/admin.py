@@ -6,6 +6,7 @@ from . import models
 class AnswerInline(admin.StackedInline):
     model = models.Answer
     raw_id_fields = ('owner', 'question')
+    readonly_fields = ('likes_count', 'dislikes_count')
 
 
 class AnswerCommentsInline(admin.StackedInline):
@@ -19,8 +20,13 @@ class ReplyInline(admin.StackedInline):
 
 
 class VoteInline(admin.StackedInline):
+    # votes are cast by `toggle_vote`, which keeps the counters and the reputation, the admin only deletes them.
     model = models.Vote
-    raw_id_fields = ('owner', 'answer')
+    readonly_fields = ('owner', 'is_like', 'is_dislike', 'modified')
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(models.Question)
@@ -37,6 +43,7 @@ class AnswerAdmin(admin.ModelAdmin):
     list_display = ('owner', 'short_body', 'question', 'created')
     search_fields = ('owner__username', 'owner__email', 'body')
     raw_id_fields = ('question', 'owner')
+    readonly_fields = ('likes_count', 'dislikes_count')
     inlines = (AnswerCommentsInline, VoteInline)
 
 
@@ -0,0 +1,87 @@
+"""
+Async versions of the read-heavy endpoints of the home app, mounted under `async/` by `core.urls`.
+
+They answer like anonymous requests to `HomeAPI` and `QuestionViewSet.retrieve` do, with the same projections,
+ETags and response cache generations, but read the database through the async ORM and Redis through
+`utils.cache.get_async_redis`. Served by `core.asgi`, a worker keeps serving other requests while one waits,
+and a cache hit or a 304 never leaves the event loop.
+Under WSGI they work too, but every request then runs its own event loop with its own Redis connections.
+"""
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.views.decorators.http import require_safe
+
+from utils.cache import acached_response, aconditional_response, json_response
+from utils.paginators import FeedPagination, acount
+from utils.renderers import FastJSONRenderer
+from .models import Question
+from .projections import QUESTION_FIELDS, aproject_questions, aproject_thread
+from .services import FEED_CACHE, get_thread_cache
+from .views import HomeAPI
+
+renderer = FastJSONRenderer()
+home_api = sync_to_async(HomeAPI.as_view())
+# query parameters of the feed served here, filtered, searched and cursor paginated feeds are left to `HomeAPI`.
+FEED_PARAMS = {FeedPagination.page_query_param, FeedPagination.page_size_query_param}
+
+
+def render(data, status: int = 200):
+    return json_response(renderer.render(data), status=status)
+
+
+def get_page_size(request) -> int:
+    """Same as `FeedPagination.get_page_size`."""
+    try:
+        page_size = int(request.GET[FeedPagination.page_size_query_param])
+    except (KeyError, ValueError):
+        return FeedPagination.page_size
+    if page_size <= 0:
+        return FeedPagination.page_size
+    return min(page_size, FeedPagination.max_page_size)
+
+
+@require_safe
+async def home(request):
+    """Home page, see `HomeAPI`."""
+    if not FEED_PARAMS.issuperset(request.GET):
+        return await home_api(request)
+    build = partial(acached_response, request, FEED_CACHE, partial(get_feed, request))
+    return await aconditional_response(request, FEED_CACHE, build)
+
+
+async def get_feed(request):
+    queryset = Question.objects.values(*QUESTION_FIELDS)
+    paginator = Paginator(queryset, get_page_size(request))
+    # the count is set beforehand, `Paginator` would run it with the sync ORM, from the cache of `HomeAPI` counts.
+    paginator.count = await acount(queryset)
+    number = request.GET.get(FeedPagination.page_query_param, 1)
+    if number in FeedPagination.last_page_strings:
+        number = paginator.num_pages
+    try:
+        number = paginator.validate_number(number)
+    except InvalidPage:
+        return render({'detail': FeedPagination.invalid_page_message}, status=404)
+    bottom = (number - 1) * paginator.per_page
+    rows = [row async for row in queryset[bottom:bottom + paginator.per_page]]
+
+    pagination = FeedPagination()
+    pagination.request, pagination.page = request, Page(rows, number, paginator)
+    return render(pagination.get_paginated_response(await aproject_questions(rows)).data)
+
+
+@require_safe
+async def question_detail(request, pk):
+    """Shows detail of one question object, see `QuestionViewSet.retrieve`."""
+    namespace = get_thread_cache(pk)
+    build = partial(acached_response, request, namespace, partial(get_thread, pk))
+    return await aconditional_response(request, namespace, build)
+
+
+async def get_thread(pk):
+    try:
+        question = await Question.objects.values(*QUESTION_FIELDS).aget(pk=pk)
+    except Question.DoesNotExist:
+        return render({'detail': 'No Question matches the given query.'}, status=404)
+    return render(await aproject_thread(question))
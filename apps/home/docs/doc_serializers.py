@@ -2,7 +2,7 @@ from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
 from apps.home.models import Question, Tag
-from apps.home.serializers import AnswerSerializer
+from apps.home.serializers import AnswerSerializer, SearchResultSerializer
 
 
 class DocQuestionSerializer(serializers.ModelSerializer):
@@ -18,3 +18,28 @@ class DocQuestionSerializer(serializers.ModelSerializer):
     def get_answers(self, obj):
         answers = obj.answers.all()
         return AnswerSerializer(answers, many=True).data
+
+
+class DocSearchPaginationSerializer(serializers.Serializer):
+    current_page = serializers.IntegerField()
+    previous_page = serializers.URLField(allow_null=True)
+    next_page = serializers.URLField(allow_null=True)
+    has_previous = serializers.BooleanField()
+    has_next = serializers.BooleanField()
+
+
+class DocSearchSerializer(serializers.Serializer):
+    pagination = DocSearchPaginationSerializer()
+    data = SearchResultSerializer(many=True)
+
+
+class DocTagTreeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    slug = serializers.SlugField()
+    children = serializers.ListField(child=serializers.DictField())
+
+
+class DocBatchCreatedSerializer(serializers.Serializer):
+    message = serializers.CharField()
+    ids = serializers.ListField(child=serializers.IntegerField())
@@ -0,0 +1,107 @@
+"""
+Streaming export of the forum data for the data warehouse.
+
+Rows are read in (modified, id) order with `.iterator(chunk_size)`, which uses server-side cursors where the
+database has them, and written out one chunk at a time, so memory stays flat no matter how big the tables are.
+Answers are read by `counters_modified` instead, which the vote counters and the acceptance set too: they
+leave `modified` alone, as the answers of a thread are ordered by it.
+An export covers the rows modified after `since` and up to its watermark, EXPORT_WATERMARK_LAG seconds before
+it started: passing the watermark of an export as `since` of the next one exports only what changed in between.
+`modified` is set when a row is written, not when its transaction commits, the lag lets the transactions open
+when an export starts commit before the next one reads past their rows. Updates through `QuerySet.update` set
+`modified`, or `counters_modified`, themselves, `auto_now` only covers `save`.
+Deleted rows are not exported.
+"""
+import csv
+import datetime
+from itertools import islice
+
+import orjson
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Question, Answer, Comment, Vote
+from .projections import format_datetime
+
+# export type: (model, exported fields).
+EXPORTS = {
+    'questions': (Question, ('id', 'owner_id', 'title', 'body', 'created', 'modified')),
+    'answers': (
+        Answer,
+        (
+            'id', 'question_id', 'owner_id', 'accepted', 'likes_count', 'dislikes_count', 'body',
+            'created', 'modified', 'counters_modified',
+        )
+    ),
+    'comments': (Comment, ('id', 'answer_id', 'owner_id', 'body', 'created', 'modified')),
+    'votes': (Vote, ('id', 'answer_id', 'owner_id', 'is_like', 'is_dislike', 'modified')),
+}
+# field the rows of an export type are ordered and filtered by, `modified` by default.
+WATERMARK_FIELDS = {'answers': 'counters_modified'}
+DATETIME_FIELDS = {'created', 'modified', 'counters_modified'}
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def get_watermark():
+    return timezone.now() - datetime.timedelta(seconds=settings.EXPORT_WATERMARK_LAG)
+
+
+def format_watermark(watermark) -> str:
+    # a Z suffix, as a `+` would need escaping in query strings.
+    return watermark.astimezone(datetime.timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def iter_rows(name: str, *, since=None, until=None, chunk_size: int = None):
+    """Yields the rows of an export type as dicts, in (modified, id) order, datetimes formatted like the API."""
+    chunk_size = settings.EXPORT_CHUNK_SIZE if chunk_size is None else chunk_size
+    model, fields = EXPORTS[name]
+    watermark_field = WATERMARK_FIELDS.get(name, 'modified')
+    queryset = model.objects.order_by(watermark_field, 'id')
+    if since is not None:
+        queryset = queryset.filter(**{f'{watermark_field}__gt': since})
+    if until is not None:
+        queryset = queryset.filter(**{f'{watermark_field}__lte': until})
+    for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        row = dict(zip(fields, row))
+        for field in DATETIME_FIELDS.intersection(row):
+            row[field] = format_datetime(row[field])
+        yield row
+
+
+def iter_ndjson(names, *, since=None, until=None, chunk_size: int = None):
+    """Yields chunks of NDJSON lines of the export types `names`, every line carrying its `type`."""
+    chunk_size = settings.EXPORT_CHUNK_SIZE if chunk_size is None else chunk_size
+    for name in names:
+        rows = iter_rows(name, since=since, until=until, chunk_size=chunk_size)
+        while chunk := list(islice(rows, chunk_size)):
+            yield b''.join(orjson.dumps({'type': name, **row}) + b'\n' for row in chunk)
+
+
+class Echo:
+    """File-like object whose `write` returns what it is given, so `csv.writer` can build lines for streaming."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(name: str, *, since=None, until=None, chunk_size: int = None):
+    """Yields chunks of CSV lines of one export type, the header first."""
+    chunk_size = settings.EXPORT_CHUNK_SIZE if chunk_size is None else chunk_size
+    fields = EXPORTS[name][1]
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    rows = iter_rows(name, since=since, until=until, chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield ''.join(writer.writerow(row.values()) for row in chunk)
+
+
+def export(names, *, file_format: str = 'ndjson', since=None, until=None, chunk_size: int = None):
+    """Returns the chunks of an export of `names` in `file_format`, CSV exports take a single type."""
+    if file_format == 'csv':
+        if len(names) != 1:
+            raise ValueError('csv exports take a single type.')
+        return iter_csv(names[0], since=since, until=until, chunk_size=chunk_size)
+    return iter_ndjson(names, since=since, until=until, chunk_size=chunk_size)
@@ -0,0 +1,25 @@
+from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
+
+from .models import Question
+from .search import filter_questions
+from .tags import filter_questions_by_tree
+
+
+class QuestionSearchFilter(SearchFilter):
+    """`?search=` filter for questions, backed by the full-text index instead of `icontains` lookups."""
+
+    def filter_queryset(self, request, queryset, view):
+        return filter_questions(queryset, request.query_params.get(self.search_param, ''))
+
+
+class QuestionFilter(filters.FilterSet):
+    """Exact `tag`, `owner` and `created` filters, plus `tag_tree` for a tag and all of its sub tags."""
+    tag_tree = filters.NumberFilter(method='filter_tag_tree', label='Tag with its sub tags')
+
+    class Meta:
+        model = Question
+        fields = ['tag', 'owner', 'created']
+
+    def filter_tag_tree(self, queryset, name, value):
+        return filter_questions_by_tree(queryset, int(value))
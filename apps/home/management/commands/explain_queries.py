@@ -0,0 +1,130 @@
+import json
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.home.models import Question, Answer, Tag, Vote
+from apps.users.models import User
+
+# the response cache would answer the requests without touching the database.
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def get_requests() -> list:
+    """Requests the hot endpoints make with some of the existing rows, as (url, query params)."""
+    question = Question.objects.order_by('-id').first()
+    tag = Tag.objects.order_by('-id').first()
+    user = User.objects.filter(is_active=True).order_by('-id').first()
+
+    requests = [
+        (reverse('home:home'), {}),
+        (reverse('home:home'), {'page': 2}),
+        (reverse('home:home'), {'pagination': 'cursor'}),
+        (reverse('home:question-list'), {}),
+        (reverse('home:search'), {'q': 'django'}),
+    ]
+    if question is not None:
+        requests += [
+            (reverse('home:home'), {'owner': question.owner_id}),
+            (reverse('home:home'), {'created': question.created.isoformat()}),
+            (reverse('home:question-detail', args=[question.id]), {}),
+        ]
+    if tag is not None:
+        requests += [
+            (reverse('home:home'), {'tag': tag.id}),
+            (reverse('home:home'), {'tag_tree': tag.id}),
+        ]
+    if user is not None:
+        requests.append((reverse('users:user-profile', args=[user.id]), {}))
+    return requests
+
+
+def get_querysets() -> list:
+    """Queries of the write endpoints, which can not be requested without changing data."""
+    answer = Answer.objects.order_by('-id').first()
+    if answer is None:
+        return []
+    return [
+        Answer.objects.filter(question_id=answer.question_id, accepted=True),
+        Vote.objects.filter(owner_id=answer.owner_id, answer_id=answer.id),
+        Vote.objects.filter(answer_id=answer.id, is_like=True),
+    ]
+
+
+def get_table_size(table: str) -> int:
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        else:
+            cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0]
+
+
+def get_sequential_scans(sql: str, params) -> list:
+    """Returns the tables `sql` reads with a sequential scan, according to the query plan of the database."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            nodes, tables = [plan[0]['Plan']], []
+            while nodes:
+                node = nodes.pop()
+                if node['Node Type'] == 'Seq Scan':
+                    tables.append(node['Relation Name'])
+                nodes.extend(node.get('Plans', []))
+            return tables
+
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'query plans are not supported on {connection.vendor}.')
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        # plain `SCAN <table or alias>` steps read the whole table, `USING INDEX` and virtual tables do not.
+        aliases = dict((alias, table) for table, alias in re.findall(r'"(\w+)" (?:AS )?([UTV]\d+)\b', sql))
+        tables = []
+        for *_, detail in cursor.fetchall():
+            match = re.fullmatch(r'SCAN (\w+)', detail)
+            if match:
+                tables.append(aliases.get(match.group(1), match.group(1)))
+        return tables
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs EXPLAIN over the queries of the hot endpoints and '
+        'fails if any of them scans a table bigger than --threshold rows sequentially.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=int, default=1000, help='size in rows from which a scan fails.')
+
+    def handle(self, *args, **options):
+        queries = []
+        client = APIClient()
+        with override_settings(CACHES=NO_CACHE, ALLOWED_HOSTS=['testserver']):
+            for url, params in get_requests():
+                with CaptureQueriesContext(connection) as context:
+                    client.get(url, params)
+                # captured queries come with their parameters already interpolated.
+                queries += [(url, query['sql'], None) for query in context.captured_queries]
+        for queryset in get_querysets():
+            queries.append((queryset.model._meta.label, *queryset.query.sql_with_params()))
+
+        failures = []
+        tables = set(connection.introspection.table_names())
+        for source, sql, params in queries:
+            if not sql.startswith('SELECT'):
+                continue
+            # derived tables (the `subquery` of count queries) are not tables, the steps inside them are listed too.
+            for table in set(get_sequential_scans(sql, params)) & tables:
+                size = get_table_size(table)
+                if size > options['threshold']:
+                    failures.append(f'{source}: sequential scan of {table} ({size} rows)\n  {sql}')
+
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'Explained {len(queries)} queries, no sequential scan.'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from apps.home.export import EXPORTS, FORMATS, export, format_watermark, get_watermark
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports the questions, answers, comments and votes modified after --since as NDJSON or CSV, '
+        'and prints the watermark to pass as --since to the next incremental export.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=['all', *EXPORTS], default='all')
+        parser.add_argument('--format', choices=list(FORMATS), default='ndjson')
+        parser.add_argument('--since', help='ISO 8601 watermark of the previous export.')
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--output', help='file to write to, stdout by default.')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f'invalid --since: {options["since"]}')
+        names = list(EXPORTS) if options['type'] == 'all' else [options['type']]
+        watermark = get_watermark()
+        try:
+            chunks = export(
+                names, file_format=options['format'], since=since, until=watermark, chunk_size=options['chunk_size']
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk.encode() if isinstance(chunk, str) else chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode() if isinstance(chunk, bytes) else chunk, ending='')
+        self.stderr.write(f'watermark: {format_watermark(watermark)}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.home.tags import rebuild_questions_count, rebuild_trending
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the questions count of tags and backfills the trending tags of the window.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counted = rebuild_questions_count()
+        trending = rebuild_trending(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt questions count of {counted} tags, {trending} tags trending.'))
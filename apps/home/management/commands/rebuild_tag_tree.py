@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.home.tags import rebuild_closure
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the closure table of the tag hierarchy from the sub tag links.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = rebuild_closure(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} tag closure rows.'))
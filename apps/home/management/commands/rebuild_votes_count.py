@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.home.services import rebuild_votes_count
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds likes_count and dislikes_count of answers from the Vote table.'
+
+    def handle(self, *args, **options):
+        updated = rebuild_votes_count()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt votes count of {updated} answers.'))
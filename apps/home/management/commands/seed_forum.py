@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.home.seed import ForumSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds the database with a synthetic forum for load tests: users, profiles, tags, questions, answers, '
+        'comments, reply chains and votes, with Zipfian activity. The same --seed gives the same dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=100)
+        parser.add_argument('--questions', type=int, default=5000)
+        parser.add_argument('--answers', type=int, default=15000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--replies', type=int, default=20000)
+        parser.add_argument('--votes', type=int, default=50000)
+        parser.add_argument('--skew', type=float, default=1.1, help='exponent of the Zipf law, 0 for uniform.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed', help='prefix of the usernames, emails and tag names.')
+        parser.add_argument('--max-depth', type=int, default=8, help='maximum depth of the reply chains.')
+        parser.add_argument('--days', type=int, default=365, help='days the posts are spread over.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        seeder = ForumSeeder(
+            users=options['users'], tags=options['tags'], questions=options['questions'], answers=options['answers'],
+            comments=options['comments'], replies=options['replies'], votes=options['votes'], skew=options['skew'],
+            seed=options['seed'], batch_size=options['batch_size'], prefix=options['prefix'],
+            max_depth=options['max_depth'], days=options['days'],
+        )
+        try:
+            written = seeder.run()
+        except ValueError as e:
+            raise CommandError(e)
+        elapsed = time.perf_counter() - start
+        rows = ', '.join(f'{count} {name}' for name, count in written.items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {rows} in {elapsed:.1f}s.'))
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    Vote = apps.get_model('home', 'Vote')
+    duplicates = Vote.objects.values('owner', 'answer').annotate(latest=Max('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        Vote.objects.filter(owner=duplicate['owner'], answer=duplicate['answer']).exclude(id=duplicate['latest']).delete()
+
+
+def fill_votes_count(apps, schema_editor):
+    Answer = apps.get_model('home', 'Answer')
+    Vote = apps.get_model('home', 'Vote')
+
+    def count(condition):
+        votes = Vote.objects.filter(condition, answer=OuterRef('pk')).values('answer').annotate(total=Count('id'))
+        return Coalesce(Subquery(votes.values('total')), 0)
+
+    Answer.objects.update(likes_count=count(Q(is_like=True)), dislikes_count=count(Q(is_dislike=True)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0026_rename_answercomment_comment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='dislikes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.RunPython(fill_votes_count, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('owner', 'answer'), name='unique_vote_owner_answer'),
+        ),
+    ]
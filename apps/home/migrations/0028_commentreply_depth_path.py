@@ -0,0 +1,41 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+def fill_depth_path(apps, schema_editor):
+    CommentReply = apps.get_model('home', 'CommentReply')
+    parents = {reply.id: reply for reply in CommentReply.objects.filter(reply=None).only('id', 'path')}
+    depth = 0
+    while parents:
+        depth += 1
+        ids = list(parents)
+        children = []
+        for i in range(0, len(ids), 1000):
+            children += CommentReply.objects.filter(reply__in=ids[i:i + 1000]).only('id', 'reply_id')
+        for child in children:
+            parent = parents[child.reply_id]
+            child.depth, child.path = depth, f'{parent.path}{parent.id}/'
+        CommentReply.objects.bulk_update(children, ['depth', 'path'], batch_size=1000)
+        parents = {child.id: child for child in children}
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0027_answer_votes_count_vote_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commentreply',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='commentreply',
+            name='path',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_depth_path, migrations.RunPython.noop),
+    ]
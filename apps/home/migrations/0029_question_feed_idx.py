@@ -0,0 +1,19 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0028_commentreply_depth_path'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-modified', '-created', '-id'], name='question_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE home_searchdocument_fts USING fts5(
+        title, body, content='home_searchdocument', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER home_searchdocument_fts_insert AFTER INSERT ON home_searchdocument BEGIN
+        INSERT INTO home_searchdocument_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER home_searchdocument_fts_delete AFTER DELETE ON home_searchdocument BEGIN
+        INSERT INTO home_searchdocument_fts (home_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER home_searchdocument_fts_update AFTER UPDATE ON home_searchdocument BEGIN
+        INSERT INTO home_searchdocument_fts (home_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO home_searchdocument_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+SQLITE_DROP_INDEX = [
+    'DROP TRIGGER IF EXISTS home_searchdocument_fts_insert',
+    'DROP TRIGGER IF EXISTS home_searchdocument_fts_delete',
+    'DROP TRIGGER IF EXISTS home_searchdocument_fts_update',
+    'DROP TABLE IF EXISTS home_searchdocument_fts',
+]
+POSTGRESQL_INDEX = [
+    """
+    ALTER TABLE home_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', body), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX home_searchdocument_search_vector ON home_searchdocument USING GIN (search_vector)',
+]
+POSTGRESQL_DROP_INDEX = [
+    'DROP INDEX IF EXISTS home_searchdocument_search_vector',
+    'ALTER TABLE home_searchdocument DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+
+    return run
+
+
+def get_text(text):
+    # `apps.home.search.get_text` as of this migration: the highlight marks are stripped from the indexed text.
+    return text.translate(str.maketrans('', '', '\ue000\ue001'))
+
+
+def fill_search_documents(apps, schema_editor):
+    Question = apps.get_model('home', 'Question')
+    Answer = apps.get_model('home', 'Answer')
+    SearchDocument = apps.get_model('home', 'SearchDocument')
+    SearchDocument.objects.bulk_create(
+        (
+            SearchDocument(question_id=q.id, title=get_text(q.title), body=get_text(q.body))
+            for q in Question.objects.iterator()
+        ),
+        batch_size=1000,
+    )
+    SearchDocument.objects.bulk_create(
+        (
+            SearchDocument(question_id=a.question_id, answer_id=a.id, body=get_text(a.body))
+            for a in Answer.objects.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0029_question_feed_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.TextField(blank=True)),
+                ('body', models.TextField()),
+                ('answer', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='home.answer')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='home.question')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(condition=models.Q(('answer', None)), fields=('question',), name='unique_question_search_document'),
+        ),
+        migrations.RunPython(
+            run_vendor_sql({'sqlite': SQLITE_INDEX, 'postgresql': POSTGRESQL_INDEX}),
+            run_vendor_sql({'sqlite': SQLITE_DROP_INDEX, 'postgresql': POSTGRESQL_DROP_INDEX}),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.7 on 2026-10-18 13:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def keep_one_accepted_answer(apps, schema_editor):
+    Answer = apps.get_model('home', 'Answer')
+    duplicates = Answer.objects.filter(accepted=True).values('question').annotate(
+        first=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        Answer.objects.filter(question=duplicate['question'], accepted=True).exclude(
+            id=duplicate['first']
+        ).update(accepted=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0030_searchdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_one_accepted_answer, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', '-modified', '-created'], name='answer_question_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['answer', '-modified', '-created'], name='comment_answer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commentreply',
+            index=models.Index(fields=['comment', 'depth', '-modified', '-created'], name='reply_comment_tree_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['owner', '-modified', '-created', '-id'], name='question_owner_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['created'], name='question_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['answer', 'is_like'], name='vote_answer_is_like_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='answer',
+            constraint=models.UniqueConstraint(condition=models.Q(('accepted', True)), fields=('question',), name='unique_accepted_answer'),
+        ),
+    ]
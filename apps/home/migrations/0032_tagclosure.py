@@ -0,0 +1,45 @@
+# Generated by Django 5.0.7 on 2026-10-18 14:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_tag_closure(apps, schema_editor):
+    Tag = apps.get_model('home', 'Tag')
+    TagClosure = apps.get_model('home', 'TagClosure')
+    parents = dict(Tag.objects.values_list('id', 'sub_tag_id'))
+    rows = []
+    for tag_id in parents:
+        ancestor_id, depth, seen = tag_id, 0, set()
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            rows.append(TagClosure(ancestor_id=ancestor_id, descendant_id=tag_id, depth=depth))
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+    TagClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0031_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='home.tag')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='home.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='tag_closure_descendant_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tagclosure',
+            constraint=models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_tag_closure'),
+        ),
+        migrations.RunPython(fill_tag_closure, migrations.RunPython.noop),
+    ]
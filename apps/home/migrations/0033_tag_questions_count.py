@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-18 14:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_questions(apps, schema_editor):
+    Tag = apps.get_model('home', 'Tag')
+    Question = apps.get_model('home', 'Question')
+    counts = Question.tag.through.objects.filter(tag=OuterRef('pk')).values('tag').annotate(total=Count('id'))
+    Tag.objects.update(questions_count=Coalesce(Subquery(counts.values('total')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0032_tagclosure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='questions_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_questions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:25
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_counters_modified(apps, schema_editor):
+    # the column is added with the time of the migration, the rows were last exported by `modified`.
+    Answer = apps.get_model('home', 'Answer')
+    Answer.objects.update(counters_modified=F('modified'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0034_export_watermarks'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='answer',
+            name='answer_modified_idx',
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='counters_modified',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fill_counters_modified, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['counters_modified', 'id'], name='answer_counters_modified_idx'),
+        ),
+    ]
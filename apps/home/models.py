@@ -1,4 +1,5 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.utils.text import slugify
 
 from apps.users.models import User
@@ -15,6 +16,13 @@ class Question(models.Model):
 
     class Meta:
         ordering = ('-modified', '-created')
+        indexes = [
+            models.Index(fields=('-modified', '-created', '-id'), name='question_feed_idx'),
+            models.Index(fields=('owner', '-modified', '-created', '-id'), name='question_owner_feed_idx'),
+            models.Index(fields=('created',), name='question_created_idx'),
+            # incremental exports, see `apps.home.export`.
+            models.Index(fields=('modified', 'id'), name='question_modified_idx'),
+        ]
 
     def __str__(self):
         return f'{self.owner.username} - {self.title[:30]}...'
@@ -42,12 +50,25 @@ class Answer(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='answers')
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='answers')
     accepted = models.BooleanField(default=False)
+    likes_count = models.PositiveIntegerField(default=0)
+    dislikes_count = models.PositiveIntegerField(default=0)
     body = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
     modified = models.DateTimeField(auto_now=True)
+    # also set by the updates of the votes and acceptance, which leave `modified` to the edits, see `.export`.
+    counters_modified = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ('-modified', '-created')
+        indexes = [
+            models.Index(fields=('question', '-modified', '-created'), name='answer_question_idx'),
+            models.Index(fields=('counters_modified', 'id'), name='answer_counters_modified_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=('question',), condition=models.Q(accepted=True), name='unique_accepted_answer'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.owner.username} - {self.body[:20]}... - {self.question.title[:30]}...'
@@ -66,6 +87,10 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-modified', '-created')
+        indexes = [
+            models.Index(fields=('answer', '-modified', '-created'), name='comment_answer_idx'),
+            models.Index(fields=('modified', 'id'), name='comment_modified_idx'),
+        ]
 
     def __str__(self):
         return f'{self.owner.username} - {self.answer.body[:20]}...'
@@ -75,6 +100,8 @@ class CommentReply(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='replies')
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='replies')
     reply = models.ForeignKey('self', on_delete=models.CASCADE, related_name='i_replies', blank=True, null=True)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+    path = models.TextField(default='', blank=True, editable=False)
     body = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
     modified = models.DateTimeField(auto_now=True)
@@ -82,16 +109,39 @@ class CommentReply(models.Model):
     class Meta:
         ordering = ('-modified', '-created')
         verbose_name_plural = 'replies'
+        indexes = [
+            # reply trees are loaded per comment, parents first (see `apps.home.services.get_reply_queryset`).
+            models.Index(fields=('comment', 'depth', '-modified', '-created'), name='reply_comment_tree_idx'),
+        ]
 
     def __str__(self):
         return f'{self.owner.username} - {self.body[:10]}...'
 
+    def save(self, *args, **kwargs):
+        # materialized path: ids of the ancestors, from the root reply down to the parent.
+        if self.reply_id is None:
+            self.depth, self.path = 0, ''
+        else:
+            self.depth, self.path = self.reply.depth + 1, f'{self.reply.path}{self.reply_id}/'
+        return super().save(*args, **kwargs)
+
+    @property
+    def descendants_path(self):
+        return f'{self.path}{self.id}/'
+
 
 class Tag(models.Model):
+    """
+    A tag with `sub_tag` set is a child of that tag.
+    The hierarchy is mirrored in `TagClosure`, which `save` keeps in sync
+    and whose rows are deleted with their tags by the database cascade.
+    """
     sub_tag = models.ForeignKey('self', on_delete=models.CASCADE, blank=True, null=True, related_name='s_tag')
     is_sub = models.BooleanField(default=False)
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=250, unique=True)
+    # kept in sync with `Question.tag` by the signals of `apps.home.signals`.
+    questions_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ('name',)
@@ -99,9 +149,82 @@ class Tag(models.Model):
     def __str__(self):
         return f'{self.name}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # parent the tag was loaded with, unknown when the field is deferred.
+        instance._saved_sub_tag_id = instance.__dict__.get('sub_tag_id', models.DEFERRED)
+        return instance
+
+    def clean(self):
+        if not self._state.adding and self.sub_tag_id is not None and TagClosure.objects.filter(
+            ancestor_id=self.id, descendant_id=self.sub_tag_id
+        ).exists():
+            raise ValidationError({'sub_tag': 'a tag can not be moved under itself or one of its sub tags.'})
+
+    @transaction.atomic
     def save(self, *args, **kwargs):
         self.slug = slugify(self.name)
-        return super().save(*args, **kwargs)
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        moved = not adding and self.sub_tag_id != getattr(self, '_saved_sub_tag_id', models.DEFERRED) and (
+            update_fields is None or 'sub_tag' in update_fields or 'sub_tag_id' in update_fields
+        )
+        if moved:
+            self.clean()
+        result = super().save(*args, **kwargs)
+        if adding:
+            self.link_closure()
+        elif moved:
+            self.move_closure()
+        self._saved_sub_tag_id = self.sub_tag_id
+        return result
+
+    def link_closure(self) -> None:
+        """Adds the closure rows of a new leaf tag: itself and every ancestor of its parent."""
+        ancestors = []
+        if self.sub_tag_id is not None:
+            ancestors = TagClosure.objects.filter(descendant_id=self.sub_tag_id).values_list('ancestor_id', 'depth')
+        TagClosure.objects.bulk_create([
+            TagClosure(ancestor_id=self.id, descendant_id=self.id, depth=0),
+            *(TagClosure(ancestor_id=ancestor_id, descendant_id=self.id, depth=depth + 1)
+              for ancestor_id, depth in ancestors),
+        ])
+
+    def move_closure(self) -> None:
+        """Detaches the subtree of the tag from its old ancestors and links it under the ancestors of its new parent."""
+        subtree = list(TagClosure.objects.filter(ancestor_id=self.id).values_list('descendant_id', 'depth'))
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+        TagClosure.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if self.sub_tag_id is None:
+            return
+        ancestors = TagClosure.objects.filter(descendant_id=self.sub_tag_id).values_list('ancestor_id', 'depth')
+        TagClosure.objects.bulk_create([
+            TagClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+            for ancestor_id, ancestor_depth in ancestors
+            for descendant_id, depth in subtree
+        ])
+
+
+class TagClosure(models.Model):
+    """
+    Closure table of the tag hierarchy: one row for every tag and each of its ancestors,
+    every tag being its own ancestor at depth 0. Subtrees are read with a single join, see `apps.home.tags`.
+    """
+    ancestor = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_tag_closure'),
+        ]
+        indexes = [
+            models.Index(fields=('descendant', 'depth'), name='tag_closure_descendant_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.ancestor_id} > {self.descendant_id} ({self.depth})'
 
 
 class Vote(models.Model):
@@ -109,6 +232,40 @@ class Vote(models.Model):
     answer = models.ForeignKey(Answer, on_delete=models.CASCADE, related_name='votes')
     is_like = models.BooleanField(default=False)
     is_dislike = models.BooleanField(default=False)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('owner', 'answer'), name='unique_vote_owner_answer'),
+        ]
+        indexes = [
+            models.Index(fields=('answer', 'is_like'), name='vote_answer_is_like_idx'),
+            models.Index(fields=('modified', 'id'), name='vote_modified_idx'),
+        ]
 
     def __str__(self):
         return 'Like' if self.is_like else 'Dislike'
+
+
+class SearchDocument(models.Model):
+    """
+    Text of a question or an answer, indexed for full-text search.
+    The index itself lives in the database (an FTS5 table on SQLite, a tsvector column on PostgreSQL),
+    see `apps.home.search`.
+    """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='search_documents')
+    answer = models.OneToOneField(
+        Answer, on_delete=models.CASCADE, related_name='search_document', blank=True, null=True
+    )
+    title = models.TextField(blank=True)
+    body = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('question',), condition=models.Q(answer=None), name='unique_question_search_document'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.question_id} - {self.answer_id}'
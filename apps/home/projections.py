@@ -0,0 +1,162 @@
+"""
+Read path of the hot endpoints that skips model instances and serializer fields.
+
+Rows are loaded with `values()` and turned into the exact dicts the serializers of `apps.home.serializers`
+would return, key order included, so the rendered responses are byte-identical.
+Keep both in sync: `apps/home/tests/test_projections.py` compares their output.
+The `a` prefixed functions run the same queries with the async ORM, for `apps.home.async_views`.
+"""
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .models import Question, Answer, Comment
+from .services import get_reply_queryset
+
+QUESTION_FIELDS = ('id', 'owner__username', 'owner__email', 'title', 'body', 'created', 'modified')
+ANSWER_FIELDS = (
+    'id', 'owner__username', 'owner__email', 'body', 'likes_count', 'dislikes_count', 'created', 'modified'
+)
+COMMENT_FIELDS = ('id', 'answer_id', 'owner__username', 'owner__email', 'body', 'created', 'modified')
+REPLY_FIELDS = ('id', 'comment_id', 'reply_id', 'owner__username', 'owner__email', 'body', 'created', 'modified')
+
+
+def format_datetime(value):
+    """Same output as `rest_framework.fields.DateTimeField` with the default ISO 8601 format."""
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def format_owner(row) -> str:
+    """Same output as `str(User)`."""
+    return f'{row["owner__username"]} - {row["owner__email"]}'
+
+
+def project_question(row, tags) -> dict:
+    return {
+        'id': row['id'],
+        'owner': format_owner(row),
+        'tag': tags,
+        'title': row['title'],
+        'body': row['body'],
+        'created': format_datetime(row['created']),
+        'modified': format_datetime(row['modified']),
+    }
+
+
+def get_tags_queryset(question_ids) -> QuerySet:
+    return Question.tag.through.objects.filter(question_id__in=question_ids).order_by(
+        'tag__name', 'tag_id'
+    ).values_list('question_id', 'tag__name')
+
+
+def format_questions(rows, tag_rows) -> list:
+    tags = {row['id']: [] for row in rows}
+    for question_id, name in tag_rows:
+        tags[question_id].append(name)
+    return [project_question(row, tags[row['id']]) for row in rows]
+
+
+def project_questions(rows) -> list:
+    """Projects `QUESTION_FIELDS` rows like `QuestionSerializer(many=True)`, with one query for all the tags."""
+    return format_questions(rows, get_tags_queryset([row['id'] for row in rows]))
+
+
+async def aproject_questions(rows) -> list:
+    return format_questions(rows, [tag async for tag in get_tags_queryset([row['id'] for row in rows])])
+
+
+def get_thread_querysets(question_id) -> tuple:
+    """The tags, answers, comments and replies of a thread, in the order `format_thread` takes them."""
+    return (
+        get_tags_queryset([question_id]),
+        Answer.objects.filter(question_id=question_id).values(*ANSWER_FIELDS),
+        Comment.objects.filter(answer__question_id=question_id).values(*COMMENT_FIELDS),
+        get_reply_queryset().filter(comment__answer__question_id=question_id).values(*REPLY_FIELDS),
+    )
+
+
+def project_thread(question) -> dict:
+    """
+    Projects a `QUESTION_FIELDS` row like `QuestionViewSet.retrieve`: the question with its answers,
+    their comments and the reply trees, in four more queries.
+    """
+    return format_thread(question, *get_thread_querysets(question['id']))
+
+
+async def aproject_thread(question) -> dict:
+    return format_thread(
+        question, *[[row async for row in queryset] for queryset in get_thread_querysets(question['id'])]
+    )
+
+
+def format_thread(question, tag_rows, answer_rows, comment_rows, reply_rows) -> dict:
+    data = project_question(question, [name for _, name in tag_rows])
+    # `str(Question)`, `str(Answer)` and `str(Comment)` of the nested objects.
+    question_str = f'{question["owner__username"]} - {question["title"][:30]}...'
+
+    answers, answer_strs = {}, {}
+    for row in answer_rows:
+        answers[row['id']] = {
+            'id': row['id'],
+            'owner': format_owner(row),
+            'question': question_str,
+            'comments': [],
+            'likes': row['likes_count'],
+            'dislikes': row['dislikes_count'],
+            'body': row['body'],
+            'created': format_datetime(row['created']),
+            'modified': format_datetime(row['modified']),
+        }
+        answer_strs[row['id']] = f'{row["owner__username"]} - {row["body"][:20]}... - {question["title"][:30]}...'
+
+    comments, comment_strs = {}, {}
+    for row in comment_rows:
+        answer = answers[row['answer_id']]
+        comments[row['id']] = {
+            'id': row['id'],
+            'replies': [],
+            'owner': format_owner(row),
+            'answer': answer_strs[row['answer_id']],
+            'body': row['body'],
+            'created': format_datetime(row['created']),
+            'modified': format_datetime(row['modified']),
+        }
+        comment_strs[row['id']] = f'{row["owner__username"]} - {answer["body"][:20]}...'
+        answer['comments'].append(comments[row['id']])
+
+    attach_reply_rows(comments, comment_strs, reply_rows)
+    data['answers'] = list(answers.values())
+    return data
+
+
+def attach_reply_rows(comments: dict, comment_strs: dict, rows, *, max_children: int = None) -> None:
+    """
+    Projects reply rows like `ReplyCommentSerializer` and nests them under their comment or parent reply,
+    following the same rules as `apps.home.services.attach_replies`.
+    `comment_strs` maps comment ids to their `str()`,
+    `rows` must come parents first as `get_reply_queryset` orders them.
+    """
+    max_children = settings.REPLY_TREE_MAX_CHILDREN if max_children is None else max_children
+    nodes, reply_strs = {}, {}
+    for row in rows:
+        comment = comments.get(row['comment_id'])
+        node = {
+            'id': row['id'],
+            'replies': [],
+            'owner': format_owner(row),
+            'comment': comment_strs.get(row['comment_id']),
+            'reply': reply_strs.get(row['reply_id']),
+            'body': row['body'],
+            'created': format_datetime(row['created']),
+            'modified': format_datetime(row['modified']),
+        }
+        nodes[row['id']] = node
+        reply_strs[row['id']] = f'{row["owner__username"]} - {row["body"][:10]}...'
+        parent = comment if row['reply_id'] is None else nodes.get(row['reply_id'])
+        if parent is not None and len(parent['replies']) < max_children:
+            parent['replies'].append(node)
@@ -0,0 +1,172 @@
+"""
+Full-text search over questions and answers.
+
+Every question and answer has a `SearchDocument` row, kept up to date by the signals in `apps.home.signals`.
+The database indexes these rows by itself: SQLite through an FTS5 table synced by triggers,
+PostgreSQL through a generated tsvector column with a GIN index (see migration 0030).
+The matched words of the results are wrapped in <mark></mark> after the text around them is escaped: the database
+marks them with characters stripped from the indexed text, which are turned into the tags last.
+"""
+import re
+from itertools import chain, islice
+
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import Question, Answer, SearchDocument
+
+# private use characters, see `get_text`.
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_STOP = '\ue001'
+SENTINELS = str.maketrans('', '', HIGHLIGHT_START + HIGHLIGHT_STOP)
+
+
+def get_terms(query: str) -> list:
+    return re.findall(r'\w+', query.lower())
+
+
+def get_text(text: str) -> str:
+    """The indexed text of a title or body, without the characters the highlights are marked with."""
+    return text.translate(SENTINELS)
+
+
+def highlight(text):
+    """Escapes a highlighted title or snippet and turns the marks of the database into <mark></mark>."""
+    if text is None:
+        return None
+    return escape(text).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+
+
+class SQLiteSearchBackend:
+    def match_sql(self, terms):
+        sql = (
+            'SELECT d.question_id FROM home_searchdocument d '
+            'JOIN home_searchdocument_fts f ON f.rowid = d.id '
+            'WHERE home_searchdocument_fts MATCH %s AND d.answer_id IS NULL'
+        )
+        return sql, [self.to_query(terms)]
+
+    def search_sql(self, terms, limit, offset):
+        # titles weigh ten times more than bodies.
+        sql = (
+            'SELECT d.id, d.question_id, d.answer_id, '
+            'highlight(home_searchdocument_fts, 0, %s, %s), '
+            "snippet(home_searchdocument_fts, 1, %s, %s, '...', 32), "
+            '-bm25(home_searchdocument_fts, 10.0, 1.0) AS score '
+            'FROM home_searchdocument_fts JOIN home_searchdocument d ON d.id = home_searchdocument_fts.rowid '
+            'WHERE home_searchdocument_fts MATCH %s '
+            'ORDER BY score DESC, d.id DESC LIMIT %s OFFSET %s'
+        )
+        marks = [HIGHLIGHT_START, HIGHLIGHT_STOP]
+        return sql, [*marks, *marks, self.to_query(terms), limit, offset]
+
+    def to_query(self, terms):
+        # quoted terms are matched as plain tokens, so user input never reaches the FTS5 query syntax.
+        return ' '.join(f'"{term}"' for term in terms)
+
+
+class PostgreSQLSearchBackend:
+    def match_sql(self, terms):
+        sql = (
+            'SELECT question_id FROM home_searchdocument '
+            "WHERE search_vector @@ plainto_tsquery('english', %s) AND answer_id IS NULL"
+        )
+        return sql, [' '.join(terms)]
+
+    def search_sql(self, terms, limit, offset):
+        options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}'
+        # headlines are expensive, so they are only built for the rows of the requested page.
+        sql = (
+            'SELECT d.id, d.question_id, d.answer_id, '
+            f"ts_headline('english', d.title, r.query, '{options}, HighlightAll=true'), "
+            f"ts_headline('english', d.body, r.query, '{options}, MaxFragments=1, MaxWords=32, MinWords=8'), "
+            'r.score FROM ('
+            '    SELECT id, query, ts_rank(search_vector, query) AS score '
+            "    FROM home_searchdocument, plainto_tsquery('english', %s) query "
+            '    WHERE search_vector @@ query ORDER BY score DESC, id DESC LIMIT %s OFFSET %s'
+            ') r JOIN home_searchdocument d ON d.id = r.id ORDER BY r.score DESC, d.id DESC'
+        )
+        return sql, [' '.join(terms), limit, offset]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+def get_backend(using: str = 'default'):
+    vendor = connections[using].vendor
+    if vendor not in BACKENDS:
+        raise NotImplementedError(f'full-text search is not supported on {vendor}.')
+    return BACKENDS[vendor]()
+
+
+def filter_questions(queryset: QuerySet, query: str) -> QuerySet:
+    """Filters a question queryset down to the questions whose title or body match `query`."""
+    terms = get_terms(query)
+    if not terms:
+        return queryset
+    sql, params = get_backend(queryset.db).match_sql(terms)
+    return queryset.filter(id__in=RawSQL(sql, params))
+
+
+def search(query: str, *, limit: int = 10, offset: int = 0) -> list:
+    """
+    Returns the questions and answers matching `query`, best matches first.
+    Matched words of `title` and `snippet` are wrapped in <mark></mark>, the rest of their text is HTML-escaped.
+    """
+    terms = get_terms(query)
+    if not terms:
+        return []
+    sql, params = get_backend().search_sql(terms, limit, offset)
+    with connections['default'].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        {
+            'question_id': question_id,
+            'answer_id': answer_id,
+            'title': highlight(title),
+            'snippet': highlight(snippet),
+            'score': score,
+        }
+        for _, question_id, answer_id, title, snippet, score in rows
+    ]
+
+
+def index_question(question: Question) -> None:
+    SearchDocument.objects.update_or_create(
+        question=question, answer=None, defaults={'title': get_text(question.title), 'body': get_text(question.body)}
+    )
+
+
+def index_answer(answer: Answer) -> None:
+    SearchDocument.objects.update_or_create(
+        answer=answer, defaults={'question_id': answer.question_id, 'body': get_text(answer.body)}
+    )
+
+
+def rebuild_index(batch_size: int = 1000) -> int:
+    """Recreates every search document from the questions and answers, returns the number of documents."""
+    questions = Question.objects.values_list('id', 'title', 'body').order_by()
+    answers = Answer.objects.values_list('id', 'question_id', 'body').order_by()
+    documents = chain(
+        (
+            SearchDocument(question_id=question_id, title=get_text(title), body=get_text(body))
+            for question_id, title, body in questions.iterator(chunk_size=batch_size)
+        ),
+        (
+            SearchDocument(question_id=question_id, answer_id=answer_id, body=get_text(body))
+            for answer_id, question_id, body in answers.iterator(chunk_size=batch_size)
+        ),
+    )
+    total = 0
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        while batch := list(islice(documents, batch_size)):
+            SearchDocument.objects.bulk_create(batch)
+            total += len(batch)
+    return total
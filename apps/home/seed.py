@@ -0,0 +1,279 @@
+"""
+Synthetic forum data for load tests and benchmarks.
+
+`ForumSeeder` writes users, profiles, tags, questions, answers, comments, reply chains and votes.
+Activity follows a Zipf law: the `skew` exponent decides how much more the first users post, the first tags
+are used and the first questions, answers and comments are answered, commented, replied to and voted.
+Every choice comes from one `random.Random(seed)`, so the same options always give the same dataset.
+
+Rows are tuples inserted with `executemany` in batches, their ids assigned up front so children point
+to their parents without reading them back. This skips `save` and the signals, their work is done
+once at the end instead: the tag closure and counts, the leaderboard, the trending tags and the cache
+generations are rebuilt in set-based passes, the search documents and the ledger are written with the rows.
+"""
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.text import slugify
+
+from apps.users import reputation
+from apps.users.models import ReputationEvent, User, UserProfile
+from utils.cache import bump_version_on_commit
+from .models import Question, Answer, Comment, CommentReply, SearchDocument, Tag, Vote
+from .services import FEED_CACHE
+from .tags import TAG_TREE_CACHE, rebuild_closure, rebuild_questions_count, rebuild_trending
+
+WORDS = (
+    'django', 'python', 'query', 'index', 'cache', 'redis', 'celery', 'migration', 'model', 'view',
+    'serializer', 'test', 'deploy', 'docker', 'postgres', 'sqlite', 'async', 'thread', 'memory', 'latency',
+    'token', 'signal', 'queue', 'worker', 'template', 'form', 'admin', 'router', 'schema', 'request',
+)
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+PASSWORD = 'password'
+DAY = 86400
+
+# table: (model, inserted fields besides the id).
+TABLES = {
+    'users': (User, ('password', 'is_superuser', 'username', 'email', 'is_active', 'is_admin')),
+    'profiles': (UserProfile, ('owner', 'score')),
+    'ledger': (ReputationEvent, ('user', 'kind', 'points', 'folded', 'created')),
+    'tags': (Tag, ('sub_tag', 'is_sub', 'name', 'slug', 'questions_count')),
+    'questions': (Question, ('owner', 'title', 'body', 'slug', 'created', 'modified')),
+    'question_tags': (Question.tag.through, ('question', 'tag')),
+    'answers': (
+        Answer, (
+            'owner', 'question', 'accepted', 'likes_count', 'dislikes_count', 'body',
+            'created', 'modified', 'counters_modified',
+        )
+    ),
+    'votes': (Vote, ('owner', 'answer', 'is_like', 'is_dislike', 'modified')),
+    'comments': (Comment, ('owner', 'answer', 'body', 'created', 'modified')),
+    'replies': (CommentReply, ('owner', 'comment', 'reply', 'depth', 'path', 'body', 'created', 'modified')),
+    'documents': (SearchDocument, ('question', 'answer', 'title', 'body')),
+}
+
+
+class ZipfSampler:
+    """Draws ranks in range(size), rank r being drawn with a probability proportional to 1 / (r + 1) ** skew."""
+
+    def __init__(self, rng: random.Random, size: int, skew: float):
+        self.rng = rng
+        self.population = range(size)
+        self.cum_weights = list(accumulate(1 / (rank + 1) ** skew for rank in self.population))
+
+    def sample(self, k: int = 1) -> list:
+        return self.rng.choices(self.population, cum_weights=self.cum_weights, k=k) if k else []
+
+    def distribute(self, total: int, chunk_size: int = 100_000) -> array:
+        """Spreads `total` items over the ranks, returns the number of items of every rank."""
+        counts = array('L', bytes(array('L').itemsize * len(self.population)))
+        while total > 0:
+            for rank in self.sample(min(total, chunk_size)):
+                counts[rank] += 1
+            total -= chunk_size
+        return counts
+
+
+class Table:
+    """Buffered `INSERT` of rows into the table of `model`, the id first and then `fields`."""
+
+    def __init__(self, model, fields: tuple, batch_size: int):
+        self.model, self.batch_size, self.rows, self.written = model, batch_size, [], 0
+        quote_name = connection.ops.quote_name
+        columns = ', '.join(quote_name(model._meta.get_field(name).column) for name in ('id', *fields))
+        placeholders = ', '.join(['%s'] * (len(fields) + 1))
+        self.sql = f'INSERT INTO {quote_name(model._meta.db_table)} ({columns}) VALUES ({placeholders})'
+        self.next_id = (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+    def add(self, *values) -> int:
+        """Queues a row and returns its id."""
+        row_id = self.next_id
+        self.next_id += 1
+        self.rows.append((row_id, *values))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+        return row_id
+
+    def flush(self) -> None:
+        if self.rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(self.sql, self.rows)
+            self.written += len(self.rows)
+            self.rows = []
+
+
+@contextmanager
+def open_tables(batch_size: int):
+    """Yields a `Table` of every entry of `TABLES`, flushed on exit and with the id sequences moved past the rows."""
+    tables = {name: Table(model, fields, batch_size) for name, (model, fields) in TABLES.items()}
+    yield tables
+    for table in tables.values():
+        table.flush()
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [table.model for table in tables.values()]):
+            cursor.execute(sql)
+
+
+class ForumSeeder:
+    def __init__(self, *, users: int = 1000, tags: int = 100, questions: int = 5000, answers: int = 15000,
+                 comments: int = 20000, replies: int = 20000, votes: int = 50000, skew: float = 1.1,
+                 seed: int = 0, batch_size: int = 5000, prefix: str = 'seed', sub_tag_ratio: float = 0.3,
+                 tags_per_question: int = 3, accepted_ratio: float = 0.4, like_ratio: float = 0.8,
+                 nest_ratio: float = 0.6, max_depth: int = 8, days: int = 365):
+        self.counts = {
+            'users': users, 'tags': tags, 'questions': questions, 'answers': answers if questions else 0,
+            'comments': comments if answers else 0, 'replies': replies if comments else 0,
+            'votes': votes if answers and users else 0,
+        }
+        self.skew, self.batch_size, self.prefix = skew, batch_size, prefix
+        self.sub_tag_ratio, self.tags_per_question = sub_tag_ratio, tags_per_question
+        self.accepted_ratio, self.like_ratio = accepted_ratio, like_ratio
+        self.nest_ratio, self.max_depth = nest_ratio, max_depth
+        self.start = START.timestamp()
+        self.end = self.start + days * DAY
+        self.rng = random.Random(seed)
+        # ids and timestamps of the rows parents are drawn from, by rank.
+        self.user_ids, self.tag_ids = array('q'), array('q')
+        self.question_ids, self.answer_ids, self.comment_ids = array('q'), array('q'), array('q')
+        self.question_times, self.answer_times, self.comment_times = array('d'), array('d'), array('d')
+        self.scores = array('q')
+
+    def run(self) -> dict:
+        """Writes the dataset in one transaction, returns the number of rows written by table."""
+        if self.counts['users'] < 1 and any(self.counts[name] for name in ('questions', 'comments', 'replies')):
+            raise ValueError('posts need at least one user.')
+        with transaction.atomic():
+            with open_tables(self.batch_size) as self.tables:
+                self.create_users()
+                self.create_tags()
+                self.create_questions()
+                self.create_answers()
+                self.create_comments()
+                self.create_replies()
+                self.create_profiles()
+            self.rebuild()
+        return {name: table.written for name, table in self.tables.items()}
+
+    def draw_time(self, after: float, within: float) -> float:
+        return min(after + self.rng.random() * within, self.end)
+
+    def format_time(self, timestamp: float):
+        return connection.ops.adapt_datetimefield_value(datetime.fromtimestamp(timestamp, timezone.utc))
+
+    def text(self, words: int) -> str:
+        return ' '.join(self.rng.choices(WORDS, k=words))
+
+    def draw_owners(self, k: int) -> list:
+        return [self.user_ids[rank] for rank in self.user_sampler.sample(k)]
+
+    def create_users(self) -> None:
+        # hashed once, users can log in with PASSWORD.
+        password = make_password(PASSWORD, salt=f'{self.prefix}salt')
+        for i in range(self.counts['users']):
+            self.user_ids.append(self.tables['users'].add(
+                password, False, f'{self.prefix}{i}', f'{self.prefix}{i}@example.com', True, False
+            ))
+        self.scores = array('q', bytes(8 * len(self.user_ids)))
+        self.user_sampler = ZipfSampler(self.rng, len(self.user_ids), self.skew)
+
+    def create_tags(self) -> None:
+        for i in range(self.counts['tags']):
+            parent = self.tag_ids[self.rng.randrange(i)] if i and self.rng.random() < self.sub_tag_ratio else None
+            name = f'{self.prefix}-tag-{i}'
+            self.tag_ids.append(self.tables['tags'].add(parent, parent is not None, name, slugify(name), 0))
+        self.tag_sampler = ZipfSampler(self.rng, len(self.tag_ids), self.skew)
+
+    def create_questions(self) -> None:
+        for owner in self.draw_owners(self.counts['questions']):
+            created = self.draw_time(self.start, self.end - self.start)
+            title, body = self.text(8), self.text(40)
+            question_id = self.tables['questions'].add(
+                owner, title, body, slugify(title[:30]), self.format_time(created), self.format_time(created)
+            )
+            self.tables['documents'].add(question_id, None, title, body)
+            count = self.rng.randint(1, self.tags_per_question) if self.tag_ids else 0
+            for tag_id in sorted({self.tag_ids[rank] for rank in self.tag_sampler.sample(count)}):
+                self.tables['question_tags'].add(question_id, tag_id)
+            self.question_ids.append(question_id)
+            self.question_times.append(created)
+
+    def create_answers(self) -> None:
+        per_question = ZipfSampler(self.rng, len(self.question_ids), self.skew).distribute(self.counts['answers'])
+        per_answer = ZipfSampler(self.rng, self.counts['answers'], self.skew).distribute(self.counts['votes'])
+        for rank, count in enumerate(per_question):
+            accepted = self.rng.randrange(count) if count and self.rng.random() < self.accepted_ratio else None
+            for i, owner in enumerate(self.user_sampler.sample(count)):
+                created = self.draw_time(self.question_times[rank], 30 * DAY)
+                # distinct voters for every answer, see `Vote.unique_vote_owner_answer`.
+                voters = self.rng.sample(self.user_sampler.population, min(
+                    per_answer[len(self.answer_ids)], len(self.user_ids)
+                ))
+                likes = [self.rng.random() < self.like_ratio for _ in voters]
+                likes_count = sum(likes)
+                self.scores[owner] += 2 * likes_count - len(likes) + (i == accepted)
+                body = self.text(60)
+                answer_id = self.tables['answers'].add(
+                    self.user_ids[owner], self.question_ids[rank], i == accepted, likes_count,
+                    len(likes) - likes_count, body, *[self.format_time(created)] * 3
+                )
+                self.tables['documents'].add(self.question_ids[rank], answer_id, '', body)
+                for voter, is_like in zip(voters, likes):
+                    modified = self.format_time(self.draw_time(created, 7 * DAY))
+                    self.tables['votes'].add(self.user_ids[voter], answer_id, is_like, not is_like, modified)
+                self.answer_ids.append(answer_id)
+                self.answer_times.append(created)
+
+    def create_comments(self) -> None:
+        per_answer = ZipfSampler(self.rng, len(self.answer_ids), self.skew).distribute(self.counts['comments'])
+        for rank, count in enumerate(per_answer):
+            for owner in self.draw_owners(count):
+                created = self.draw_time(self.answer_times[rank], 7 * DAY)
+                self.comment_ids.append(self.tables['comments'].add(
+                    owner, self.answer_ids[rank], self.text(20), self.format_time(created), self.format_time(created)
+                ))
+                self.comment_times.append(created)
+
+    def create_replies(self) -> None:
+        """Replies answer their comment or, `nest_ratio` of the time, an earlier reply of it, up to `max_depth`."""
+        per_comment = ZipfSampler(self.rng, len(self.comment_ids), self.skew).distribute(self.counts['replies'])
+        for rank, count in enumerate(per_comment):
+            # (id, depth, path of its children, created) of the replies of the comment so far.
+            replies = []
+            for owner in self.draw_owners(count):
+                parent = replies[self.rng.randrange(len(replies))] if (
+                    replies and self.rng.random() < self.nest_ratio
+                ) else None
+                if parent is not None and parent[1] + 1 >= self.max_depth:
+                    parent = None
+                reply_id, depth, path, after = (None, 0, '', self.comment_times[rank]) if parent is None else (
+                    parent[0], parent[1] + 1, parent[2], parent[3]
+                )
+                created = self.draw_time(after, 2 * DAY)
+                row_id = self.tables['replies'].add(
+                    owner, self.comment_ids[rank], reply_id, depth, path, self.text(12),
+                    self.format_time(created), self.format_time(created)
+                )
+                replies.append((row_id, depth, f'{path}{row_id}/', created))
+
+    def create_profiles(self) -> None:
+        opened = self.format_time(self.start)
+        for user_id, score in zip(self.user_ids, self.scores):
+            self.tables['profiles'].add(user_id, score)
+            # the ledger opens with the scores, like migration users.0021 did for existing users.
+            if score:
+                self.tables['ledger'].add(user_id, ReputationEvent.BALANCE, score, True, opened)
+
+    def rebuild(self) -> None:
+        rebuild_closure(self.batch_size)
+        rebuild_questions_count()
+        for namespace in (FEED_CACHE, Question._meta.label_lower, TAG_TREE_CACHE):
+            bump_version_on_commit(namespace)
+        transaction.on_commit(lambda: reputation.rebuild_leaderboard(self.batch_size))
+        transaction.on_commit(lambda: rebuild_trending(self.batch_size))
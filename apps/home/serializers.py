@@ -1,7 +1,9 @@
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from .export import EXPORTS, FORMATS
 from .models import Question, Answer, Comment, CommentReply, Tag
+from .services import get_reply_forest, get_reply_subtree
 
 
 class QuestionSerializer(serializers.ModelSerializer):
@@ -21,11 +23,14 @@ class ReplyCommentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CommentReply
-        fields = '__all__'
+        # `depth` and `path` are internal to the reply trees.
+        fields = ('id', 'replies', 'owner', 'comment', 'reply', 'body', 'created', 'modified')
 
     @extend_schema_field(serializers.ListSerializer(child=serializers.DictField()))
     def get_replies(self, obj):
-        replies = obj.i_replies.select_related('owner', 'comment', 'reply').all()
+        replies = getattr(obj, 'thread_replies', None)
+        if replies is None:
+            replies = get_reply_subtree(obj)
         return ReplyCommentSerializer(instance=replies, many=True).data
 
 
@@ -40,7 +45,9 @@ class CommentSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.ListSerializer(child=ReplyCommentSerializer(many=True)))
     def get_replies(self, obj):
-        replies = obj.replies.select_related('owner', 'comment', 'reply').filter(reply=None)
+        replies = getattr(obj, 'thread_replies', None)
+        if replies is None:
+            replies = get_reply_forest(obj)
         return ReplyCommentSerializer(instance=replies, many=True).data
 
 
@@ -48,30 +55,80 @@ class AnswerSerializer(serializers.ModelSerializer):
     owner = serializers.StringRelatedField(read_only=True)
     question = serializers.StringRelatedField(read_only=True)
     comments = serializers.SerializerMethodField()
-    likes = serializers.SerializerMethodField()
-    dislikes = serializers.SerializerMethodField()
+    likes = serializers.IntegerField(source='likes_count', read_only=True)
+    dislikes = serializers.IntegerField(source='dislikes_count', read_only=True)
 
     class Meta:
         model = Answer
-        exclude = ('accepted',)
+        exclude = ('accepted', 'likes_count', 'dislikes_count', 'counters_modified')
 
     @extend_schema_field(serializers.ListSerializer(child=CommentSerializer(many=True)))
     def get_comments(self, obj):
         comments = obj.comments.all()
         return CommentSerializer(comments, many=True).data
 
-    @extend_schema_field(serializers.IntegerField())
-    def get_likes(self, obj):
-        return self.get_votes_count(obj, is_like=True)
-
-    @extend_schema_field(serializers.IntegerField())
-    def get_dislikes(self, obj):
-        return self.get_votes_count(obj, is_dislike=True)
-
-    def get_votes_count(self, obj, is_like=None, is_dislike=None):
-        votes = obj.votes.select_related('owner', 'answer')
-        if is_like is not None:
-            votes = votes.filter(is_like=is_like)
-        if is_dislike is not None:
-            votes = votes.filter(is_dislike=is_dislike)
-        return votes.count()
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(required=True, max_length=200)
+    page = serializers.IntegerField(required=False, min_value=1, default=1)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=20, default=10)
+
+
+class SearchResultSerializer(serializers.Serializer):
+    question_id = serializers.IntegerField()
+    answer_id = serializers.IntegerField(allow_null=True)
+    title = serializers.CharField()
+    snippet = serializers.CharField()
+    score = serializers.FloatField()
+
+
+class TrendingTagsQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100, default=10)
+
+
+class TrendingTagSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    slug = serializers.SlugField()
+    questions_count = serializers.IntegerField()
+    score = serializers.FloatField()
+
+
+class ViewMetricsSerializer(serializers.Serializer):
+    view = serializers.CharField()
+    requests = serializers.IntegerField()
+    queries = serializers.IntegerField()
+    db_ms = serializers.FloatField()
+    n_plus_one = serializers.IntegerField()
+    slow = serializers.IntegerField()
+    avg_queries = serializers.FloatField()
+    avg_db_ms = serializers.FloatField()
+    avg_duration_ms = serializers.FloatField()
+
+
+class AnswerBatchItemSerializer(serializers.Serializer):
+    question = serializers.IntegerField(min_value=1)
+    body = serializers.CharField()
+
+
+class CommentBatchItemSerializer(serializers.Serializer):
+    answer = serializers.IntegerField(min_value=1)
+    body = serializers.CharField()
+
+
+class ReplyBatchItemSerializer(serializers.Serializer):
+    comment = serializers.IntegerField(min_value=1)
+    reply = serializers.IntegerField(min_value=1, required=False, allow_null=True, default=None)
+    body = serializers.CharField()
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=['all', *EXPORTS], required=False, default='all')
+    # `format` is taken by the content negotiation of DRF.
+    file_format = serializers.ChoiceField(choices=list(FORMATS), required=False, default='ndjson')
+    since = serializers.DateTimeField(required=False, default=None, help_text='watermark of the previous export.')
+
+    def validate(self, attrs):
+        if attrs['file_format'] == 'csv' and attrs['type'] == 'all':
+            raise serializers.ValidationError({'type': 'csv exports take a single type.'})
+        return attrs
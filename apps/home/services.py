@@ -0,0 +1,265 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce, Greatest, Now
+
+from apps.users import reputation
+from apps.users.models import ReputationEvent, User
+from utils.cache import bump_version_on_commit
+from .models import Question, Answer, Comment, CommentReply, SearchDocument, Vote
+from .search import get_text
+
+# cache namespaces of anonymous responses, see `utils.cache.cached_response`.
+FEED_CACHE = 'feed'
+
+
+def get_thread_cache(question_id) -> str:
+    return f'thread:{question_id}'
+
+
+def bump_threads(question_ids) -> None:
+    """
+    Invalidates the cached threads of `question_ids`, once per question,
+    for the `bulk_create` and `update` calls which send no signal.
+    """
+    for question_id in set(question_ids):
+        bump_version_on_commit(get_thread_cache(question_id))
+
+
+def get_reply_queryset(max_depth: int = None) -> QuerySet:
+    """Replies ordered so that parents always come before their children, cut at `max_depth` levels."""
+    max_depth = settings.REPLY_TREE_MAX_DEPTH if max_depth is None else max_depth
+    return CommentReply.objects.select_related('owner').filter(depth__lt=max_depth).order_by(
+        'depth', '-modified', '-created'
+    )
+
+
+def attach_replies(comments, replies, *, max_children: int = None) -> None:
+    """
+    Nests `replies` under `comments` in memory through the `thread_replies` attribute:
+    root replies go to their comment and the others to their parent reply.
+    Every node keeps at most `max_children` children, replies whose parent is not loaded are left out.
+    """
+    max_children = settings.REPLY_TREE_MAX_CHILDREN if max_children is None else max_children
+    comments = {comment.id: comment for comment in comments}
+    by_id = {reply.id: reply for reply in replies}
+    for node in (*comments.values(), *replies):
+        node.thread_replies = []
+    for reply in replies:
+        if reply.comment_id in comments:
+            reply.comment = comments[reply.comment_id]
+        if reply.reply_id is None:
+            parent = comments.get(reply.comment_id)
+        else:
+            parent = by_id.get(reply.reply_id)
+            if parent is not None:
+                reply.reply = parent
+        if parent is not None and len(parent.thread_replies) < max_children:
+            parent.thread_replies.append(reply)
+
+
+def get_reply_forest(comment: Comment, *, max_depth: int = None, max_children: int = None) -> list:
+    """Loads every reply of `comment` in one query and returns its root replies with their children nested."""
+    replies = list(get_reply_queryset(max_depth).filter(comment=comment))
+    attach_replies([comment], replies, max_children=max_children)
+    return comment.thread_replies
+
+
+def get_reply_subtree(reply: CommentReply, *, max_depth: int = None, max_children: int = None) -> list:
+    """Loads every descendant of `reply` in one query and returns its direct replies with their children nested."""
+    max_depth = settings.REPLY_TREE_MAX_DEPTH if max_depth is None else max_depth
+    descendants = list(
+        # the comment first, for `reply_comment_tree_idx`.
+        get_reply_queryset(reply.depth + 1 + max_depth).filter(
+            comment_id=reply.comment_id, path__startswith=reply.descendants_path
+        )
+    )
+    attach_replies([], [reply, *descendants], max_children=max_children)
+    return reply.thread_replies
+
+
+def get_thread_queryset() -> QuerySet:
+    """
+    Returns a question queryset that loads the whole thread (answers, comments and replies)
+    in a fixed number of queries, no matter how big the thread is.
+    """
+    return Question.objects.select_related('owner').prefetch_related(
+        'tag',
+        Prefetch('answers', queryset=Answer.objects.select_related('owner')),
+        Prefetch('answers__comments', queryset=Comment.objects.select_related('owner')),
+        Prefetch('answers__comments__replies', queryset=get_reply_queryset()),
+    )
+
+
+def build_reply_tree(question: Question) -> Question:
+    """Nests the prefetched replies of every comment of `question`, see `attach_replies`."""
+    comments = [comment for answer in question.answers.all() for comment in answer.comments.all()]
+    attach_replies(comments, [reply for comment in comments for reply in comment.replies.all()])
+    return question
+
+
+@transaction.atomic
+def _toggle_vote(*, owner: User, answer_id: int, is_like: bool) -> bool:
+    # the answer owner and the vote of `owner` in one read, locking the answer the counters are written to.
+    votes = Vote.objects.filter(owner=owner, answer=OuterRef('pk'))
+    question_id, answer_owner_id, vote_id, voted_like = Answer.objects.select_for_update().filter(
+        id=answer_id
+    ).annotate(
+        vote_id=Subquery(votes.values('id')[:1]), voted_like=Subquery(votes.values('is_like')[:1])
+    ).values_list('question_id', 'owner_id', 'vote_id', 'voted_like').get()
+    liked, disliked = ('likes_count', 'dislikes_count') if is_like else ('dislikes_count', 'likes_count')
+    kind, opposite = (ReputationEvent.LIKE, ReputationEvent.DISLIKE) if is_like else (
+        ReputationEvent.DISLIKE, ReputationEvent.LIKE
+    )
+
+    vote = Vote(id=vote_id, owner=owner, answer_id=answer_id, is_like=is_like, is_dislike=not is_like)
+    # read by the signals of the vote, which look them up otherwise.
+    vote.question_id, vote.answer_owner_id = question_id, answer_owner_id
+    if vote_id is None:
+        Answer.objects.filter(id=answer_id).update(**{liked: F(liked) + 1}, counters_modified=Now())
+        vote.save(force_insert=True)
+        reputation.record(user_id=answer_owner_id, kind=kind)
+        return True
+
+    if voted_like == is_like:
+        # the counter and the reputation are taken back by `uncount_vote`.
+        vote.delete()
+        return False
+
+    vote.save(update_fields=['is_like', 'is_dislike', 'modified'])
+    Answer.objects.filter(id=answer_id).update(
+        **{liked: F(liked) + 1, disliked: Greatest(F(disliked) - 1, 0)}, counters_modified=Now()
+    )
+    reputation.record_switch(user_id=answer_owner_id, kind=kind, opposite=opposite)
+    return True
+
+
+def _deleted_with(origin, user_id: int) -> bool:
+    """Whether the user `user_id` is deleted by the `delete()` call `origin` of a `post_delete`."""
+    if isinstance(origin, User):
+        return origin.pk == user_id
+    if isinstance(origin, QuerySet) and origin.model is User:
+        # the users are deleted after the rows of their cascade.
+        return origin.filter(pk=user_id).exists()
+    return False
+
+
+def uncount_vote(vote: Vote, *, origin=None) -> None:
+    """
+    Takes a deleted vote back from the counters of its answer and the reputation of the answer owner.
+    Run by the `post_delete` of every vote, removed by `toggle_vote`, the admin or a cascade;
+    `origin` is the one of the signal.
+    """
+    counter = 'likes_count' if vote.is_like else 'dislikes_count'
+    Answer.objects.filter(id=vote.answer_id).update(**{counter: Greatest(F(counter) - 1, 0)}, counters_modified=Now())
+    if 'answer_owner_id' not in vote.__dict__:
+        # the question is kept for the thread bump, see `signals.get_question_id`.
+        answers = Answer.objects.filter(id=vote.answer_id).values_list('owner_id', 'question_id')
+        vote.answer_owner_id, vote.question_id = answers.first() or (None, None)
+    # none when the answer went first in a cascade, the events of a deleted owner go with it.
+    if vote.answer_owner_id is None or _deleted_with(origin, vote.answer_owner_id):
+        return
+    kind = ReputationEvent.LIKE if vote.is_like else ReputationEvent.DISLIKE
+    reputation.record_undo(user_id=vote.answer_owner_id, kind=kind)
+
+
+def toggle_vote(*, owner: User, answer_id: int, is_like: bool) -> bool:
+    """
+    Likes (or dislikes) an answer, removes the vote if it already exists and switches an opposite vote.
+    Keeps `Answer.likes_count` and `Answer.dislikes_count` in sync and records the reputation of the answer owner
+    in the same transaction. Raises Answer.DoesNotExist if there is no such answer.
+    Returns True if the vote is set after the call, False if it has been removed.
+    """
+    try:
+        return _toggle_vote(owner=owner, answer_id=answer_id, is_like=is_like)
+    except IntegrityError:
+        # a concurrent request created the same vote first, toggle against it.
+        return _toggle_vote(owner=owner, answer_id=answer_id, is_like=is_like)
+
+
+@transaction.atomic
+def accept_answer(*, user: User, answer_id: int) -> bool:
+    """
+    Accepts an answer on behalf of `user`, the owner of its question, and records the reputation of the answer owner.
+    Returns False if the answer or another answer of the question is already accepted.
+    Raises Answer.DoesNotExist if there is no such answer and PermissionDenied if `user` does not own the question.
+    Costs seven queries: the read of the answer with its question owner, the conditional update in a savepoint
+    and the ledger insert, in one transaction. Safe under concurrent calls:
+    the `unique_accepted_answer` index lets one answer per question through.
+    """
+    answer = Answer.objects.values('owner_id', 'question_id', 'question__owner_id').get(id=answer_id)
+    if answer['question__owner_id'] != user.id:
+        raise PermissionDenied
+    try:
+        with transaction.atomic():
+            accepted = Answer.objects.filter(id=answer_id, accepted=False).exclude(
+                Exists(Answer.objects.filter(question_id=answer['question_id'], accepted=True))
+            ).update(accepted=True, counters_modified=Now())
+    except IntegrityError:
+        # a concurrent call accepted another answer of the question first.
+        return False
+    if not accepted:
+        return False
+    reputation.record(user_id=answer['owner_id'], kind=ReputationEvent.ACCEPT)
+    bump_threads([answer['question_id']])
+    return True
+
+
+def rebuild_votes_count() -> int:
+    """Recomputes the votes count of every answer from the `Vote` table, returns the number of answers fixed."""
+
+    def count(condition):
+        votes = Vote.objects.filter(condition, answer=OuterRef('pk')).values('answer').annotate(total=Count('id'))
+        return Coalesce(Subquery(votes.values('total')), 0)
+
+    likes, dislikes = count(Q(is_like=True)), count(Q(is_dislike=True))
+    # only the answers whose counts drifted are written, and exported again.
+    drifted = Answer.objects.exclude(likes_count=likes, dislikes_count=dislikes)
+    bump_threads(drifted.values_list('question_id', flat=True))
+    return drifted.update(likes_count=likes, dislikes_count=dislikes, counters_modified=Now())
+
+
+# batch creation, `bulk_create` skips `save` and the signals so their work is done here for the whole batch.
+
+@transaction.atomic
+def create_answers(*, owner: User, items: list) -> list:
+    """Creates the answers of `items`, dicts of `question` id and `body`, whose questions must exist."""
+    answers = Answer.objects.bulk_create([
+        Answer(owner=owner, question_id=item['question'], body=item['body']) for item in items
+    ])
+    SearchDocument.objects.bulk_create([
+        SearchDocument(question_id=answer.question_id, answer_id=answer.id, body=get_text(answer.body))
+        for answer in answers
+    ])
+    bump_threads(answer.question_id for answer in answers)
+    return answers
+
+
+@transaction.atomic
+def create_comments(*, owner: User, items: list, answers: dict) -> list:
+    """Creates the comments of `items`, dicts of `answer` id and `body`, `answers` maps their ids to the answers."""
+    comments = Comment.objects.bulk_create([
+        Comment(owner=owner, answer_id=item['answer'], body=item['body']) for item in items
+    ])
+    bump_threads(answers[comment.answer_id].question_id for comment in comments)
+    return comments
+
+
+@transaction.atomic
+def create_replies(*, owner: User, items: list, comments: dict, replies: dict) -> list:
+    """
+    Creates the replies of `items`, dicts of `comment` id, parent `reply` id or None and `body`.
+    `comments` and `replies` map the ids to the comments, annotated with `question_id`, and the parent replies.
+    """
+    objects = []
+    for item in items:
+        reply = CommentReply(owner=owner, comment_id=item['comment'], reply_id=item.get('reply'), body=item['body'])
+        if reply.reply_id is not None:
+            # same materialized path as `CommentReply.save`.
+            parent = replies[reply.reply_id]
+            reply.depth, reply.path = parent.depth + 1, parent.descendants_path
+        objects.append(reply)
+    objects = CommentReply.objects.bulk_create(objects)
+    bump_threads(comments[reply.comment_id].question_id for reply in objects)
+    return objects
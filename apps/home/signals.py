@@ -0,0 +1,151 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.users.models import User
+from utils.cache import bump_version_on_commit
+from .models import Question, Answer, Comment, CommentReply, Tag, Vote
+from .search import index_question, index_answer
+from .services import FEED_CACHE, bump_threads, get_thread_cache, uncount_vote
+from .tags import TAG_TREE_CACHE, count_questions, record_tagging
+
+
+def get_question_id(instance):
+    """
+    Question of a comment, reply or vote. Callers which know it set `question_id` on the instance or load its
+    comment or answer beforehand, otherwise it costs a query.
+    """
+    if 'question_id' in instance.__dict__:
+        return instance.question_id
+    if isinstance(instance, CommentReply):
+        if CommentReply.comment.is_cached(instance):
+            return get_question_id(instance.comment)
+        comments = Comment.objects.filter(id=instance.comment_id)
+        return comments.values_list('answer__question_id', flat=True).first()
+    if type(instance).answer.is_cached(instance):
+        return instance.answer.question_id
+    return Answer.objects.filter(id=instance.answer_id).values_list('question_id', flat=True).first()
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, **kwargs):
+    index_question(instance)
+    if created:
+        bump_version_on_commit(Question._meta.label_lower)
+
+
+@receiver(post_save, sender=Answer)
+def answer_saved(sender, instance, **kwargs):
+    index_answer(instance)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    bump_version_on_commit(Question._meta.label_lower)
+
+
+@receiver(m2m_changed, sender=Question.tag.through)
+def question_tags_changed(sender, instance, action, **kwargs):
+    # tag filters are counted too.
+    if action.startswith('post_'):
+        bump_version_on_commit(Question._meta.label_lower)
+        bump_version_on_commit(FEED_CACHE)
+        if isinstance(instance, Question):
+            bump_version_on_commit(get_thread_cache(instance.id))
+
+
+@receiver(m2m_changed, sender=Question.tag.through)
+def question_tags_counted(sender, instance, action, reverse, pk_set, **kwargs):
+    # links as (question id, tag id), from either side of the relation.
+    if action == 'post_add':
+        links = [(instance.pk, pk) if not reverse else (pk, instance.pk) for pk in pk_set]
+        count_questions(links, 1)
+        transaction.on_commit(lambda: record_tagging(links))
+    elif action in ('pre_remove', 'pre_clear'):
+        # removing links that do not exist sends them too, only the existing ones are counted.
+        links = sender.objects.filter(**{'tag_id' if reverse else 'question_id': instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(**{'question_id__in' if reverse else 'tag_id__in': pk_set})
+        instance._removed_tag_links = list(links.values_list('question_id', 'tag_id'))
+    elif action in ('post_remove', 'post_clear'):
+        count_questions(instance.__dict__.pop('_removed_tag_links', []), -1)
+
+
+@receiver(pre_delete, sender=Question)
+def question_tags_uncounted(sender, instance, **kwargs):
+    # the links of a deleted question go with the cascade, which sends no m2m_changed.
+    links = Question.tag.through.objects.filter(question_id=instance.pk).values_list('question_id', 'tag_id')
+    count_questions(list(links), -1)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def feed_changed(sender, **kwargs):
+    bump_version_on_commit(FEED_CACHE)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version_on_commit(TAG_TREE_CACHE)
+    # counts of `tag_tree` filters depend on the hierarchy.
+    bump_version_on_commit(Question._meta.label_lower)
+
+
+# `bulk_create` and `update` send no signal, their callers bump the threads, see `services.bump_threads`.
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def thread_changed(sender, instance, **kwargs):
+    bump_version_on_commit(get_thread_cache(instance.id if sender is Question else instance.question_id))
+
+
+# connected before `thread_part_changed`, which reads the question it looks up.
+@receiver(post_delete, sender=Vote)
+def vote_deleted(sender, instance, origin=None, **kwargs):
+    uncount_vote(instance, origin=origin)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=CommentReply)
+@receiver(post_delete, sender=CommentReply)
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+def thread_part_changed(sender, instance, **kwargs):
+    question_id = get_question_id(instance)
+    # none when the answer went first in a cascade, whose own signal bumped the thread.
+    if question_id is not None:
+        bump_version_on_commit(get_thread_cache(question_id))
+
+
+def get_owner_str(user):
+    # the fields of `str(owner)` the feed and the threads embed, deferred ones are not loaded for it.
+    return user.__dict__.get('username'), user.__dict__.get('email')
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance._owner_str = get_owner_str(instance)
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not {'username', 'email'}.intersection(update_fields)):
+        return
+    if get_owner_str(instance) == instance._owner_str:
+        return
+    instance._owner_str = get_owner_str(instance)
+    bump_version_on_commit(FEED_CACHE)
+    # the threads the user wrote any part of, in one query.
+    querysets = [
+        Question.objects.filter(owner=instance).values_list('id', flat=True),
+        Answer.objects.filter(owner=instance).values_list('question_id', flat=True),
+        Comment.objects.filter(owner=instance).values_list('answer__question_id', flat=True),
+        CommentReply.objects.filter(owner=instance).values_list('comment__answer__question_id', flat=True),
+    ]
+    querysets = [queryset.order_by() for queryset in querysets]
+    bump_threads(querysets[0].union(*querysets[1:]))
@@ -0,0 +1,186 @@
+"""
+Tag hierarchy and popularity.
+
+`Tag.sub_tag` links a tag to its parent and `TagClosure` stores every (ancestor, descendant) pair of the tree,
+kept in sync by `Tag.save` and the delete cascade. Questions of a whole subtree are found with a single join
+of the closure table, and the tree itself is served from process memory until a tag changes.
+
+`Tag.questions_count` and the trending buckets are kept up to date by the signals of `apps.home.signals`:
+every tagging adds a point to the tag in the Redis sorted set of the current hour, and `rollup_trending`
+(run by the `rollup_trending_tags` Celery task) sums the buckets of the last TRENDING_TAGS_WINDOW hours,
+older hours weighing less, into the sorted set the trending endpoint reads.
+"""
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, QuerySet, Subquery, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Greatest, TruncHour
+
+from utils.cache import get_redis, get_version
+from .models import Question, Tag, TagClosure
+
+# cache namespace of the tag tree, bumped by the signals of `apps.home.signals` on every tag change.
+TAG_TREE_CACHE = 'tags'
+TRENDING_KEY = 'trending:tags'
+
+# (cache generation, tree) of this process, see `get_tag_tree`.
+_tag_tree = (None, None)
+
+
+def filter_questions_by_tree(queryset: QuerySet, tag_id: int) -> QuerySet:
+    """Filters a question queryset down to the questions tagged with `tag_id` or any of its sub tags."""
+    through = Question.tag.through._meta.db_table
+    closure = TagClosure._meta.db_table
+    sql = (
+        f'SELECT qt.question_id FROM {through} qt '
+        f'JOIN {closure} c ON c.descendant_id = qt.tag_id WHERE c.ancestor_id = %s'
+    )
+    return queryset.filter(id__in=RawSQL(sql, [tag_id]))
+
+
+def build_tag_tree() -> list:
+    """Loads every tag in one query and returns the root tags with their sub tags nested, ordered by name."""
+    nodes, roots = {}, []
+    tags = list(Tag.objects.order_by('name', 'id').values_list('id', 'name', 'slug', 'sub_tag_id'))
+    for tag_id, name, slug, _ in tags:
+        nodes[tag_id] = {'id': tag_id, 'name': name, 'slug': slug, 'children': []}
+    for tag_id, *_, parent_id in tags:
+        (roots if parent_id is None else nodes[parent_id]['children']).append(nodes[tag_id])
+    return roots
+
+
+def get_tag_tree() -> list:
+    """
+    Returns the tag tree of `build_tag_tree`, kept in process memory
+    and only rebuilt when the cache generation of `TAG_TREE_CACHE` changes.
+    The returned tree is shared, do not modify it.
+    """
+    global _tag_tree
+    version = get_version(TAG_TREE_CACHE)
+    cached_version, tree = _tag_tree
+    if cached_version != version:
+        tree = build_tag_tree()
+        _tag_tree = (version, tree)
+    return tree
+
+
+def get_closure_rows(parents: dict):
+    """Yields the closure rows of a tree given as parent ids by tag id, cycles are cut where they close."""
+    for tag_id in parents:
+        ancestor_id, depth, seen = tag_id, 0, set()
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            yield TagClosure(ancestor_id=ancestor_id, descendant_id=tag_id, depth=depth)
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+
+
+@transaction.atomic
+def rebuild_closure(batch_size: int = 1000) -> int:
+    """Recreates the closure table from `Tag.sub_tag`, returns the number of rows."""
+    parents = dict(Tag.objects.values_list('id', 'sub_tag_id'))
+    TagClosure.objects.all().delete()
+    return len(TagClosure.objects.bulk_create(get_closure_rows(parents), batch_size=batch_size))
+
+
+def count_questions(links, sign: int) -> None:
+    """Adds (`sign` 1) or takes (`sign` -1) the (question id, tag id) `links` to the questions count of the tags."""
+    counts = Counter(tag_id for _, tag_id in links)
+    if not counts:
+        return
+    change = Case(*(When(id=tag_id, then=Value(count)) for tag_id, count in counts.items()))
+    count = F('questions_count') + change if sign > 0 else Greatest(F('questions_count') - change, 0)
+    Tag.objects.filter(id__in=counts).update(questions_count=count)
+
+
+def get_hour(timestamp: float = None) -> int:
+    return int((time.time() if timestamp is None else timestamp) // 3600)
+
+
+def get_bucket_key(hour: int) -> str:
+    return f'trending:tags:{hour}'
+
+
+def record_tagging(links, timestamp: float = None) -> None:
+    """Adds the (question id, tag id) `links` to the trending bucket of the hour of `timestamp`, now by default."""
+    counts = Counter(tag_id for _, tag_id in links)
+    if not counts:
+        return
+    key = get_bucket_key(get_hour(timestamp))
+    pipeline = get_redis().pipeline(transaction=False)
+    for tag_id, count in counts.items():
+        pipeline.zincrby(key, count, tag_id)
+    # a bucket is only read while it is inside the window.
+    pipeline.expire(key, (settings.TRENDING_TAGS_WINDOW + 1) * 3600)
+    pipeline.execute()
+
+
+def rollup_trending(timestamp: float = None) -> int:
+    """
+    Sums the hourly buckets of the window ending at `timestamp`, now by default, into the trending sorted set,
+    every hour weighing TRENDING_TAGS_DECAY times the next one. Returns the number of trending tags.
+    """
+    hour = get_hour(timestamp)
+    weights = {
+        get_bucket_key(hour - age): settings.TRENDING_TAGS_DECAY ** age
+        for age in range(settings.TRENDING_TAGS_WINDOW)
+    }
+    client = get_redis()
+    client.zunionstore(TRENDING_KEY, weights)
+    return client.zcard(TRENDING_KEY)
+
+
+def get_trending(limit: int = 10) -> list:
+    """Returns the `limit` best trending tags with their score, read from the last rollup."""
+    client = get_redis()
+    if not client.exists(TRENDING_KEY):
+        rollup_trending()
+    scores = [
+        (int(tag_id), score) for tag_id, score in client.zrevrange(TRENDING_KEY, 0, limit - 1, withscores=True)
+    ]
+    tags = Tag.objects.in_bulk([tag_id for tag_id, _ in scores])
+    return [
+        {
+            'id': tag_id,
+            'name': tags[tag_id].name,
+            'slug': tags[tag_id].slug,
+            'questions_count': tags[tag_id].questions_count,
+            'score': round(score, 2),
+        }
+        for tag_id, score in scores if tag_id in tags
+    ]
+
+
+def rebuild_questions_count() -> int:
+    """Recomputes the questions count of every tag from the `Question.tag` table, returns the number of tags."""
+    counts = Question.tag.through.objects.filter(tag=OuterRef('pk')).values('tag').annotate(total=Count('id'))
+    return Tag.objects.update(questions_count=Coalesce(Subquery(counts.values('total')), 0))
+
+
+def rebuild_trending(batch_size: int = 1000) -> int:
+    """
+    Recreates the trending buckets of the window from the questions created in it and rolls them up,
+    as taggings are not timestamped, every tag of a question counts at the hour the question was created.
+    Returns the number of trending tags.
+    """
+    now = time.time()
+    hour = get_hour(now)
+    start = datetime.fromtimestamp((hour - settings.TRENDING_TAGS_WINDOW + 1) * 3600, tz=timezone.utc)
+    rows = Question.tag.through.objects.filter(question__created__gte=start).annotate(
+        hour=TruncHour('question__created')
+    ).order_by().values('tag_id', 'hour').annotate(total=Count('id')).values_list('tag_id', 'hour', 'total')
+    client = get_redis()
+    client.delete(*(get_bucket_key(hour - age) for age in range(settings.TRENDING_TAGS_WINDOW)))
+    rows = iter(rows.iterator(chunk_size=batch_size))
+    while batch := list(islice(rows, batch_size)):
+        pipeline = client.pipeline(transaction=False)
+        for tag_id, created_hour, total in batch:
+            key = get_bucket_key(get_hour(created_hour.timestamp()))
+            pipeline.zincrby(key, total, tag_id)
+            pipeline.expire(key, (settings.TRENDING_TAGS_WINDOW + 1) * 3600)
+        pipeline.execute()
+    return rollup_trending(now)
@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from apps.home.tags import rollup_trending
+
+
+@shared_task
+def rollup_trending_tags():
+    return rollup_trending()
@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from apps.home.models import Question, Answer, Comment, CommentReply, Tag
+from apps.home.services import FEED_CACHE, get_thread_cache
+from apps.users.models import User
+from utils.cache import bump_version
+
+
+class AsyncViewsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = baker.make(User, is_active=True)
+        self.questions = baker.make(Question, owner=self.user, _quantity=15)
+        self.questions[0].tag.add(*baker.make(Tag, _quantity=2))
+        answer = baker.make(Answer, question=self.questions[0], owner=self.user)
+        comment = baker.make(Comment, answer=answer, owner=self.user)
+        baker.make(CommentReply, comment=comment, owner=self.user)
+
+
+class TestAsyncHome(AsyncViewsTestCase):
+    def test_same_as_home(self):
+        response = self.client.get(reverse('async:home'), {'page': 2, 'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        expected = self.client.get(reverse('home:home'), {'page': 2, 'limit': 5}).json()
+        self.assertEqual(response.json()['data'], expected['data'])
+        pagination = response.json()['pagination']
+        self.assertEqual((pagination['items_count'], pagination['pages_count']), (15, 3))
+        self.assertEqual(pagination['next_page'], 'http://testserver/async/?limit=5&page=3')
+
+    def test_cached(self):
+        self.assertEqual(self.client.get(reverse('async:home'))['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(reverse('async:home'))['X-Cache'], 'HIT')
+        bump_version(FEED_CACHE)
+        self.assertEqual(self.client.get(reverse('async:home'))['X-Cache'], 'MISS')
+
+    def test_count_cached(self):
+        self.client.get(reverse('async:home'), {'page': 1, 'limit': 5})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('async:home'), {'page': 2, 'limit': 5})
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+        # a new question starts a new generation of the counts.
+        baker.make(Question)
+        response = self.client.get(reverse('async:home'), {'page': 3, 'limit': 5})
+        self.assertEqual(response.json()['pagination']['items_count'], 16)
+
+    def test_not_modified(self):
+        etag = self.client.get(reverse('async:home'))['ETag']
+        self.assertEqual(self.client.get(reverse('home:home'))['ETag'], etag)
+        self.assertEqual(self.client.get(reverse('async:home'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_invalid_page(self):
+        response = self.client.get(reverse('async:home'), {'page': 9})
+        self.assertEqual((response.status_code, response.json()), (404, {'detail': 'Invalid page.'}))
+
+    def test_filters_served_by_home(self):
+        response = self.client.get(reverse('async:home'), {'owner': self.user.id, 'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pagination']['items_count'], 15)
+        expected = self.client.get(reverse('home:home'), {'owner': self.user.id, 'limit': 5}).json()
+        self.assertEqual(response.json()['data'], expected['data'])
+
+    def test_read_only(self):
+        self.assertEqual(self.client.post(reverse('async:home')).status_code, 405)
+
+
+class TestAsyncQuestionDetail(AsyncViewsTestCase):
+    def test_same_as_retrieve(self):
+        question = self.questions[0]
+        response = self.client.get(reverse('async:question-detail', args=[question.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.content, self.client.get(reverse('home:question-detail', args=[question.id])).content
+        )
+
+    def test_cached(self):
+        url = reverse('async:question-detail', args=[self.questions[0].id])
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        bump_version(get_thread_cache(self.questions[0].id))
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_not_found(self):
+        response = self.client.get(reverse('async:question-detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'No Question matches the given query.'})
+        self.assertEqual(self.client.get(reverse('async:question-detail', args=[0]))['X-Cache'], 'MISS')
+        response = self.client.get(reverse('async:question-detail', args=[0]), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+
+class TestAsyncMiddleware(AsyncViewsTestCase):
+    @override_settings(QUERY_PROFILING_SERVER_TIMING=True)
+    async def test_async_client(self):
+        response = await self.async_client.get(reverse('async:question-detail', args=[self.questions[0].id]))
+        self.assertEqual(response.status_code, 200)
+        # the queries run on the thread pool of the async ORM are profiled too.
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
@@ -0,0 +1,20 @@
+from django.test import SimpleTestCase
+
+from benchmarks.endpoints import DEFAULT_BASELINE, EXCLUDED, compare, get_endpoints, get_url_names
+
+
+class TestEndpointBenchmarks(SimpleTestCase):
+    def test_every_url_benchmarked(self):
+        names = {name.split()[1] for name in get_endpoints(None)}
+        self.assertEqual(get_url_names() - names - set(EXCLUDED), set())
+        self.assertEqual(names - get_url_names(), set())
+
+    def test_compare(self):
+        baseline = {**DEFAULT_BASELINE, 'sizes': {'small': {
+            'GET home:home': {'queries': 2, 'p50_ms': 10, 'p95_ms': 20, 'peak_memory_kb': 100},
+        }}}
+        measured = {'queries': 2, 'p50_ms': 19, 'p95_ms': 64, 'peak_memory_kb': 120, 'query_ms': 1}
+        results = {'small': {'rows': {}, 'endpoints': {'GET home:home': measured}}}
+        self.assertEqual(compare(results, baseline), [])
+        measured.update(queries=3, p50_ms=21)
+        self.assertEqual(len(compare(results, baseline)), 2)
@@ -0,0 +1,147 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from apps.home.export import export, get_watermark, iter_rows
+from apps.home.models import Question, Answer, Comment, Vote
+from apps.home.services import accept_answer, toggle_vote
+from apps.users.models import User
+
+
+# the rows of the tests are all written within the lag.
+@override_settings(EXPORT_WATERMARK_LAG=0)
+class ExportTestCase(APITestCase):
+    def setUp(self):
+        self.question = baker.make(Question, title='export, "quoted"')
+        self.answer = baker.make(Answer, question=self.question)
+        self.comment = baker.make(Comment, answer=self.answer)
+        self.vote = baker.make(Vote, answer=self.answer, is_like=True)
+
+    def read_ndjson(self, chunks):
+        return [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+
+
+class TestExport(ExportTestCase):
+    def test_ndjson(self):
+        rows = self.read_ndjson(export(['questions', 'answers', 'comments', 'votes']))
+        self.assertEqual([row['type'] for row in rows], ['questions', 'answers', 'comments', 'votes'])
+        self.assertEqual(rows[0]['title'], 'export, "quoted"')
+        self.assertEqual(rows[1]['question_id'], self.question.id)
+        self.assertTrue(rows[3]['is_like'])
+        self.assertTrue(rows[0]['modified'].endswith('Z'))
+
+    def test_csv(self):
+        content = ''.join(export(['questions'], file_format='csv'))
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'export, "quoted"')
+        with self.assertRaises(ValueError):
+            export(['questions', 'answers'], file_format='csv')
+
+    def test_chunks(self):
+        baker.make(Question, 4)
+        chunks = list(export(['questions'], chunk_size=2))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual([row['id'] for row in self.read_ndjson(chunks)], list(
+            Question.objects.order_by('modified', 'id').values_list('id', flat=True)
+        ))
+
+    def test_watermark(self):
+        watermark = timezone.now()
+        self.assertEqual(list(iter_rows('answers', since=watermark)), [])
+        self.answer.body = 'edited'
+        self.answer.save()
+        baker.make(Comment, answer=self.answer)
+        toggle_vote(owner=self.vote.owner, answer_id=self.answer.id, is_like=False)
+        rows = self.read_ndjson(export(['questions', 'answers', 'comments', 'votes'], since=watermark))
+        self.assertEqual([row['type'] for row in rows], ['answers', 'comments', 'votes'])
+        self.assertEqual(rows[0]['body'], 'edited')
+        self.assertTrue(rows[2]['is_dislike'])
+
+    def test_votes_count_exported(self):
+        watermark = timezone.now()
+        toggle_vote(owner=baker.make(User), answer_id=self.answer.id, is_like=True)
+        rows = list(iter_rows('answers', since=watermark))
+        self.assertEqual([(row['id'], row['likes_count']) for row in rows], [(self.answer.id, 1)])
+
+    def test_accepted_exported(self):
+        watermark = timezone.now()
+        accept_answer(user=self.question.owner, answer_id=self.answer.id)
+        rows = list(iter_rows('answers', since=watermark))
+        self.assertEqual([(row['id'], row['accepted']) for row in rows], [(self.answer.id, True)])
+
+    def test_votes_keep_modified(self):
+        # the answers of a thread are ordered by `modified`, a vote must not move them.
+        modified = self.answer.modified
+        toggle_vote(owner=baker.make(User), answer_id=self.answer.id, is_like=True)
+        accept_answer(user=self.question.owner, answer_id=self.answer.id)
+        self.answer.refresh_from_db()
+        self.assertEqual(self.answer.modified, modified)
+        self.assertGreater(self.answer.counters_modified, modified)
+
+    @override_settings(EXPORT_WATERMARK_LAG=60)
+    def test_watermark_lag(self):
+        # the rows of the last minute, of transactions maybe still open, are left to the next export.
+        watermark = get_watermark()
+        self.assertEqual(list(iter_rows('answers', until=watermark)), [])
+        self.assertEqual(len(list(iter_rows('answers', since=watermark))), 1)
+
+    def test_until(self):
+        self.assertEqual(list(iter_rows('votes', until=timezone.now() - timedelta(days=1))), [])
+
+
+class TestExportAPI(ExportTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('home:export')
+        self.client.force_authenticate(baker.make(User, is_admin=True))
+
+    def test_export_GET(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(self.read_ndjson(response.streaming_content)), 4)
+
+    def test_incremental_export(self):
+        watermark = self.client.get(self.url)['X-Export-Watermark']
+        baker.make(Answer, question=self.question)
+        response = self.client.get(self.url, {'since': watermark})
+        self.assertEqual([row['type'] for row in self.read_ndjson(response.streaming_content)], ['answers'])
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {'type': 'comments', 'file_format': 'csv'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="comments.csv"')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[1][0], str(self.comment.id))
+        self.assertEqual(self.client.get(self.url, {'file_format': 'csv'}).status_code, 400)
+
+    def test_not_admin(self):
+        self.client.force_authenticate(baker.make(User))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class TestExportCommand(ExportTestCase):
+    def test_export_forum(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('export_forum', '--type', 'votes', stdout=out, stderr=err)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.vote.id])
+        self.assertIn('watermark: ', err.getvalue())
+
+    def test_export_forum_since(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('export_forum', '--format', 'csv', '--type', 'questions', stdout=out, stderr=err)
+        watermark = err.getvalue().split('watermark: ')[1].strip()
+        out = io.StringIO()
+        call_command('export_forum', '--format', 'csv', '--type', 'questions', '--since', watermark, stdout=out,
+                     stderr=io.StringIO())
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
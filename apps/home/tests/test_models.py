@@ -1,3 +1,4 @@
+from django.db import IntegrityError
 from model_bakery import baker
 from rest_framework.test import APITestCase
 
@@ -40,6 +41,12 @@ class TestAnswer(APITestCase):
     def test_answer_short_body(self):
         self.assertEqual(self.answer.short_body, 'test...')
 
+    def test_one_accepted_answer(self):
+        baker.make(models.Answer, question=self.answer.question, accepted=False)
+        baker.make(models.Answer, question=self.answer.question, accepted=True)
+        with self.assertRaises(IntegrityError):
+            baker.make(models.Answer, question=self.answer.question, accepted=True)
+
 
 class AnswerCommentTest(APITestCase):
     def setUp(self):
@@ -59,6 +66,13 @@ class CommentReplyTest(APITestCase):
     def test_comment_str(self):
         self.assertEqual(str(self.reply), 'username - test...')
 
+    def test_reply_save(self):
+        child = baker.make(models.CommentReply, reply=self.reply)
+        grandchild = baker.make(models.CommentReply, reply=child)
+        self.assertEqual((self.reply.depth, self.reply.path), (0, ''))
+        self.assertEqual((child.depth, child.path), (1, f'{self.reply.id}/'))
+        self.assertEqual((grandchild.depth, grandchild.path), (2, f'{self.reply.id}/{child.id}/'))
+
 
 class TagTest(APITestCase):
     def setUp(self):
@@ -74,11 +88,14 @@ class TagTest(APITestCase):
 
 class VoteTest(APITestCase):
     def setUp(self):
-        user = baker.make(User, is_active=True)
         answer = baker.make(models.Answer)
-        self.like = baker.make(models.Vote, is_like=True, owner=user, answer=answer)
-        self.dislike = baker.make(models.Vote, is_dislike=True, owner=user, answer=answer)
+        self.like = baker.make(models.Vote, is_like=True, answer=answer)
+        self.dislike = baker.make(models.Vote, is_dislike=True, answer=answer)
 
     def test_vote_str(self):
         self.assertEqual(str(self.like), 'Like')
         self.assertEqual(str(self.dislike), 'Dislike')
+
+    def test_vote_unique(self):
+        with self.assertRaises(IntegrityError):
+            baker.make(models.Vote, is_dislike=True, owner=self.like.owner, answer=self.like.answer)
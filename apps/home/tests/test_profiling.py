@@ -0,0 +1,110 @@
+import json
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from apps.users.models import User, UserProfile
+from utils.profiling import QueryProfile, get_template, get_view_metrics, reset_view_metrics
+
+
+class ProfilingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reset_view_metrics()
+        self.admin = baker.make(User, is_admin=True, is_active=True)
+        for user in baker.make(User, 8, is_active=True):
+            baker.make(UserProfile, owner=user)
+
+    def get_users(self):
+        # the user list reads the profile of every user with its own queries.
+        self.client.force_authenticate(self.admin)
+        return self.client.get(reverse('users:users-list'))
+
+
+class TestQueryProfile(ProfilingTestCase):
+    def test_template(self):
+        self.assertEqual(
+            get_template('SELECT * FROM t WHERE id IN (%s, %s, %s) AND x = %s'),
+            'SELECT * FROM t WHERE id IN (%s, ...) AND x = %s'
+        )
+
+    def test_profile(self):
+        from django.db import connection
+
+        profile = QueryProfile()
+        with connection.execute_wrapper(profile):
+            User.objects.count()
+            for size in range(2, 11):
+                list(User.objects.filter(id__in=range(size)))
+        self.assertEqual(profile.count, 10)
+        self.assertEqual(len(profile.get_repeated(5)), 1)
+        self.assertEqual(profile.get_repeated(5)[0][1], 9)
+        self.assertEqual(profile.get_repeated(9), [])
+        self.assertEqual(len(profile.get_slowest(limit=1)), 1)
+
+
+@override_settings(QUERY_PROFILING_SERVER_TIMING=True)
+class TestQueryProfilingMiddleware(ProfilingTestCase):
+    def test_server_timing(self):
+        response = self.client.get(reverse('home:home'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$')
+
+    @override_settings(QUERY_PROFILING_SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('home:home')))
+
+    @override_settings(QUERY_PROFILING_SAMPLE_RATE=1)
+    def test_n_plus_one_logged(self):
+        with self.assertLogs('utils.profiling', 'INFO') as logs:
+            response = self.get_users()
+        self.assertIn('n-plus-one;desc=', response['Server-Timing'])
+        trace = json.loads(logs.records[0].getMessage())
+        self.assertEqual(trace['event'], 'n_plus_one')
+        self.assertEqual(trace['view'], 'users:users-list')
+        self.assertGreater(trace['n_plus_one'][0]['count'], 5)
+        self.assertTrue(trace['slowest'])
+
+    @override_settings(QUERY_PROFILING_SAMPLE_RATE=1, QUERY_PROFILING_SLOW_REQUEST_MS=0)
+    def test_slow_request_logged(self):
+        with self.assertLogs('utils.profiling', 'INFO') as logs:
+            self.client.get(reverse('home:tag-tree'))
+        trace = json.loads(logs.records[0].getMessage())
+        self.assertEqual((trace['event'], trace['path'], trace['status']), ('slow_request', '/tags/tree/', 200))
+
+    @override_settings(QUERY_PROFILING_SAMPLE_RATE=0, QUERY_PROFILING_SLOW_REQUEST_MS=0)
+    def test_sampled_out(self):
+        with self.assertNoLogs('utils.profiling', 'INFO'):
+            self.get_users()
+
+    @override_settings(QUERY_PROFILING=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('home:home')))
+
+
+class TestMetricsAPI(ProfilingTestCase):
+    def test_view_metrics(self):
+        self.client.get(reverse('home:home'))
+        self.client.get(reverse('home:home'))
+        self.get_users()
+        metrics = {view['view']: view for view in get_view_metrics()}
+        self.assertEqual(metrics['home:home']['requests'], 2)
+        self.assertEqual(metrics['users:users-list']['n_plus_one'], 1)
+        self.assertEqual(metrics['users:users-list']['avg_queries'], metrics['users:users-list']['queries'])
+
+    def test_metrics_GET(self):
+        self.get_users()
+        response = self.client.get(reverse('home:metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([view['view'] for view in response.data], ['users:users-list'])
+
+    def test_metrics_DELETE(self):
+        self.get_users()
+        self.assertEqual(self.client.delete(reverse('home:metrics')).status_code, 200)
+        self.assertNotIn('users:users-list', [view['view'] for view in get_view_metrics()])
+
+    def test_not_admin(self):
+        self.client.force_authenticate(baker.make(User))
+        self.assertEqual(self.client.get(reverse('home:metrics')).status_code, 403)
@@ -0,0 +1,104 @@
+import json
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from apps.home.models import Tag, Question, Answer, Comment, CommentReply
+from apps.home.services import toggle_vote
+from apps.users.models import User
+from utils.renderers import FastJSONRenderer
+
+
+class TestFastJSONRenderer(APITestCase):
+    def assertRendersLikeJSONRenderer(self, data, media_type=None):
+        self.assertEqual(FastJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type))
+
+    def test_strings(self):
+        self.assertRendersLikeJSONRenderer({'text': ''.join(chr(i) for i in range(0x3000))})
+        self.assertRendersLikeJSONRenderer(['   ', 'سلام', '😀', '"\\/</script>'])
+
+    def test_values(self):
+        self.assertRendersLikeJSONRenderer({'a': [1, -2, 2 ** 63, 2 ** 70, True, False, None, {}, []]})
+        self.assertRendersLikeJSONRenderer(Question(created=None).created)
+
+    def test_encoder_types(self):
+        from datetime import datetime, timezone
+        from decimal import Decimal
+        from uuid import uuid4
+        self.assertRendersLikeJSONRenderer({
+            'datetime': datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc),
+            'decimal': Decimal('1.10'),
+            'uuid': uuid4(),
+            'set': {1},
+        })
+
+    def test_indent(self):
+        self.assertRendersLikeJSONRenderer({'a': [1]}, 'application/json; indent=4')
+
+    def test_not_serializable(self):
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({'a': object()})
+
+
+class TestProjectionParity(APITestCase):
+    """The fast read path must render the very same bytes as the serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            baker.make(User, username='sara', email='sara@example.com', is_active=True),
+            baker.make(User, username='علی ', email='ali@example.com', is_active=True),
+        ]
+        tags = [baker.make(Tag, name=name) for name in ('python', 'django', 'orm')]
+        cls.question = baker.make(Question, owner=users[0], title='How do I "escape" ' + 'x' * 40, body='😀 body')
+        cls.question.tag.set(tags[:2])
+        baker.make(Question, owner=users[1], _quantity=12)
+        answers = baker.make(Answer, question=cls.question, owner=users[1], body='a' * 30, _quantity=3)
+        toggle_vote(owner=users[0], answer_id=answers[0].id, is_like=True)
+        toggle_vote(owner=users[1], answer_id=answers[1].id, is_like=False)
+        for answer in answers[:2]:
+            for comment in baker.make(Comment, answer=answer, owner=users[0], body='c' * 25, _quantity=2):
+                parent = None
+                for depth in range(3):
+                    parent = baker.make(CommentReply, comment=comment, reply=parent, owner=users[depth % 2])
+                baker.make(CommentReply, comment=comment, owner=users[1])
+
+    def setUp(self):
+        cache.clear()
+
+    def assertSameResponse(self, url, data=None):
+        with override_settings(FAST_READ_PATH=False):
+            cache.clear()
+            expected = self.client.get(url, data)
+        cache.clear()
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_home(self):
+        self.assertSameResponse(reverse('home:home'))
+        self.assertSameResponse(reverse('home:home'), {'page': 2, 'limit': 5})
+        self.assertSameResponse(reverse('home:home'), {'tag': Tag.objects.get(name='django').id})
+
+    def test_home_cursor(self):
+        response = self.assertSameResponse(reverse('home:home'), {'pagination': 'cursor', 'limit': 5})
+        next_page = json.loads(response.content)['pagination']['next_page']
+        self.assertSameResponse(next_page)
+
+    def test_question_list(self):
+        self.assertSameResponse(reverse('home:question-list'))
+        self.assertSameResponse(reverse('home:question-list'), {'owner': self.question.owner_id})
+
+    def test_question_detail(self):
+        response = self.assertSameResponse(reverse('home:question-detail', args=[self.question.id]))
+        self.assertEqual(len(response.data['answers']), 3)
+        self.assertSameResponse(reverse('home:question-detail', args=[0]))
+
+    @override_settings(REPLY_TREE_MAX_CHILDREN=1)
+    def test_question_detail_truncated_replies(self):
+        self.assertSameResponse(reverse('home:question-detail', args=[self.question.id]))
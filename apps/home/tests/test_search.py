@@ -0,0 +1,67 @@
+from io import StringIO
+
+from django.core.management import call_command
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from apps.home.models import Question, Answer, SearchDocument
+from apps.home.search import search, filter_questions
+
+
+class TestSearch(APITestCase):
+    def setUp(self):
+        self.question = baker.make(Question, title='django migrations', body='how do migrations work?')
+        self.other = baker.make(Question, title='celery workers', body='workers do not start after django')
+        self.answer = baker.make(Answer, question=self.other, body='restart the workers with the celery command')
+
+    def test_search_ranking(self):
+        results = search('django')
+        self.assertEqual([r['question_id'] for r in results], [self.question.id, self.other.id])
+        self.assertEqual(results[0]['title'], '<mark>django</mark> migrations')
+        self.assertIsNone(results[0]['answer_id'])
+
+    def test_search_answers(self):
+        results = search('restart command')
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['answer_id'], self.answer.id)
+        self.assertIn('<mark>restart</mark>', results[0]['snippet'])
+
+    def test_search_stemming(self):
+        self.assertEqual(len(search('migration')), 1)
+
+    def test_search_special_characters(self):
+        self.assertEqual(search('"django*'), search('django'))
+        self.assertEqual(search('!!!'), [])
+
+    def test_search_escaped(self):
+        question = baker.make(
+            Question, title='<b>xss</b> title', body='<script>alert(1)</script> xss \ue000<img src=x>\ue001'
+        )
+        result, = search('xss')
+        self.assertEqual(result['question_id'], question.id)
+        self.assertEqual(result['title'], '&lt;b&gt;<mark>xss</mark>&lt;/b&gt; title')
+        self.assertEqual(
+            result['snippet'], '&lt;script&gt;alert(1)&lt;/script&gt; <mark>xss</mark> &lt;img src=x&gt;'
+        )
+
+    def test_index_updated(self):
+        self.question.title = 'postgres tuning'
+        self.question.save()
+        self.assertEqual(search('django')[0]['question_id'], self.other.id)
+        self.assertEqual(search('postgres')[0]['question_id'], self.question.id)
+
+    def test_index_deleted(self):
+        self.other.delete()
+        self.assertEqual(search('workers'), [])
+        self.assertEqual(SearchDocument.objects.count(), 1)
+
+    def test_filter_questions(self):
+        questions = filter_questions(Question.objects.all(), 'workers')
+        self.assertEqual(list(questions), [self.other])
+
+    def test_rebuild_index(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(search('django'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(search('django')), 2)
+        self.assertEqual(SearchDocument.objects.count(), 3)
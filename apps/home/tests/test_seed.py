@@ -0,0 +1,86 @@
+import random
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, F, Max, Q, Sum
+from rest_framework.test import APITestCase
+
+from apps.home.models import Question, Answer, CommentReply, SearchDocument, Tag, TagClosure, Vote
+from apps.home.seed import ForumSeeder, ZipfSampler
+from apps.users.models import ReputationEvent, User, UserProfile
+
+SIZES = dict(users=20, tags=10, questions=40, answers=100, comments=80, replies=120, votes=300, batch_size=50)
+
+
+class TestZipfSampler(APITestCase):
+    def test_deterministic(self):
+        first = ZipfSampler(random.Random(1), 50, 1.1).distribute(1000)
+        second = ZipfSampler(random.Random(1), 50, 1.1).distribute(1000)
+        self.assertEqual(first, second)
+        self.assertEqual(sum(first), 1000)
+
+    def test_skew(self):
+        counts = ZipfSampler(random.Random(0), 100, 1.5).distribute(10000)
+        self.assertGreater(counts[0], counts[9] * 10)
+        uniform = ZipfSampler(random.Random(0), 100, 0).distribute(10000)
+        self.assertLess(max(uniform), counts[0])
+
+
+class TestForumSeeder(APITestCase):
+    def test_counts(self):
+        written = ForumSeeder(**SIZES).run()
+        self.assertEqual(User.objects.count(), written['users'])
+        self.assertEqual(Question.objects.count(), 40)
+        self.assertEqual(Answer.objects.count(), 100)
+        self.assertEqual(CommentReply.objects.count(), 120)
+        self.assertEqual(UserProfile.objects.count(), 20)
+        self.assertEqual(Vote.objects.count(), written['votes'])
+        self.assertEqual(SearchDocument.objects.count(), 140)
+
+    def test_deterministic(self):
+        ForumSeeder(**SIZES, seed=3).run()
+        first = list(CommentReply.objects.order_by('id').values_list('owner__username', 'depth', 'body', 'created'))
+        CommentReply.objects.all().delete()
+        ForumSeeder(**SIZES, seed=3, prefix='again').run()
+        second = list(CommentReply.objects.order_by('id').values_list('owner__username', 'depth', 'body', 'created'))
+        self.assertEqual(
+            [(username.replace('again', 'seed'), *rest) for username, *rest in second[:len(first)]], first
+        )
+
+    def test_integrity(self):
+        ForumSeeder(**SIZES).run()
+        for reply in CommentReply.objects.filter(reply__isnull=False).select_related('reply'):
+            self.assertEqual(reply.path, reply.reply.descendants_path)
+            self.assertEqual(reply.depth, reply.reply.depth + 1)
+            self.assertEqual(reply.comment_id, reply.reply.comment_id)
+            self.assertGreaterEqual(reply.created, reply.reply.created)
+        self.assertFalse(Answer.objects.annotate(
+            likes=Count('votes', filter=Q(votes__is_like=True)),
+            dislikes=Count('votes', filter=Q(votes__is_dislike=True)),
+        ).exclude(likes_count=F('likes'), dislikes_count=F('dislikes')).exists())
+        self.assertEqual(
+            UserProfile.objects.aggregate(total=Sum('score'))['total'],
+            ReputationEvent.objects.aggregate(total=Sum('points'))['total'] or 0,
+        )
+        self.assertEqual(TagClosure.objects.filter(depth=0).count(), Tag.objects.count())
+        self.assertEqual(
+            Tag.objects.aggregate(total=Sum('questions_count'))['total'], Question.tag.through.objects.count()
+        )
+        self.assertTrue(User.objects.get(username='seed0').check_password('password'))
+
+    def test_ids_continue(self):
+        ForumSeeder(**SIZES).run()
+        last = Question.objects.aggregate(last=Max('id'))['last']
+        question = Question.objects.create(owner=User.objects.first(), title='after', body='seed', slug='after')
+        self.assertEqual(question.id, last + 1)
+
+    def test_posts_need_users(self):
+        with self.assertRaises(ValueError):
+            ForumSeeder(users=0).run()
+
+    def test_seed_forum_command(self):
+        out = StringIO()
+        call_command('seed_forum', '--users', '5', '--questions', '10', '--answers', '20', '--comments', '10',
+                     '--replies', '10', '--votes', '20', '--tags', '3', stdout=out)
+        self.assertIn('5 users', out.getvalue())
+        self.assertIn('10 questions', out.getvalue())
@@ -6,7 +6,6 @@ from apps.home.models import (
     Question,
     Comment,
     Answer,
-    Vote,
     CommentReply
 )
 from apps.home.serializers import (
@@ -15,6 +14,7 @@ from apps.home.serializers import (
     CommentSerializer,
     ReplyCommentSerializer
 )
+from apps.home.services import toggle_vote
 from apps.users.models import User
 
 
@@ -84,20 +84,25 @@ class TestAnswerSerializer(APITestCase):
         self.assertEqual(data[0]['body'], 'second comment')
         self.assertEqual(data[1]['body'], 'first comment')
 
+    def vote(self, answer, is_like):
+        toggle_vote(owner=baker.make(User), answer_id=answer.id, is_like=is_like)
+
     def test_get_likes(self):
         answer = baker.make(Answer)
-        baker.make(Vote, answer=answer, is_like=True)
-        baker.make(Vote, answer=answer, is_like=True)
-        baker.make(Vote, answer=answer, is_dislike=True)
+        self.vote(answer, is_like=True)
+        self.vote(answer, is_like=True)
+        self.vote(answer, is_like=False)
+        answer.refresh_from_db()
         serializer = AnswerSerializer(instance=answer)
         self.assertEqual(serializer.data['likes'], 2)
         self.assertEqual(serializer.data['dislikes'], 1)
 
     def test_get_dislikes(self):
         answer = baker.make(Answer)
-        baker.make(Vote, answer=answer, is_like=True)
-        baker.make(Vote, answer=answer, is_dislike=True)
-        baker.make(Vote, answer=answer, is_dislike=True)
+        self.vote(answer, is_like=True)
+        self.vote(answer, is_like=False)
+        self.vote(answer, is_like=False)
+        answer.refresh_from_db()
         serializer = AnswerSerializer(instance=answer)
         self.assertEqual(serializer.data['likes'], 1)
         self.assertEqual(serializer.data['dislikes'], 2)
@@ -146,10 +151,11 @@ class TestReplyCommentSerializer(APITestCase):
         self.assertEqual(len(serializer.errors), 1)
 
     def test_get_replies(self):
-        reply = baker.make(CommentReply)
-        baker.make(CommentReply, reply=reply, body='test_body')
-        baker.make(CommentReply, reply=reply, body='test_body2')
+        reply = baker.make(CommentReply, comment=self.comment)
+        baker.make(CommentReply, comment=self.comment, reply=reply, body='test_body')
+        baker.make(CommentReply, comment=self.comment, reply=reply, body='test_body2')
         data = ReplyCommentSerializer(instance=reply).data['replies']
         self.assertEqual(len(data), 2)
+        self.assertEqual(list(data[0]), ['id', 'replies', 'owner', 'comment', 'reply', 'body', 'created', 'modified'])
         self.assertEqual(data[0]['body'], 'test_body2')
         self.assertEqual(data[1]['body'], 'test_body')
@@ -0,0 +1,266 @@
+from io import StringIO
+
+import time
+from threading import Barrier, Thread
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.exceptions import PermissionDenied
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from apps.home.models import Question, Answer, Comment, CommentReply, Tag, Vote
+from apps.home.services import (
+    accept_answer,
+    get_reply_forest,
+    get_reply_subtree,
+    get_thread_cache,
+    rebuild_votes_count,
+    toggle_vote,
+)
+from apps.users.models import ReputationEvent, User, UserProfile
+from apps.users.reputation import fold_events
+from utils.cache import get_version
+
+
+class TestToggleVote(APITestCase):
+    def setUp(self):
+        self.user = baker.make(User, is_active=True)
+        self.answer = baker.make(Answer)
+
+    def assertVotesCount(self, likes, dislikes):
+        self.answer.refresh_from_db()
+        self.assertEqual(self.answer.likes_count, likes)
+        self.assertEqual(self.answer.dislikes_count, dislikes)
+
+    def test_like(self):
+        self.assertTrue(toggle_vote(owner=self.user, answer_id=self.answer.id, is_like=True))
+        self.assertVotesCount(1, 0)
+        self.assertTrue(Vote.objects.filter(owner=self.user, answer=self.answer, is_like=True).exists())
+
+    def test_remove_like(self):
+        toggle_vote(owner=self.user, answer_id=self.answer.id, is_like=True)
+        self.assertFalse(toggle_vote(owner=self.user, answer_id=self.answer.id, is_like=True))
+        self.assertVotesCount(0, 0)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_switch_vote(self):
+        toggle_vote(owner=self.user, answer_id=self.answer.id, is_like=True)
+        self.assertTrue(toggle_vote(owner=self.user, answer_id=self.answer.id, is_like=False))
+        self.assertVotesCount(0, 1)
+        self.assertEqual(Vote.objects.get().is_dislike, True)
+
+    def test_deleted_vote_uncounted(self):
+        toggle_vote(owner=self.user, answer_id=self.answer.id, is_like=False)
+        # as the admin deletes it.
+        Vote.objects.get().delete()
+        self.assertVotesCount(0, 0)
+        kinds = ReputationEvent.objects.filter(user_id=self.answer.owner_id).values_list('kind', 'points')
+        self.assertEqual(list(kinds), [('dislike', -1), ('undo', 1)])
+
+    def test_deleted_voter_uncounted(self):
+        toggle_vote(owner=self.user, answer_id=self.answer.id, is_like=True)
+        self.user.delete()
+        self.assertVotesCount(0, 0)
+        kinds = ReputationEvent.objects.filter(user_id=self.answer.owner_id).values_list('kind', 'points')
+        self.assertEqual(list(kinds), [('like', 1), ('undo', -1)])
+
+    def test_deleted_answer_owner(self):
+        toggle_vote(owner=self.user, answer_id=self.answer.id, is_like=True)
+        # the ledger of the owner goes with it, the cascaded vote records nothing for them.
+        self.answer.owner.delete()
+        self.assertFalse(ReputationEvent.objects.exists())
+        self.assertFalse(Vote.objects.exists())
+
+    def test_invalid_answer(self):
+        with self.assertRaises(Answer.DoesNotExist):
+            toggle_vote(owner=self.user, answer_id=self.answer.id + 1, is_like=True)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_like_queries(self):
+        # the two writes of a vote, to Vote and to Answer, after one locking read of the answer with its owner,
+        # question and the vote, plus the insert to the reputation ledger, wrapped in a savepoint.
+        with self.assertNumQueries(6):
+            toggle_vote(owner=self.user, answer_id=self.answer.id, is_like=True)
+
+    def test_switch_queries(self):
+        toggle_vote(owner=self.user, answer_id=self.answer.id, is_like=True)
+        # the same, the undo and the new vote go to the ledger in one insert.
+        with self.assertNumQueries(6):
+            toggle_vote(owner=self.user, answer_id=self.answer.id, is_like=False)
+
+
+class TestRebuildVotesCountCommand(APITestCase):
+    def test_rebuild(self):
+        answer = baker.make(Answer, likes_count=7, dislikes_count=7)
+        empty_answer = baker.make(Answer, likes_count=3)
+        baker.make(Vote, 2, answer=answer, is_like=True)
+        baker.make(Vote, answer=answer, is_dislike=True)
+        call_command('rebuild_votes_count', stdout=StringIO())
+        answer.refresh_from_db()
+        empty_answer.refresh_from_db()
+        self.assertEqual((answer.likes_count, answer.dislikes_count), (2, 1))
+        self.assertEqual((empty_answer.likes_count, empty_answer.dislikes_count), (0, 0))
+
+    def test_threads_bumped(self):
+        answer, fixed = baker.make(Answer), baker.make(Answer, likes_count=3)
+        versions = [get_version(get_thread_cache(answer.question_id)), get_version(get_thread_cache(fixed.question_id))]
+        rebuild_votes_count()
+        self.assertEqual(get_version(get_thread_cache(answer.question_id)), versions[0])
+        self.assertNotEqual(get_version(get_thread_cache(fixed.question_id)), versions[1])
+
+
+class TestAcceptAnswer(APITestCase):
+    def setUp(self):
+        self.user = baker.make(User, is_active=True)
+        self.question = baker.make(Question, owner=self.user)
+        self.profile = baker.make(UserProfile, score=3)
+        self.answer = baker.make(Answer, question=self.question, owner=self.profile.owner)
+
+    def test_accept(self):
+        # the read, the update and the ledger insert, the transaction and the savepoint of the update.
+        with self.assertNumQueries(7):
+            self.assertTrue(accept_answer(user=self.user, answer_id=self.answer.id))
+        self.answer.refresh_from_db()
+        self.assertTrue(self.answer.accepted)
+        self.assertTrue(ReputationEvent.objects.filter(user=self.profile.owner, kind=ReputationEvent.ACCEPT).exists())
+        fold_events()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.score, 4)
+
+    def test_accept_twice(self):
+        accept_answer(user=self.user, answer_id=self.answer.id)
+        self.assertFalse(accept_answer(user=self.user, answer_id=self.answer.id))
+        other = baker.make(Answer, question=self.question)
+        self.assertFalse(accept_answer(user=self.user, answer_id=other.id))
+        fold_events()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.score, 4)
+
+    def test_not_question_owner(self):
+        with self.assertRaises(PermissionDenied):
+            accept_answer(user=self.profile.owner, answer_id=self.answer.id)
+
+    def test_not_found(self):
+        with self.assertRaises(Answer.DoesNotExist):
+            accept_answer(user=self.user, answer_id=0)
+
+
+class TestAcceptAnswerConcurrency(TransactionTestCase):
+    threads = 8
+
+    def call(self, func, **kwargs):
+        while True:
+            try:
+                return func(**kwargs)
+            except OperationalError as e:
+                # the in-memory SQLite test database fails on lock conflicts instead of waiting, try again.
+                if 'locked' not in str(e):
+                    raise
+                time.sleep(0.01)
+
+    def run_concurrently(self, target, count):
+        barrier = Barrier(count)
+        errors = []
+
+        def run(i):
+            try:
+                barrier.wait()
+                target(i)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_accepts(self):
+        user = baker.make(User, is_active=True)
+        question = baker.make(Question, owner=user)
+        profiles = baker.make(UserProfile, _quantity=self.threads)
+        answers = [baker.make(Answer, question=question, owner=profile.owner) for profile in profiles]
+        results = []
+
+        def click(i):
+            # every thread accepts the first answer and then its own one.
+            for answer in (answers[0], answers[i]):
+                results.append(self.call(accept_answer, user=user, answer_id=answer.id))
+
+        self.run_concurrently(click, self.threads)
+        self.assertEqual(len(results), self.threads * 2)
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(ReputationEvent.objects.filter(kind=ReputationEvent.ACCEPT).count(), 1)
+        fold_events()
+        accepted = Answer.objects.get(question=question, accepted=True)
+        self.assertEqual(
+            {profile.owner_id: profile.score for profile in UserProfile.objects.all()},
+            {profile.owner_id: int(profile.owner_id == accepted.owner_id) for profile in profiles},
+        )
+
+
+class TestExplainQueriesCommand(APITestCase):
+    def setUp(self):
+        user = baker.make(User, is_active=True)
+        questions = baker.make(Question, owner=user, tag=[baker.make(Tag)], _quantity=15)
+        answer = baker.make(Answer, question=questions[0], owner=user)
+        baker.make(CommentReply, comment__answer=answer)
+        baker.make(Vote, answer=answer, owner=user)
+
+    def test_no_sequential_scan(self):
+        out = StringIO()
+        call_command('explain_queries', threshold=0, stdout=out)
+        self.assertIn('no sequential scan', out.getvalue())
+
+    @patch('apps.home.management.commands.explain_queries.get_querysets')
+    def test_sequential_scan(self, get_querysets):
+        get_querysets.return_value = [Question.objects.filter(body='body').order_by()]
+        with self.assertRaisesMessage(CommandError, 'sequential scan of home_question (15 rows)'):
+            call_command('explain_queries', threshold=10, stdout=StringIO())
+        call_command('explain_queries', threshold=15, stdout=StringIO())
+
+
+class TestReplyTree(APITestCase):
+    def setUp(self):
+        self.comment = baker.make(Comment)
+        self.chain = []
+        reply = None
+        for _ in range(4):
+            reply = baker.make(CommentReply, comment=self.comment, reply=reply)
+            self.chain.append(reply)
+        baker.make(CommentReply, 3, comment=self.comment, reply=self.chain[0])
+
+    def test_forest_single_query(self):
+        with self.assertNumQueries(1):
+            roots = get_reply_forest(self.comment)
+            node = roots[0]
+            while node.thread_replies:
+                node = node.thread_replies[-1]
+        self.assertEqual(len(roots), 1)
+        self.assertEqual(len(roots[0].thread_replies), 4)
+        self.assertEqual(node, self.chain[-1])
+
+    def test_forest_max_depth(self):
+        roots = get_reply_forest(self.comment, max_depth=2)
+        self.assertEqual(len(roots[0].thread_replies), 4)
+        self.assertTrue(all(child.thread_replies == [] for child in roots[0].thread_replies))
+
+    def test_forest_max_children(self):
+        roots = get_reply_forest(self.comment, max_children=2)
+        self.assertEqual(len(roots[0].thread_replies), 2)
+
+    def test_subtree(self):
+        with self.assertNumQueries(1) as queries:
+            children = get_reply_subtree(self.chain[1])
+        # scoped to the comment, the leading column of `reply_comment_tree_idx`.
+        self.assertIn('"comment_id" =', queries.captured_queries[0]['sql'])
+        self.assertEqual(children, [self.chain[2]])
+        self.assertEqual(children[0].thread_replies, [self.chain[3]])
+        self.assertEqual(get_reply_subtree(self.chain[1], max_depth=1)[0].thread_replies, [])
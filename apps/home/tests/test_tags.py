@@ -0,0 +1,250 @@
+import time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from apps.home import tags
+from apps.home.models import Question, Tag, TagClosure
+from apps.home.tags import (
+    build_tag_tree,
+    filter_questions_by_tree,
+    get_tag_tree,
+    get_trending,
+    rebuild_closure,
+    record_tagging,
+    rollup_trending,
+)
+
+
+class TagTreeTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # python > django > orm, python > flask and a separate rust tree.
+        self.python = baker.make(Tag, name='python')
+        self.django = baker.make(Tag, name='django', sub_tag=self.python)
+        self.orm = baker.make(Tag, name='orm', sub_tag=self.django)
+        self.flask = baker.make(Tag, name='flask', sub_tag=self.python)
+        self.rust = baker.make(Tag, name='rust')
+
+    def get_closure(self):
+        return set(TagClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def get_descendants(self, tag):
+        return set(TagClosure.objects.filter(ancestor=tag).values_list('descendant_id', flat=True))
+
+
+class TestTagClosure(TagTreeTestCase):
+    def test_closure_on_create(self):
+        self.assertEqual(
+            self.get_descendants(self.python), {self.python.id, self.django.id, self.orm.id, self.flask.id}
+        )
+        self.assertEqual(
+            set(TagClosure.objects.filter(descendant=self.orm).values_list('ancestor_id', 'depth')),
+            {(self.orm.id, 0), (self.django.id, 1), (self.python.id, 2)}
+        )
+
+    def test_closure_on_move(self):
+        self.django.sub_tag = self.rust
+        self.django.save()
+        self.assertEqual(self.get_descendants(self.python), {self.python.id, self.flask.id})
+        self.assertEqual(self.get_descendants(self.rust), {self.rust.id, self.django.id, self.orm.id})
+        self.assertIn((self.rust.id, self.orm.id, 2), self.get_closure())
+
+    def test_closure_on_move_to_root(self):
+        django = Tag.objects.get(id=self.django.id)
+        django.sub_tag = None
+        django.save()
+        self.assertEqual(self.get_descendants(self.python), {self.python.id, self.flask.id})
+        self.assertEqual(self.get_descendants(self.django), {self.django.id, self.orm.id})
+
+    def test_closure_unchanged_on_rename(self):
+        closure = self.get_closure()
+        django = Tag.objects.get(id=self.django.id)
+        django.name = 'django rest framework'
+        # the update and the savepoint around it.
+        with self.assertNumQueries(3):
+            django.save(update_fields=['name', 'slug'])
+        self.assertEqual(self.get_closure(), closure)
+
+    def test_move_under_descendant(self):
+        self.python.sub_tag = self.orm
+        with self.assertRaises(ValidationError):
+            self.python.save()
+        self.python.refresh_from_db()
+        self.assertIsNone(self.python.sub_tag_id)
+
+    def test_closure_on_delete(self):
+        self.django.delete()
+        self.assertFalse(Tag.objects.filter(id=self.orm.id).exists())
+        self.assertEqual(self.get_descendants(self.python), {self.python.id, self.flask.id})
+        self.assertFalse(TagClosure.objects.filter(descendant_id__in=[self.django.id, self.orm.id]).exists())
+
+    def test_rebuild_closure(self):
+        closure = self.get_closure()
+        TagClosure.objects.filter(descendant=self.orm).delete()
+        Tag.objects.filter(id=self.flask.id).update(sub_tag=self.rust)
+        self.assertEqual(rebuild_closure(), len(closure))
+        self.assertEqual(
+            self.get_closure(),
+            closure - {(self.python.id, self.flask.id, 1)} | {(self.rust.id, self.flask.id, 1)}
+        )
+
+    def test_rebuild_tag_tree_command(self):
+        out = StringIO()
+        call_command('rebuild_tag_tree', stdout=out)
+        self.assertIn('Rebuilt 9 tag closure rows.', out.getvalue())
+
+
+class TestTagTreeFilter(TagTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.orm_question = baker.make(Question, tag=[self.orm])
+        self.flask_question = baker.make(Question, tag=[self.flask, self.python])
+        self.rust_question = baker.make(Question, tag=[self.rust])
+
+    def test_filter_subtree(self):
+        questions = filter_questions_by_tree(Question.objects.all(), self.python.id)
+        self.assertCountEqual(questions, [self.orm_question, self.flask_question])
+        questions = filter_questions_by_tree(Question.objects.all(), self.django.id)
+        self.assertCountEqual(questions, [self.orm_question])
+
+    def test_filter_one_join(self):
+        sql = str(filter_questions_by_tree(Question.objects.all(), self.python.id).query)
+        self.assertEqual(sql.upper().count('JOIN'), 1)
+
+    def test_home_filter(self):
+        response = self.client.get(reverse('home:home'), {'tag_tree': self.python.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(
+            [question['id'] for question in response.data['data']], [self.orm_question.id, self.flask_question.id]
+        )
+        self.assertEqual(response.data['pagination']['items_count'], 2)
+
+    def test_home_filter_moved(self):
+        self.client.get(reverse('home:home'), {'tag_tree': self.rust.id})
+        self.django.sub_tag = self.rust
+        self.django.save()
+        response = self.client.get(reverse('home:home'), {'tag_tree': self.rust.id})
+        self.assertEqual(response.data['pagination']['items_count'], 2)
+
+    def test_question_list_filter(self):
+        response = self.client.get(reverse('home:question-list'), {'tag_tree': self.rust.id})
+        self.assertEqual([question['id'] for question in response.data['data']], [self.rust_question.id])
+
+
+class TestTagTree(TagTreeTestCase):
+    def test_build_tag_tree(self):
+        tree = build_tag_tree()
+        self.assertEqual([tag['name'] for tag in tree], ['python', 'rust'])
+        self.assertEqual([tag['name'] for tag in tree[0]['children']], ['django', 'flask'])
+        self.assertEqual(tree[0]['children'][0]['children'][0]['slug'], 'orm')
+
+    def test_tree_kept_in_memory(self):
+        tree = get_tag_tree()
+        with self.assertNumQueries(0):
+            self.assertIs(get_tag_tree(), tree)
+
+    def test_tree_rebuilt_on_change(self):
+        tree = get_tag_tree()
+        baker.make(Tag, name='go')
+        self.assertIsNot(get_tag_tree(), tree)
+        self.assertEqual([tag['name'] for tag in get_tag_tree()], ['go', 'python', 'rust'])
+        self.orm.delete()
+        self.assertEqual(get_tag_tree()[1]['children'][0]['children'], [])
+
+    def test_tag_tree_GET(self):
+        tags._tag_tree = (None, None)
+        response = self.client.get(reverse('home:tag-tree'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), build_tag_tree())
+        response = self.client.get(reverse('home:tag-tree'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class TestQuestionsCount(TagTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.question = baker.make(Question)
+
+    def assertCounts(self, **counts):
+        for name, count in counts.items():
+            self.assertEqual(Tag.objects.get(name=name).questions_count, count, name)
+
+    def test_count_on_add(self):
+        self.question.tag.add(self.python, self.django)
+        self.question.tag.add(self.python)
+        self.orm.questions.add(self.question, baker.make(Question))
+        self.assertCounts(python=1, django=1, orm=2, rust=0)
+
+    def test_count_on_remove(self):
+        self.question.tag.add(self.python, self.django)
+        self.question.tag.remove(self.python, self.rust)
+        self.django.questions.remove(self.question)
+        self.assertCounts(python=0, django=0, rust=0)
+
+    def test_count_on_set_and_clear(self):
+        self.question.tag.set([self.python, self.django])
+        self.question.tag.set([self.django, self.rust])
+        self.assertCounts(python=0, django=1, rust=1)
+        self.question.tag.clear()
+        self.assertCounts(django=0, rust=0)
+        baker.make(Question, 2, tag=[self.rust])
+        self.rust.questions.clear()
+        self.assertCounts(rust=0)
+
+    def test_count_on_question_delete(self):
+        self.question.tag.add(self.python, self.rust)
+        baker.make(Question, tag=[self.rust])
+        self.question.delete()
+        self.assertCounts(python=0, rust=1)
+
+    def test_rebuild_tag_counts_command(self):
+        self.question.tag.add(self.python)
+        Tag.objects.update(questions_count=5)
+        out = StringIO()
+        call_command('rebuild_tag_counts', stdout=out)
+        self.assertIn('Rebuilt questions count of 5 tags, 1 tags trending.', out.getvalue())
+        self.assertCounts(python=1, django=0)
+
+
+class TestTrendingTags(TagTreeTestCase):
+    def test_tagging_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(Question, 2, tag=[self.python])
+            baker.make(Question, tag=[self.rust])
+        rollup_trending()
+        self.assertEqual([(tag['name'], tag['score']) for tag in get_trending()], [('python', 2.0), ('rust', 1.0)])
+
+    @override_settings(TRENDING_TAGS_WINDOW=3, TRENDING_TAGS_DECAY=0.5)
+    def test_window(self):
+        now = time.time()
+        record_tagging([(1, self.python.id)] * 4, now - 2 * 3600)
+        record_tagging([(1, self.python.id)] * 8, now - 3 * 3600)
+        record_tagging([(1, self.rust.id)] * 2, now)
+        rollup_trending(now)
+        self.assertEqual([(tag['name'], tag['score']) for tag in get_trending()], [('rust', 2.0), ('python', 1.0)])
+
+    def test_trending_read_from_rollup(self):
+        record_tagging([(1, self.rust.id)])
+        rollup_trending()
+        record_tagging([(1, self.python.id)] * 2)
+        self.assertEqual([tag['name'] for tag in get_trending()], ['rust'])
+        rollup_trending()
+        self.assertEqual([tag['name'] for tag in get_trending()], ['python', 'rust'])
+
+    def test_trending_GET(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(Question, tag=[self.python, self.django])
+        cache.delete('trending:tags')
+        response = self.client.get(reverse('home:tag-trending'), {'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['questions_count'], 1)
+        response = self.client.get(reverse('home:tag-trending'), {'limit': 0})
+        self.assertEqual(response.status_code, 400)
@@ -1,7 +1,7 @@
 from django.urls import reverse, resolve
 from rest_framework.test import APISimpleTestCase
 
-from apps.home import views
+from apps.home import async_views, views
 
 
 class TestUrls(APISimpleTestCase):
@@ -9,6 +9,29 @@ class TestUrls(APISimpleTestCase):
         home_url = reverse('home:home')
         self.assertEqual(resolve(home_url).func.view_class, views.HomeAPI)
 
+    def test_async_home_url(self):
+        self.assertEqual(resolve(reverse('async:home')).func, async_views.home)
+
+    def test_search_url(self):
+        search_url = reverse('home:search')
+        self.assertEqual(resolve(search_url).func.view_class, views.SearchAPI)
+
+    def test_tag_tree_url(self):
+        tag_tree_url = reverse('home:tag-tree')
+        self.assertEqual(resolve(tag_tree_url).func.view_class, views.TagTreeAPI)
+
+    def test_export_url(self):
+        export_url = reverse('home:export')
+        self.assertEqual(resolve(export_url).func.view_class, views.ExportAPI)
+
+    def test_metrics_url(self):
+        metrics_url = reverse('home:metrics')
+        self.assertEqual(resolve(metrics_url).func.view_class, views.MetricsAPI)
+
+    def test_tag_trending_url(self):
+        tag_trending_url = reverse('home:tag-trending')
+        self.assertEqual(resolve(tag_trending_url).func.view_class, views.TrendingTagsAPI)
+
     # Answers
     def test_answer_like_url(self):
         answer_like_url = reverse('home:answer-like', args=(20,))
@@ -22,6 +45,18 @@ class TestUrls(APISimpleTestCase):
         accept_answer_url = reverse('home:answer-accept', args=(20,))
         self.assertEqual(resolve(accept_answer_url).func.view_class, views.AcceptAnswerAPI)
 
+    def test_answer_batch_create_url(self):
+        answer_batch_create_url = reverse('home:answer-batch-create')
+        self.assertEqual(resolve(answer_batch_create_url).func.view_class, views.BatchCreateAnswerAPI)
+
+    def test_comment_batch_create_url(self):
+        comment_batch_create_url = reverse('home:comment-batch-create')
+        self.assertEqual(resolve(comment_batch_create_url).func.view_class, views.BatchCreateCommentAPI)
+
+    def test_reply_batch_create_url(self):
+        reply_batch_create_url = reverse('home:reply-batch-create')
+        self.assertEqual(resolve(reply_batch_create_url).func.view_class, views.BatchCreateReplyAPI)
+
     def test_answer_create_url(self):
         answer_crete_url = reverse('home:answer-create', args=(20,))
         self.assertEqual(resolve(answer_crete_url).func.view_class, views.CreateAnswerAPI)
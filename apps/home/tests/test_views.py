@@ -1,8 +1,13 @@
 from urllib.parse import urlencode
 
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from model_bakery import baker
+from rest_framework.request import Request
 from rest_framework.test import APITestCase, APIRequestFactory
 from rest_framework_simplejwt.tokens import AccessToken
 
@@ -12,6 +17,7 @@ from apps.home.models import (
     CommentReply,
     Answer,
     Comment,
+    SearchDocument,
     Vote
 )
 from apps.home.views import (
@@ -23,7 +29,10 @@ from apps.home.views import (
     ReplyViewSet,
 
 )
-from apps.users.models import User
+from apps.home.services import FEED_CACHE, get_thread_cache, toggle_vote
+from apps.users.models import User, UserProfile
+from apps.users.reputation import fold_events
+from utils.cache import get_response_key
 
 
 class TestHomeAPI(APITestCase):
@@ -39,6 +48,265 @@ class TestHomeAPI(APITestCase):
         self.assertEqual(response.data['data'][0]['body'], 'test body')
 
 
+class TestSearchAPI(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        baker.make(Question, 12, title='django question')
+        baker.make(Question, title='flask question')
+
+    def test_search_GET(self):
+        response = self.client.get(reverse('home:search'), {'q': 'flask'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']), 1)
+        self.assertEqual(response.data['data'][0]['title'], '<mark>flask</mark> question')
+
+    def test_search_pages(self):
+        response = self.client.get(reverse('home:search'), {'q': 'django'})
+        self.assertEqual(len(response.data['data']), 10)
+        self.assertTrue(response.data['pagination']['has_next'])
+        response = self.client.get(response.data['pagination']['next_page'])
+        self.assertEqual(len(response.data['data']), 2)
+        self.assertFalse(response.data['pagination']['has_next'])
+
+    def test_search_invalid(self):
+        response = self.client.get(reverse('home:search'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('q', response.data['errors'])
+
+    def test_home_search(self):
+        response = self.client.get(reverse('home:home'), {'search': 'flask'})
+        self.assertEqual(len(response.data['data']), 1)
+
+
+class TestPaginationCount(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.question = baker.make(Question)
+        # anonymous responses are cached as a whole.
+        self.client.force_authenticate(self.question.owner)
+
+    def get_count(self, **params):
+        return self.client.get(reverse('home:home'), params).data['pagination']['items_count']
+
+    def test_count_cached(self):
+        self.assertEqual(self.get_count(), 1)
+        Question.objects.bulk_create([Question(owner=self.question.owner, title='title', body='body')])
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get_count(), 1)
+
+    def test_count_invalidated(self):
+        self.assertEqual(self.get_count(), 1)
+        baker.make(Question)
+        self.assertEqual(self.get_count(), 2)
+        self.question.delete()
+        self.assertEqual(self.get_count(), 1)
+
+    def test_count_per_filter(self):
+        tag = baker.make(Tag)
+        self.assertEqual(self.get_count(tag=tag.id), 0)
+        self.question.tag.add(tag)
+        self.assertEqual(self.get_count(tag=tag.id), 1)
+        self.assertEqual(self.get_count(search='no such question'), 0)
+
+    @override_settings(PAGINATION_ESTIMATED_COUNT=True, PAGINATION_ESTIMATE_THRESHOLD=1)
+    def test_estimated_count(self):
+        baker.make(Question, 2)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Question.objects.bulk_create([Question(owner=self.question.owner, title='title', body='body')])
+        self.assertEqual(self.get_count(), 3)
+        self.assertEqual(self.get_count(owner=self.question.owner.id), 2)
+
+
+class TestCursorPagination(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        baker.make(Question, 25)
+
+    def get_ids(self, response):
+        return [question['id'] for question in response.data['data']]
+
+    def test_cursor_pages(self):
+        expected = self.get_ids(self.client.get(reverse('home:home'), {'limit': 20}))
+        expected += self.get_ids(self.client.get(reverse('home:home'), {'limit': 20, 'page': 2}))
+        response = self.client.get(reverse('home:home'), {'pagination': 'cursor'})
+        self.assertFalse(response.data['pagination']['has_previous'])
+        ids = self.get_ids(response)
+        while response.data['pagination']['has_next']:
+            response = self.client.get(response.data['pagination']['next_page'])
+            self.assertEqual(response.status_code, 200)
+            ids += self.get_ids(response)
+        self.assertEqual(ids, expected)
+        self.assertIsNone(response.data['pagination']['next_page'])
+
+    def test_cursor_previous_page(self):
+        first = self.client.get(reverse('home:question-list'), {'pagination': 'cursor'})
+        second = self.client.get(first.data['pagination']['next_page'])
+        previous = self.client.get(second.data['pagination']['previous_page'])
+        self.assertEqual(self.get_ids(previous), self.get_ids(first))
+        self.assertTrue(previous.data['pagination']['has_next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('home:home'), {'pagination': 'cursor', 'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
+
+class TestResponseCache(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = baker.make(User, is_active=True)
+        self.question = baker.make(Question, owner=self.user)
+        self.thread_url = reverse('home:question-detail', args=[self.question.id])
+
+    def lock(self, url, namespace):
+        """Acts as if another request is rebuilding the response of `url`."""
+        request = Request(APIRequestFactory().get(url))
+        request.version = None
+        cache.add(f'{get_response_key(request, namespace)}:lock', 1)
+
+    def test_feed_cached(self):
+        self.assertEqual(self.client.get(reverse('home:home'))['X-Cache'], 'MISS')
+        response = self.client.get(reverse('home:home'))
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(len(response.data['data']), 1)
+
+    def test_feed_invalidated(self):
+        self.client.get(reverse('home:home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(Question)
+        response = self.client.get(reverse('home:home'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['data']), 2)
+
+    def test_feed_query_string(self):
+        self.client.get(reverse('home:home'), {'limit': 5, 'page': 1})
+        self.assertEqual(self.client.get(reverse('home:home'), {'page': 1, 'limit': 5})['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(reverse('home:home'), {'limit': 6})['X-Cache'], 'MISS')
+
+    def test_thread_invalidated(self):
+        self.client.get(self.thread_url)
+        self.assertEqual(self.client.get(self.thread_url)['X-Cache'], 'HIT')
+        answer = baker.make(Answer, question=self.question)
+        self.assertEqual(len(self.client.get(self.thread_url).data['answers']), 1)
+        toggle_vote(owner=self.user, answer_id=answer.id, is_like=True)
+        self.assertEqual(self.client.get(self.thread_url).data['answers'][0]['likes'], 1)
+        # comments and replies bump the thread from their views.
+        self.client.force_authenticate(self.user)
+        self.client.post(reverse('home:comment-create', args=[answer.id]), {'body': 'comment'})
+        comment = Comment.objects.get()
+        self.client.post(reverse('home:reply-create', args=[comment.id]), {'body': 'reply'})
+        self.client.force_authenticate(None)
+        response = self.client.get(self.thread_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['answers'][0]['comments'][0]['replies']), 1)
+        self.client.force_authenticate(self.user)
+        self.client.delete(reverse('home:comments-detail', args=[comment.id]))
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.thread_url).data['answers'][0]['comments'], [])
+
+    def test_thread_invalidated_by_orm_writes(self):
+        answer = baker.make(Answer, question=self.question)
+        self.client.get(self.thread_url)
+        comment = baker.make(Comment, answer=answer)
+        baker.make(CommentReply, comment=comment)
+        self.assertEqual(len(self.client.get(self.thread_url).data['answers'][0]['comments'][0]['replies']), 1)
+        baker.make(Vote, answer_id=answer.id, is_like=True)
+        self.assertEqual(self.client.get(self.thread_url)['X-Cache'], 'MISS')
+        Comment.objects.get(id=comment.id).delete()
+        self.assertEqual(self.client.get(self.thread_url).data['answers'][0]['comments'], [])
+
+    def test_thread_invalidated_by_deleted_user(self):
+        answer = baker.make(Answer, question=self.question)
+        commenter = baker.make(User)
+        baker.make(CommentReply, owner=commenter, comment=baker.make(Comment, owner=commenter, answer=answer))
+        self.client.get(self.thread_url)
+        commenter.delete()
+        self.assertEqual(self.client.get(self.thread_url).data['answers'][0]['comments'], [])
+
+    def test_thread_not_invalidated_by_other_threads(self):
+        self.client.get(self.thread_url)
+        baker.make(Answer)
+        self.assertEqual(self.client.get(self.thread_url)['X-Cache'], 'HIT')
+
+    def test_authenticated_not_cached(self):
+        self.client.force_authenticate(self.user)
+        self.assertNotIn('X-Cache', self.client.get(reverse('home:home')))
+        self.assertNotIn('X-Cache', self.client.get(self.thread_url))
+
+    def test_stale_while_rebuilding(self):
+        self.client.get(self.thread_url)
+        baker.make(Answer, question=self.question)
+        self.lock(self.thread_url, get_thread_cache(self.question.id))
+        response = self.client.get(self.thread_url)
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(response.data['answers'], [])
+
+    @override_settings(RESPONSE_CACHE_WAIT=0.1)
+    def test_wait_for_rebuild(self):
+        self.lock(reverse('home:home'), FEED_CACHE)
+        response = self.client.get(reverse('home:home'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['data']), 1)
+
+
+class TestConditionalGet(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.question = baker.make(Question)
+        self.thread_url = reverse('home:question-detail', args=[self.question.id])
+
+    def test_not_modified(self):
+        for url in (reverse('home:home'), self.thread_url):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+
+    def test_modified(self):
+        etag = self.client.get(self.thread_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(Answer, question=self.question)
+        response = self.client.get(self.thread_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_authenticated(self):
+        etag = self.client.get(reverse('home:home'))['ETag']
+        self.client.force_authenticate(baker.make(User))
+        self.assertEqual(self.client.get(reverse('home:home'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_not_found_not_tagged(self):
+        response = self.client.get(reverse('home:question-detail', args=[self.question.id + 1]))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+    def test_any_etag(self):
+        # `*` matches the existing resources only.
+        self.assertEqual(self.client.get(self.thread_url, HTTP_IF_NONE_MATCH='*').status_code, 304)
+        missing_url = reverse('home:question-detail', args=[self.question.id + 1])
+        self.assertEqual(self.client.get(missing_url, HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+    def test_owner_renamed(self):
+        answer = baker.make(Answer)
+        thread_url = reverse('home:question-detail', args=[answer.question_id])
+        etags = [self.client.get(url)['ETag'] for url in (reverse('home:home'), self.thread_url, thread_url)]
+        answer.owner.username = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            answer.owner.save()
+        self.assertNotEqual(self.client.get(reverse('home:home'), HTTP_IF_NONE_MATCH=etags[0]).status_code, 304)
+        self.assertEqual(self.client.get(self.thread_url, HTTP_IF_NONE_MATCH=etags[1]).status_code, 304)
+        response = self.client.get(thread_url, HTTP_IF_NONE_MATCH=etags[2])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['answers'][0]['owner'].startswith('renamed - '))
+
+    def test_owner_saved_unchanged(self):
+        etag = self.client.get(reverse('home:home'))['ETag']
+        self.question.owner.save(update_fields=['last_login'])
+        self.question.owner.save()
+        self.assertEqual(self.client.get(reverse('home:home'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
 class TestQuestionViewSet(APITestCase):
     def setUp(self):
         self.factory = APIRequestFactory()
@@ -123,6 +391,48 @@ class TestQuestionViewSet(APITestCase):
         self.assertEqual(response.status_code, 204)
 
 
+class TestQuestionRetrieve(APITestCase):
+    def setUp(self):
+        self.user = baker.make(User, username='username', is_active=True)
+
+    def make_thread(self, size):
+        question = baker.make(Question, owner=self.user, title='test title')
+        question.tag.add(baker.make(Tag))
+        for _ in range(size):
+            answer = baker.make(Answer, question=question, owner=self.user, likes_count=size, dislikes_count=1)
+            for comment in baker.make(Comment, size, answer=answer, owner=self.user):
+                reply = None
+                for _ in range(size):
+                    reply = baker.make(CommentReply, comment=comment, owner=self.user, reply=reply)
+        return question
+
+    def get_thread(self, question):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home:question-detail', args=[question.id]))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_retrieve_nested_thread(self):
+        question = self.make_thread(2)
+        response, _ = self.get_thread(question)
+        answer = response.data['answers'][0]
+        self.assertEqual(len(response.data['answers']), 2)
+        self.assertEqual(answer['likes'], 2)
+        self.assertEqual(answer['dislikes'], 1)
+        self.assertEqual(answer['question'], 'username - test title...')
+        comment = answer['comments'][0]
+        self.assertEqual(len(comment['replies']), 1)
+        self.assertIsNone(comment['replies'][0]['reply'])
+        self.assertEqual(len(comment['replies'][0]['replies']), 1)
+        self.assertEqual(comment['replies'][0]['replies'][0]['replies'], [])
+
+    def test_retrieve_constant_queries(self):
+        _, small = self.get_thread(self.make_thread(1))
+        _, large = self.get_thread(self.make_thread(4))
+        self.assertEqual(small, large)
+        self.assertEqual(large, 5)
+
+
 class TestAnswerViewSet(APITestCase):
     def setUp(self):
         self.factory = APIRequestFactory()
@@ -314,3 +624,147 @@ class TestDisLikeAPI(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(Vote.objects.filter(is_like=True).count(), 0)
         self.assertEqual(response.data['message'], 'answer disliked.')
+
+
+class TestAcceptAnswerAPI(APITestCase):
+    def setUp(self):
+        self.user = baker.make(User, is_active=True)
+        self.answer = baker.make(Answer, question__owner=self.user)
+        self.profile = baker.make(UserProfile, owner=self.answer.owner, score=2)
+        self.url = reverse('home:answer-accept', args=[self.answer.id])
+        self.client.force_authenticate(self.user)
+
+    def test_accept(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['message'], 'answer accepted.')
+        fold_events()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.score, 3)
+
+    def test_accept_twice(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 400)
+        fold_events()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.score, 3)
+
+    def test_not_question_owner(self):
+        self.client.force_authenticate(self.answer.owner)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_not_found(self):
+        self.assertEqual(self.client.get(reverse('home:answer-accept', args=[0])).status_code, 404)
+
+    def test_profile_etag_invalidated(self):
+        profile_url = reverse('users:user-profile', args=[self.answer.owner_id])
+        self.answer.owner.is_active = True
+        self.answer.owner.save()
+        etag = self.client.get(profile_url)['ETag']
+        self.client.get(self.url)
+        fold_events()
+        response = self.client.get(profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['score'], 3)
+
+
+class TestBatchCreateAnswerAPI(APITestCase):
+    def setUp(self):
+        self.user = baker.make(User)
+        self.questions = baker.make(Question, 2)
+        self.url = reverse('home:answer-batch-create')
+        self.client.force_authenticate(self.user)
+
+    def test_batch_create(self):
+        items = [{'question': question.id, 'body': f'answer {i}'} for i, question in enumerate(self.questions * 3)]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['message'], '6 answers created.')
+        answers = Answer.objects.filter(id__in=response.data['ids'], owner=self.user)
+        self.assertEqual(answers.count(), 6)
+        self.assertEqual(SearchDocument.objects.filter(answer__in=answers).count(), 6)
+
+    def test_batch_queries(self):
+        items = [{'question': question.id, 'body': 'answer'} for question in self.questions * 50]
+        # savepoint, parents, answers, search documents, savepoint release.
+        with self.assertNumQueries(5):
+            self.client.post(self.url, items, format='json')
+
+    def test_batch_errors(self):
+        items = [{'question': self.questions[0].id, 'body': 'answer'}, {'question': 0}, {'question': 999, 'body': 'a'}]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0], {})
+        self.assertIn('body', response.data['errors'][1])
+        response = self.client.post(self.url, items[::2], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0], {})
+        self.assertIn('question', response.data['errors'][1])
+        self.assertFalse(Answer.objects.exists())
+
+    @override_settings(BATCH_MAX_SIZE=2)
+    def test_batch_max_size(self):
+        items = [{'question': self.questions[0].id, 'body': 'answer'}] * 3
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(self.url, [], format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, items[:2], format='json').status_code, 201)
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.post(self.url, [], format='json').status_code, 401)
+
+
+class TestBatchCreateCommentAPI(APITestCase):
+    def setUp(self):
+        self.answer = baker.make(Answer)
+        self.url = reverse('home:comment-batch-create')
+        self.client.force_authenticate(baker.make(User))
+
+    def test_batch_create(self):
+        thread_etag = self.client.get(reverse('home:question-detail', args=[self.answer.question_id]))['ETag']
+        items = [{'answer': self.answer.id, 'body': 'comment'}] * 3
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.answer.comments.count(), 3)
+        response = self.client.get(
+            reverse('home:question-detail', args=[self.answer.question_id]), HTTP_IF_NONE_MATCH=thread_etag
+        )
+        self.assertEqual(len(response.data['answers'][0]['comments']), 3)
+
+    def test_batch_errors(self):
+        response = self.client.post(self.url, [{'answer': 999, 'body': 'comment'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('answer', response.data['errors'][0])
+
+
+class TestBatchCreateReplyAPI(APITestCase):
+    def setUp(self):
+        self.comment = baker.make(Comment)
+        self.reply = baker.make(CommentReply, comment=self.comment)
+        self.child = baker.make(CommentReply, comment=self.comment, reply=self.reply)
+        self.url = reverse('home:reply-batch-create')
+        self.client.force_authenticate(baker.make(User))
+
+    def test_batch_create(self):
+        items = [
+            {'comment': self.comment.id, 'body': 'root'},
+            {'comment': self.comment.id, 'reply': self.child.id, 'body': 'nested'},
+        ]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 201)
+        root, nested = CommentReply.objects.filter(id__in=response.data['ids']).order_by('id')
+        self.assertEqual((root.depth, root.path, root.reply_id), (0, '', None))
+        self.assertEqual((nested.depth, nested.path), (2, f'{self.reply.id}/{self.child.id}/'))
+
+    def test_batch_errors(self):
+        other = baker.make(CommentReply)
+        items = [
+            {'comment': self.comment.id, 'reply': other.id, 'body': 'reply'},
+            {'comment': self.comment.id, 'reply': 999, 'body': 'reply'},
+        ]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('does not belong', response.data['errors'][0]['reply'][0])
+        self.assertIn('does not exist', response.data['errors'][1]['reply'][0])
@@ -6,19 +6,27 @@ from . import views
 app_name = 'home'
 urlpatterns = [
     path('', views.HomeAPI.as_view(), name='home'),
+    path('search/', views.SearchAPI.as_view(), name='search'),
+    path('tags/tree/', views.TagTreeAPI.as_view(), name='tag-tree'),
+    path('tags/trending/', views.TrendingTagsAPI.as_view(), name='tag-trending'),
+    path('export/', views.ExportAPI.as_view(), name='export'),
+    path('metrics/', views.MetricsAPI.as_view(), name='metrics'),
 
     # Questions
     path('questions/<int:question_id>/answers/', views.CreateAnswerAPI.as_view(), name='answer-create'),
 
     # Answers
+    path('answers/batch/', views.BatchCreateAnswerAPI.as_view(), name='answer-batch-create'),
     path('answers/<int:answer_id>/like/', views.LikeAPI.as_view(), name='answer-like'),
     path('answers/<int:answer_id>/dislike/', views.DisLikeAPI.as_view(), name='answer-dislike'),
     path('answers/<int:answer_id>/accept/', views.AcceptAnswerAPI.as_view(), name='answer-accept'),
 
     # comments
+    path('comments/batch/', views.BatchCreateCommentAPI.as_view(), name='comment-batch-create'),
     path('answers/<int:answer_id>/comments/', views.CreateCommentAPI.as_view(), name='comment-create'),
 
     # Replies
+    path('replies/batch/', views.BatchCreateReplyAPI.as_view(), name='reply-batch-create'),
     path('comments/<int:comment_id>/replies/', views.CreateReplyAPI.as_view(), name='reply-create'),
     path('comments/<int:comment_id>/replies/<int:reply_id>/', views.CreateReplyAPI.as_view(), name='reply-create-reply'),
 ]
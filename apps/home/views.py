@@ -1,27 +1,194 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db.models import F
+from django.http import Http404, StreamingHttpResponse
+from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework import status
 from rest_framework.generics import ListAPIView, get_object_or_404, CreateAPIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
 from docs.serializers.doc_serializers import MessageSerializer
 from permissions import permissions
+from utils.cache import cached_response, conditional_response
+from utils.paginators import FeedPagination
+from utils.profiling import get_view_metrics, reset_view_metrics
+from utils.renderers import FastJSONRenderer
 from utils.update_response import update_response
 from . import serializers
-from .docs.doc_serializers import DocQuestionSerializer
-from .models import Question, Answer, Comment, CommentReply, Vote
+from .export import EXPORTS, FORMATS, export, format_watermark, get_watermark
+from .filters import QuestionFilter, QuestionSearchFilter
+from .projections import QUESTION_FIELDS, project_questions, project_thread
+from .search import search
+from .tags import TAG_TREE_CACHE, get_tag_tree, get_trending
+from .services import (
+    FEED_CACHE,
+    accept_answer,
+    build_reply_tree,
+    create_answers,
+    create_comments,
+    create_replies,
+    get_thread_cache,
+    get_thread_queryset,
+    toggle_vote,
+)
+from .docs.doc_serializers import (
+    DocBatchCreatedSerializer,
+    DocQuestionSerializer,
+    DocSearchSerializer,
+    DocTagTreeSerializer,
+)
+from .models import Question, Answer, Comment, CommentReply
+
+
+class ProjectedQuestionListMixin:
+    """Lists questions through `apps.home.projections` instead of the serializer when FAST_READ_PATH is on."""
+    renderer_classes = [FastJSONRenderer]
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_READ_PATH:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).values(*QUESTION_FIELDS)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(project_questions(list(queryset)))
+        return self.get_paginated_response(project_questions(page))
 
 
-class HomeAPI(ListAPIView):
+class HomeAPI(ProjectedQuestionListMixin, ListAPIView):
     """Home page."""
     permission_classes = [AllowAny]
     serializer_class = serializers.QuestionSerializer
     queryset = Question.objects.select_related('owner').all()
-    filterset_fields = ['tag', 'owner', 'created']
+    pagination_class = FeedPagination
+    filter_backends = [DjangoFilterBackend, QuestionSearchFilter]
+    filterset_class = QuestionFilter
     search_fields = ['title', 'body']
 
+    def list(self, request, *args, **kwargs):
+        build = partial(super().list, request, *args, **kwargs)
+        if not request.user.is_authenticated:
+            build = partial(cached_response, request, FEED_CACHE, build)
+        return conditional_response(request, FEED_CACHE, build)
+
+
+class SearchAPI(APIView):
+    """
+    Full-text search over questions and answers, best matches first.\n
+    matched words are wrapped in <mark></mark>.\n
+    allowed methods: GET.
+    """
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        parameters=[serializers.SearchQuerySerializer],
+        responses={200: DocSearchSerializer}
+    )
+    def get(self, request, *args, **kwargs):
+        srz_query = serializers.SearchQuerySerializer(data=request.query_params)
+        if not srz_query.is_valid():
+            return Response(data={'errors': srz_query.errors}, status=status.HTTP_400_BAD_REQUEST)
+        q, page, limit = (srz_query.validated_data[key] for key in ('q', 'page', 'limit'))
+        results = search(q, limit=limit + 1, offset=(page - 1) * limit)
+        has_next = len(results) > limit
+        return Response(data={
+            'pagination': {
+                'current_page': page,
+                'previous_page': self.build_page_link(page - 1) if page > 1 else None,
+                'next_page': self.build_page_link(page + 1) if has_next else None,
+                'has_previous': page > 1,
+                'has_next': has_next,
+            },
+            'data': serializers.SearchResultSerializer(results[:limit], many=True).data
+        }, status=status.HTTP_200_OK)
+
+    def build_page_link(self, page):
+        return replace_query_param(self.request.build_absolute_uri(), 'page', page)
+
+
+class TagTreeAPI(APIView):
+    """
+    Every tag with its sub tags nested, ordered by name.\n
+    allowed methods: GET.
+    """
+    permission_classes = [AllowAny]
+    renderer_classes = [FastJSONRenderer]
+
+    @extend_schema(responses={200: DocTagTreeSerializer(many=True)})
+    def get(self, request, *args, **kwargs):
+        return conditional_response(
+            request, TAG_TREE_CACHE, lambda: Response(data=get_tag_tree(), status=status.HTTP_200_OK)
+        )
+
+
+class TrendingTagsAPI(APIView):
+    """
+    Tags with the most new questions of the last hours, recent hours weighing more.\n
+    allowed methods: GET.
+    """
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        parameters=[serializers.TrendingTagsQuerySerializer],
+        responses={200: serializers.TrendingTagSerializer(many=True)}
+    )
+    def get(self, request, *args, **kwargs):
+        srz_query = serializers.TrendingTagsQuerySerializer(data=request.query_params)
+        if not srz_query.is_valid():
+            return Response(data={'errors': srz_query.errors}, status=status.HTTP_400_BAD_REQUEST)
+        tags = get_trending(limit=srz_query.validated_data['limit'])
+        return Response(data=serializers.TrendingTagSerializer(tags, many=True).data, status=status.HTTP_200_OK)
+
+
+class ExportAPI(APIView):
+    """
+    Streams the questions, answers, comments and votes modified after `since` as NDJSON or CSV, for admins only.\n
+    the X-Export-Watermark header is the `since` of the next incremental export.\n
+    allowed methods: GET.
+    """
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(parameters=[serializers.ExportQuerySerializer], responses={200: bytes})
+    def get(self, request, *args, **kwargs):
+        srz_query = serializers.ExportQuerySerializer(data=request.query_params)
+        if not srz_query.is_valid():
+            return Response(data={'errors': srz_query.errors}, status=status.HTTP_400_BAD_REQUEST)
+        export_type, file_format, since = (srz_query.validated_data[key] for key in ('type', 'file_format', 'since'))
+        watermark = get_watermark()
+        chunks = export(
+            list(EXPORTS) if export_type == 'all' else [export_type],
+            file_format=file_format, since=since, until=watermark
+        )
+        response = StreamingHttpResponse(chunks, content_type=FORMATS[file_format])
+        response['Content-Disposition'] = f'attachment; filename="{export_type}.{file_format}"'
+        response['X-Export-Watermark'] = format_watermark(watermark)
+        return response
+
+
+class MetricsAPI(APIView):
+    """
+    Request counters of every view since the last reset, with their queries and database time, for admins only.\n
+    n_plus_one counts the requests running a query more times than QUERY_PROFILING_N_PLUS_ONE.\n
+    allowed methods: GET, DELETE (resets the counters).
+    """
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses={200: serializers.ViewMetricsSerializer(many=True)})
+    def get(self, request, *args, **kwargs):
+        metrics = get_view_metrics()
+        return Response(data=serializers.ViewMetricsSerializer(metrics, many=True).data, status=status.HTTP_200_OK)
+
+    @extend_schema(responses={200: MessageSerializer})
+    def delete(self, request, *args, **kwargs):
+        reset_view_metrics()
+        return Response(data={'message': 'metrics reset.'}, status=status.HTTP_200_OK)
+
 
 @extend_schema_view(
     create=extend_schema(
@@ -37,11 +204,13 @@ class HomeAPI(ListAPIView):
         responses={200: MessageSerializer}
     ),
 )
-class QuestionViewSet(ModelViewSet):
+class QuestionViewSet(ProjectedQuestionListMixin, ModelViewSet):
     """Question CRUD operations ModelViewSet."""
     serializer_class = serializers.QuestionSerializer
     queryset = Question.objects.select_related('owner').all()
-    filterset_fields = ['tag', 'owner', 'created']
+    pagination_class = FeedPagination
+    filter_backends = [DjangoFilterBackend, QuestionSearchFilter]
+    filterset_class = QuestionFilter
     search_fields = ['title', 'body']
 
     def get_permissions(self):
@@ -51,6 +220,11 @@ class QuestionViewSet(ModelViewSet):
             return [IsAuthenticated()]
         return [permissions.IsOwnerOrReadOnly()]
 
+    def get_queryset(self):
+        if self.action == 'retrieve':
+            return get_thread_queryset()
+        return super().get_queryset()
+
     def create(self, request, *args, **kwargs):
         """Creates a question object."""
         serializer = self.get_serializer(data=request.data)
@@ -60,11 +234,22 @@ class QuestionViewSet(ModelViewSet):
 
     def retrieve(self, request, *args, **kwargs):
         """Shows detail of one question object."""
-        response = super().retrieve(request, *args, **kwargs)
-        answers = self.get_object().answers.all()
-        srz_answers = serializers.AnswerSerializer(answers, many=True)
-        response.data['answers'] = srz_answers.data
-        return response
+        namespace = get_thread_cache(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        build = partial(self.get_thread, request, *args, **kwargs)
+        if not request.user.is_authenticated:
+            build = partial(cached_response, request, namespace, build)
+        return conditional_response(request, namespace, build)
+
+    def get_thread(self, request, *args, **kwargs):
+        if settings.FAST_READ_PATH:
+            queryset = self.filter_queryset(Question.objects.all()).values(*QUESTION_FIELDS)
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            question = get_object_or_404(queryset, **{self.lookup_field: kwargs[lookup_url_kwarg]})
+            return Response(project_thread(question))
+        question = build_reply_tree(self.get_object())
+        data = self.get_serializer(question).data
+        data['answers'] = serializers.AnswerSerializer(question.answers.all(), many=True).data
+        return Response(data)
 
     def update(self, request, *args, **kwargs):
         """Updates one question object."""
@@ -185,7 +370,7 @@ class CreateCommentAPI(CreateAPIView):
 )
 class ReplyViewSet(ModelViewSet):
     serializer_class = serializers.ReplyCommentSerializer
-    queryset = CommentReply.objects.select_related('owner', 'comment', 'reply').all()
+    queryset = CommentReply.objects.select_related('owner', 'comment__answer', 'reply').all()
     http_method_names = ['put', 'delete', 'head', 'options']
     permission_classes = [permissions.IsOwnerOrReadOnly]
 
@@ -217,7 +402,7 @@ class CreateReplyAPI(CreateAPIView):
         """creates a reply object."""
         serializer = self.get_serializer(data=self.request.data)
         serializer.is_valid(raise_exception=True)
-        comment = get_object_or_404(Comment, id=kwargs.get('comment_id'))
+        comment = get_object_or_404(Comment.objects.select_related('answer'), id=kwargs.get('comment_id'))
         try:
             reply = CommentReply.objects.get(id=kwargs.get('reply_id'))
         except CommentReply.DoesNotExist:
@@ -226,21 +411,129 @@ class CreateReplyAPI(CreateAPIView):
         return Response(data={'message': 'reply created successfully.'}, status=status.HTTP_201_CREATED)
 
 
+class BatchCreateAPI(APIView):
+    """
+    Base of the batch endpoints: validates a list of items in one pass, loads their parents with one `in_bulk`
+    and creates every item in one transaction, or none of them if any item is invalid.
+    Errors come as a list with one entry per item, empty for the valid ones.
+    Subclasses define `perform_create(items, parents)`, which creates the items with their batch service.
+    """
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['post', 'options']
+    item_serializer_class = None
+    parent_field = None
+    parent_queryset = None
+    verbose_name_plural = None
+
+    def post(self, request, *args, **kwargs):
+        srz_data = self.item_serializer_class(
+            data=request.data, many=True, allow_empty=False, max_length=settings.BATCH_MAX_SIZE
+        )
+        if not srz_data.is_valid():
+            return Response(data={'errors': srz_data.errors}, status=status.HTTP_400_BAD_REQUEST)
+        items = srz_data.validated_data
+        parents = self.load_parents(items)
+        errors = [self.validate_item(item, parents) for item in items]
+        if any(errors):
+            return Response(data={'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        objects = self.perform_create(items, parents)
+        return Response(
+            data={'message': f'{len(objects)} {self.verbose_name_plural} created.', 'ids': [obj.id for obj in objects]},
+            status=status.HTTP_201_CREATED
+        )
+
+    def load_parents(self, items):
+        return self.parent_queryset.in_bulk({item[self.parent_field] for item in items})
+
+    def validate_item(self, item, parents) -> dict:
+        if item[self.parent_field] not in parents:
+            return {self.parent_field: [f'Invalid pk "{item[self.parent_field]}" - object does not exist.']}
+        return {}
+
+
+@extend_schema(
+    request=serializers.AnswerBatchItemSerializer(many=True),
+    responses={201: DocBatchCreatedSerializer}
+)
+class BatchCreateAnswerAPI(BatchCreateAPI):
+    """
+    Creates a batch of answers, all of them or none.\n
+    allowed methods: POST.
+    """
+    item_serializer_class = serializers.AnswerBatchItemSerializer
+    parent_field = 'question'
+    parent_queryset = Question.objects.only('id')
+    verbose_name_plural = 'answers'
+
+    def perform_create(self, items, parents) -> list:
+        return create_answers(owner=self.request.user, items=items)
+
+
+@extend_schema(
+    request=serializers.CommentBatchItemSerializer(many=True),
+    responses={201: DocBatchCreatedSerializer}
+)
+class BatchCreateCommentAPI(BatchCreateAPI):
+    """
+    Creates a batch of comments, all of them or none.\n
+    allowed methods: POST.
+    """
+    item_serializer_class = serializers.CommentBatchItemSerializer
+    parent_field = 'answer'
+    parent_queryset = Answer.objects.only('id', 'question_id')
+    verbose_name_plural = 'comments'
+
+    def perform_create(self, items, parents) -> list:
+        return create_comments(owner=self.request.user, items=items, answers=parents)
+
+
+@extend_schema(
+    request=serializers.ReplyBatchItemSerializer(many=True),
+    responses={201: DocBatchCreatedSerializer}
+)
+class BatchCreateReplyAPI(BatchCreateAPI):
+    """
+    Creates a batch of replies to comments or to existing replies, all of them or none.\n
+    allowed methods: POST.
+    """
+    item_serializer_class = serializers.ReplyBatchItemSerializer
+    parent_field = 'comment'
+    parent_queryset = Comment.objects.annotate(question_id=F('answer__question_id')).only('id', 'answer_id')
+    verbose_name_plural = 'replies'
+
+    def load_parents(self, items):
+        replies = CommentReply.objects.only('id', 'comment_id', 'depth', 'path').in_bulk(
+            {item['reply'] for item in items if item['reply'] is not None}
+        )
+        return super().load_parents(items), replies
+
+    def validate_item(self, item, parents) -> dict:
+        comments, replies = parents
+        errors = super().validate_item(item, comments)
+        reply = replies.get(item['reply'])
+        if item['reply'] is not None and reply is None:
+            errors['reply'] = [f'Invalid pk "{item["reply"]}" - object does not exist.']
+        elif reply is not None and reply.comment_id != item['comment']:
+            errors['reply'] = [f'reply {reply.id} does not belong to comment {item["comment"]}.']
+        return errors
+
+    def perform_create(self, items, parents) -> list:
+        comments, replies = parents
+        return create_replies(owner=self.request.user, items=items, comments=comments, replies=replies)
+
+
 class LikeAPI(APIView):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(responses={200: MessageSerializer})
     def get(self, request, *args, **kwargs):
         """add a like for each answer"""
-        answer = get_object_or_404(Answer, id=kwargs.get('answer_id'))
-        like = Vote.objects.filter(owner=self.request.user, answer=answer, is_like=True)
-        dislike = Vote.objects.filter(owner=self.request.user, answer=answer, is_dislike=True)
-        if like.exists():
-            like.delete()
+        try:
+            liked = toggle_vote(owner=self.request.user, answer_id=kwargs.get('answer_id'), is_like=True)
+        except Answer.DoesNotExist:
+            raise Http404
+        if not liked:
             return Response(data={'message': 'like removed.'}, status=status.HTTP_204_NO_CONTENT)
-        if dislike.exists():
-            dislike.delete()
-        like.create(owner=self.request.user, answer=answer, is_like=True)
         return Response(data={'message': 'answer liked.'}, status=status.HTTP_200_OK)
 
 
@@ -250,15 +543,12 @@ class DisLikeAPI(APIView):
     @extend_schema(responses={200: MessageSerializer})
     def get(self, request, *args, **kwargs):
         """add a dislike for each answer"""
-        answer = get_object_or_404(Answer, id=kwargs.get('answer_id'))
-        dislike = Vote.objects.filter(owner=self.request.user, answer=answer, is_dislike=True)
-        like = Vote.objects.filter(owner=self.request.user, answer=answer, is_like=True)
-        if dislike.exists():
-            dislike.delete()
+        try:
+            disliked = toggle_vote(owner=self.request.user, answer_id=kwargs.get('answer_id'), is_like=False)
+        except Answer.DoesNotExist:
+            raise Http404
+        if not disliked:
             return Response(data={'message': 'dislike removed.'}, status=status.HTTP_200_OK)
-        if like.exists():
-            like.delete()
-        dislike.create(owner=self.request.user, answer=answer, is_dislike=True)
         return Response(data={'message': 'answer disliked.'}, status=status.HTTP_200_OK)
 
 
@@ -268,17 +558,16 @@ class AcceptAnswerAPI(APIView):
     @extend_schema(responses={200: MessageSerializer})
     def get(self, request, *args, **kwargs):
         """accept an answer object"""
-        answer = get_object_or_404(Answer, id=kwargs.get('answer_id'))
-        if request.user.id == answer.question.owner.id:
-            if not answer.accepted and not answer.question.has_accepted_answer():
-                answer.accepted = True
-                answer.owner.profile.score += 1
-                answer.owner.profile.save()
-                answer.save()
-                return Response(data={'message': 'answer accepted.'}, status=status.HTTP_200_OK)
+        try:
+            accepted = accept_answer(user=request.user, answer_id=kwargs.get('answer_id'))
+        except Answer.DoesNotExist:
+            raise Http404
+        except PermissionDenied:
+            return Response(data={'error': 'only question owner can perform this action.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        if not accepted:
             return Response(
                 data={'error': 'you can not accept an answer twice or accept two answers at the same time.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        return Response(data={'error': 'only question owner can perform this action.'},
-                        status=status.HTTP_403_FORBIDDEN)
+        return Response(data={'message': 'answer accepted.'}, status=status.HTTP_200_OK)
@@ -0,0 +1,24 @@
+"""Async version of the user profile, see `apps.home.async_views`."""
+from functools import partial
+
+from django.views.decorators.http import require_safe
+
+from apps.home.async_views import render
+from utils.cache import aconditional_response
+from .models import User
+from .projections import PROFILE_FIELDS, aproject_profile
+from .services import get_profile_cache
+
+
+@require_safe
+async def user_profile(request, id):
+    """Retrieves the profile, see `UserProfileAPI.retrieve`."""
+    return await aconditional_response(request, get_profile_cache(id), partial(get_profile, request, id))
+
+
+async def get_profile(request, id):
+    try:
+        user = await User.objects.filter(is_active=True).values(*PROFILE_FIELDS).aget(id=id)
+    except User.DoesNotExist:
+        return render({'detail': 'No User matches the given query.'}, status=404)
+    return render(await aproject_profile(user, request))
@@ -0,0 +1,114 @@
+"""
+JWT authentication without a `User` query per request.
+
+`CachedJWTAuthentication` keeps a snapshot of the user of every access token, by its `jti`, in a bounded LRU of the
+process and in Redis, and builds the user of the following requests with that token from it. Only active users are
+cached, and never their password hash: the field is deferred and read from the database by the few views using it.
+
+Saving or deleting a user, which deactivating it or changing its password does, invalidates its snapshots, see
+`invalidate_user`: those of Redis and of the current process at once, those of the other processes within
+AUTH_CACHE_LOCAL_TIMEOUT seconds, the time they are kept.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from utils.cache import bump_version_on_commit, get_version
+from .models import User
+
+SNAPSHOT_FIELDS = tuple(field.attname for field in User._meta.concrete_fields if field.attname != 'password')
+
+
+class LRUCache:
+    """Snapshots of this process by `jti`, the least recently used are dropped past AUTH_CACHE_LOCAL_SIZE."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, jti: str):
+        with self.lock:
+            entry = self.entries.get(jti)
+            if entry is None:
+                return None
+            expires, _, values = entry
+            if expires < time.monotonic():
+                del self.entries[jti]
+                return None
+            self.entries.move_to_end(jti)
+            return values
+
+    def set(self, jti: str, user_id: int, values: tuple) -> None:
+        with self.lock:
+            self.entries[jti] = (time.monotonic() + settings.AUTH_CACHE_LOCAL_TIMEOUT, user_id, values)
+            self.entries.move_to_end(jti)
+            while len(self.entries) > settings.AUTH_CACHE_LOCAL_SIZE:
+                self.entries.popitem(last=False)
+
+    def discard_user(self, user_id: int) -> None:
+        with self.lock:
+            for jti in [jti for jti, (_, owner_id, _) in self.entries.items() if owner_id == user_id]:
+                del self.entries[jti]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+local_cache = LRUCache()
+
+
+def get_auth_cache(user_id) -> str:
+    """cache namespace of the snapshots of a user."""
+    return f'auth:{user_id}'
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drops the snapshots of a user, now and once more after the current transaction commits."""
+    bump_version_on_commit(get_auth_cache(user_id))
+    local_cache.discard_user(user_id)
+    transaction.on_commit(lambda: local_cache.discard_user(user_id))
+
+
+def make_user(values: tuple) -> User:
+    return User.from_db(DEFAULT_DB_ALIAS, SNAPSHOT_FIELDS, values)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        # revoked tokens are told apart by the password hash, which is not cached.
+        if jti is None or user_id is None or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        values = local_cache.get(jti)
+        if values is not None:
+            return make_user(values)
+        namespace = get_auth_cache(user_id)
+        version_key, key = f'version:{namespace}', f'{namespace}:{jti}'
+        cached = cache.get_many([version_key, key])
+        # read before the user, a snapshot taken while the user changes is saved under the old generation.
+        version = cached.get(version_key) or get_version(namespace)
+        if key in cached and cached[key][0] == version:
+            values = cached[key][1]
+            user = make_user(values)
+        else:
+            user = super().get_user(validated_token)
+            values = tuple(getattr(user, field) for field in SNAPSHOT_FIELDS)
+            timeout = min(settings.AUTH_CACHE_TIMEOUT, int(validated_token['exp'] - time.time()))
+            if timeout > 0:
+                cache.set(key, (version, values), timeout=timeout)
+        local_cache.set(jti, user_id, values)
+        return user
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    target_class = 'apps.users.authentication.CachedJWTAuthentication'
@@ -0,0 +1,140 @@
+"""
+Bloom filter of the blacklisted refresh tokens.
+
+`RefreshToken` looks a token up in `BlacklistedToken` only when the filter, a Redis bitmap, might hold its `jti`:
+the filter has no false negatives, so the tokens it does not hold, nearly all of them, are never queried.
+Every blacklisted token is added to the filter once its transaction commits, see `apps.users.signals`, and
+`rebuild` (run by the `rebuild_blacklist_filter` Celery task) builds it anew from the tokens not expired yet,
+dropping the expired ones. The filter is sized for BLACKLIST_FILTER_CAPACITY tokens with a
+BLACKLIST_FILTER_ERROR_RATE rate of false positives, it holds more at a growing error rate until resized.
+Until the filter of these settings is built, or if Redis fails, every token is looked up.
+
+`purge_expired` (run by the `purge_expired_tokens` Celery task and the `purge_tokens` command) deletes the expired
+outstanding tokens and their blacklist entries, which otherwise grow with every login, refresh and logout.
+"""
+import logging
+import math
+from datetime import timedelta
+from functools import cache as memoize
+from hashlib import blake2b
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from utils.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+@memoize
+def get_shape(capacity: int, error_rate: float) -> tuple:
+    """Bits and hash functions of a filter holding `capacity` tokens at `error_rate`."""
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    return bits, max(1, round(bits / capacity * math.log(2)))
+
+
+def get_filter() -> tuple:
+    """Redis key, bits and hash functions of the filter of the settings."""
+    bits, hashes = get_shape(settings.BLACKLIST_FILTER_CAPACITY, settings.BLACKLIST_FILTER_ERROR_RATE)
+    return f'blacklist:filter:{bits}:{hashes}', bits, hashes
+
+
+def get_positions(jti: str, bits: int, hashes: int) -> list:
+    digest = blake2b(jti.encode(), digest_size=16).digest()
+    first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+    return [(first + i * second) % bits for i in range(hashes)]
+
+
+def might_be_blacklisted(jti: str) -> bool:
+    key, bits, hashes = get_filter()
+    pipeline = get_redis().pipeline(transaction=False)
+    # the bit past the positions is set once the filter is built.
+    pipeline.getbit(key, bits)
+    for position in get_positions(jti, bits, hashes):
+        pipeline.getbit(key, position)
+    try:
+        built, *hits = pipeline.execute()
+    except redis.RedisError:
+        return True
+    return not built or all(hits)
+
+
+def add(jtis) -> None:
+    """Adds `jtis` to the filter."""
+    key, bits, hashes = get_filter()
+    pipeline = get_redis().pipeline(transaction=False)
+    for jti in jtis:
+        for position in get_positions(jti, bits, hashes):
+            pipeline.setbit(key, position, 1)
+    pipeline.execute()
+
+
+def rebuild(chunk_size: int = 10000) -> int:
+    """Builds the filter from the blacklisted tokens not expired yet and swaps it in, returns their number."""
+    key, bits, hashes = get_filter()
+    start = timezone.now()
+    bitmap = bytearray(bits // 8 + 1)
+    blacklisted = BlacklistedToken.objects.filter(token__expires_at__gt=start).values_list('token__jti', flat=True)
+    count = 0
+    for jti in blacklisted.iterator(chunk_size=chunk_size):
+        for position in get_positions(jti, bits, hashes):
+            bitmap[position >> 3] |= 0x80 >> (position & 7)
+        count += 1
+    bitmap[bits >> 3] |= 0x80 >> (bits & 7)
+    client = get_redis()
+    client.set(f'{key}:rebuild', bytes(bitmap))
+    client.rename(f'{key}:rebuild', key)
+    # the tokens blacklisted while the filter was built, a minute earlier for the transactions still open then,
+    # were added to the filter swapped out.
+    add(BlacklistedToken.objects.filter(blacklisted_at__gte=start - timedelta(minutes=1)).values_list(
+        'token__jti', flat=True
+    ))
+    return count
+
+
+def purge_expired(batch_size: int = None, max_batches: int = None, dry_run: bool = False) -> dict:
+    """
+    Deletes the tokens expired by now and their blacklist entries batch by batch, one short transaction each,
+    returns the number of outstanding and blacklisted tokens deleted, or that would be with `dry_run`.
+    """
+    batch_size = settings.TOKEN_PURGE_BATCH_SIZE if batch_size is None else batch_size
+    now = timezone.now()
+    if dry_run:
+        return {
+            'outstanding': OutstandingToken.objects.filter(expires_at__lte=now).count(),
+            'blacklisted': BlacklistedToken.objects.filter(token__expires_at__lte=now).count(),
+        }
+    purged = {'outstanding': 0, 'blacklisted': 0}
+    # walks the primary key, `expires_at` has no index, a batch reads past the ids of the previous ones only.
+    last_id, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        ids = list(
+            OutstandingToken.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'expires_at')[:batch_size]
+        )
+        if not ids:
+            break
+        last_id = ids[-1][0]
+        expired = [token_id for token_id, expires_at in ids if expires_at <= now]
+        if expired:
+            with transaction.atomic():
+                purged['blacklisted'] += BlacklistedToken.objects.filter(token_id__in=expired).delete()[0]
+                # their blacklist entries are gone, a plain DELETE spares `delete` reading the tokens to cascade.
+                purged['outstanding'] += OutstandingToken.objects.filter(id__in=expired)._raw_delete(
+                    OutstandingToken.objects.db
+                )
+        batches += 1
+        if len(ids) < batch_size:
+            break
+    logger.info('purged %d expired tokens, %d of them blacklisted', purged['outstanding'], purged['blacklisted'])
+    return purged
+
+
+class RefreshToken(tokens.RefreshToken):
+    def check_blacklist(self) -> None:
+        if might_be_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
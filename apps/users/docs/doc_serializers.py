@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from apps.users.serializers import LeaderboardEntrySerializer
+
 
 class DocRegisterVerifySerializer(serializers.Serializer):
     message = serializers.CharField()
@@ -11,3 +13,22 @@ class DocRegisterSerializer(serializers.Serializer):
     username = serializers.CharField()
     email = serializers.CharField()
     message = serializers.CharField()
+
+
+class DocLeaderboardPaginationSerializer(serializers.Serializer):
+    current_page = serializers.IntegerField()
+    items_count = serializers.IntegerField()
+    pages_count = serializers.IntegerField()
+    previous_page = serializers.URLField(allow_null=True)
+    next_page = serializers.URLField(allow_null=True)
+    has_previous = serializers.BooleanField()
+    has_next = serializers.BooleanField()
+
+
+class DocLeaderboardSerializer(serializers.Serializer):
+    pagination = DocLeaderboardPaginationSerializer()
+    data = LeaderboardEntrySerializer(many=True)
+
+
+class DocLeaderboardRankSerializer(serializers.Serializer):
+    data = LeaderboardEntrySerializer()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.blacklist import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Deletes the expired outstanding tokens and their blacklist entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true', help='only count the tokens that would be deleted')
+
+    def handle(self, *args, **options):
+        purged = purge_expired(
+            batch_size=options['batch_size'], max_batches=options['max_batches'], dry_run=options['dry_run']
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {purged["outstanding"]} expired tokens, {purged["blacklisted"]} of them blacklisted.'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.reputation import rebuild_scores
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the score of every user from the reputation ledger and rebuilds the leaderboard.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = rebuild_scores(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed the score of {fixed} users, leaderboard rebuilt.'))
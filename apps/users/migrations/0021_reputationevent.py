@@ -0,0 +1,73 @@
+# Generated by Django 5.0.7 on 2026-10-18 14:06
+
+from collections import Counter
+from itertools import islice
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def open_balances(apps, schema_editor):
+    # the scores earned before the ledger become folded balance events, so the ledger adds up to them.
+    # the leaderboard is seeded from the scores by its first read, see `apps.users.reputation`.
+    UserProfile = apps.get_model('users', 'UserProfile')
+    ReputationEvent = apps.get_model('users', 'ReputationEvent')
+    ReputationEvent.objects.bulk_create(
+        (
+            ReputationEvent(user_id=owner_id, kind='balance', points=score, folded=True)
+            for owner_id, score in UserProfile.objects.exclude(score=0).values_list('owner_id', 'score').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+def record_votes(apps, schema_editor):
+    # votes did not count before the ledger, they are recorded and added to the scores now,
+    # so removing one takes back points that were granted.
+    UserProfile = apps.get_model('users', 'UserProfile')
+    ReputationEvent = apps.get_model('users', 'ReputationEvent')
+    Vote = apps.get_model('home', 'Vote')
+    votes = Vote.objects.order_by().values_list('answer__owner_id', 'is_like').iterator(chunk_size=1000)
+    deltas = Counter()
+    while batch := list(islice(votes, 1000)):
+        events = [
+            ReputationEvent(user_id=owner_id, kind='like', points=1, folded=True) if is_like else
+            ReputationEvent(user_id=owner_id, kind='dislike', points=-1, folded=True)
+            for owner_id, is_like in batch
+        ]
+        ReputationEvent.objects.bulk_create(events)
+        for event in events:
+            deltas[event.user_id] += event.points
+    for owner_id, points in deltas.items():
+        if points:
+            UserProfile.objects.filter(owner_id=owner_id).update(score=F('score') + points)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_alter_userprofile_avatar'),
+        ('home', '0027_answer_votes_count_vote_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReputationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('accept', 'answer accepted'), ('like', 'answer liked'), ('dislike', 'answer disliked'), ('undo', 'like or dislike removed'), ('balance', 'score before the ledger')], max_length=10)),
+                ('points', models.IntegerField()),
+                ('folded', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reputation_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('id',),
+                'indexes': [models.Index(condition=models.Q(('folded', False)), fields=['id'], name='reputation_unfolded_idx')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+        migrations.RunPython(record_votes, migrations.RunPython.noop),
+    ]
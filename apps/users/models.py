@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.core.validators import FileExtensionValidator
 from django.db import models
+from django.utils import timezone
 
 from .managers import UserManager
 
@@ -40,3 +41,82 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return f'{self.owner}'
+
+
+class ReputationEvent(models.Model):
+    """
+    Append-only ledger of the reputation a user gains or loses.
+    Events are never changed or deleted: a Celery task folds the unfolded ones into `UserProfile.score`
+    and flags them as folded, see `apps.users.reputation`.
+    """
+    ACCEPT = 'accept'
+    LIKE = 'like'
+    DISLIKE = 'dislike'
+    UNDO = 'undo'
+    BALANCE = 'balance'
+    KIND_CHOICES = (
+        (ACCEPT, 'answer accepted'),
+        (LIKE, 'answer liked'),
+        (DISLIKE, 'answer disliked'),
+        (UNDO, 'like or dislike removed'),
+        (BALANCE, 'score before the ledger'),
+    )
+    POINTS = {ACCEPT: 1, LIKE: 1, DISLIKE: -1}
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reputation_events')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    points = models.IntegerField()
+    folded = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = [
+            models.Index(fields=('id',), condition=models.Q(folded=False), name='reputation_unfolded_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.kind} {self.points:+}'
+
+
+class OutboundEmail(models.Model):
+    """
+    Outbox of the emails to send, drained in batches over one SMTP connection by a Celery task,
+    see `apps.users.outbox`. The link of an email is made when it is sent, so its token is fresh.
+    """
+    VERIFICATION = 'verification'
+    RESET_PASSWORD = 'reset_password'
+    ACTION_CHOICES = (
+        (VERIFICATION, 'verify the email address'),
+        (RESET_PASSWORD, 'reset the password'),
+    )
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'pending'),
+        (SENT, 'sent'),
+        (FAILED, 'failed'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='outbound_emails')
+    email = models.EmailField()
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    subject = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    sent = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=('next_attempt', 'id'), condition=models.Q(status='pending'), name='outbound_email_pending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.action} to {self.email} ({self.status})'
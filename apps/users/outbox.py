@@ -0,0 +1,179 @@
+"""
+Email outbox.
+
+The views append the emails to send to `OutboundEmail` with `enqueue`, in the transaction of the change they are
+about, and a single `drain_email_outbox` Celery task is scheduled for all the emails enqueued within
+EMAIL_OUTBOX_DRAIN_DELAY seconds. `drain` (also run by Celery beat, for the retries) claims the due emails batch by
+batch and sends every batch over one SMTP connection.
+An email that fails is retried EMAIL_OUTBOX_RETRY_DELAY seconds later, the delay doubles after every attempt,
+and it is given up after EMAIL_OUTBOX_MAX_ATTEMPTS attempts.
+The emails sent, retried and given up and the time spent sending them are counted in Redis, see `get_metrics`.
+"""
+import logging
+import time
+from collections import Counter
+from datetime import timedelta
+from smtplib import SMTPRecipientsRefused, SMTPResponseException
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from utils.cache import get_redis
+from utils.send_email import make_link_email
+from .models import OutboundEmail
+from .verification import make_token
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = 'outbox:metrics'
+DRAIN_SCHEDULED_KEY = 'outbox:drain-scheduled'
+LINKS = {
+    OutboundEmail.VERIFICATION: 'users:user-register-verify',
+    OutboundEmail.RESET_PASSWORD: 'users:set-password',
+}
+TOKEN_LIFETIME = timedelta(minutes=1)
+
+
+def enqueue(*, user_id: int, email: str, action: str, subject: str) -> OutboundEmail:
+    """Appends an email to the outbox, it is sent shortly after the current transaction commits."""
+    outbound = OutboundEmail.objects.create(user_id=user_id, email=email, action=action, subject=subject)
+    transaction.on_commit(schedule_drain)
+    return outbound
+
+
+def schedule_drain() -> None:
+    """Schedules a drain in EMAIL_OUTBOX_DRAIN_DELAY seconds, unless one is scheduled already."""
+    from .tasks import drain_email_outbox
+
+    delay = settings.EMAIL_OUTBOX_DRAIN_DELAY
+    # `drain_email_outbox` clears the flag when it starts, its timeout only covers a task that never ran.
+    if cache.add(DRAIN_SCHEDULED_KEY, 1, timeout=delay + settings.EMAIL_OUTBOX_INTERVAL):
+        drain_email_outbox.apply_async(countdown=delay)
+
+
+@transaction.atomic
+def claim_batch(batch_size: int) -> list:
+    """
+    Claims the `batch_size` oldest due emails, counting an attempt for each.
+    Their next attempt is pushed EMAIL_OUTBOX_LEASE seconds away, so other drains skip them while they are sent,
+    and the emails of a worker that died sending them are sent again once it is over.
+    """
+    now = timezone.now()
+    # skip_locked lets several workers claim different batches at the same time.
+    batch = list(
+        OutboundEmail.objects.select_for_update(skip_locked=True, of=('self',)).select_related('user').filter(
+            status=OutboundEmail.PENDING, next_attempt__lte=now
+        ).order_by('next_attempt', 'id')[:batch_size]
+    )
+    if batch:
+        OutboundEmail.objects.filter(id__in=[outbound.id for outbound in batch]).update(
+            attempts=F('attempts') + 1, next_attempt=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+        )
+        for outbound in batch:
+            outbound.attempts += 1
+    return batch
+
+
+def make_email(outbound: OutboundEmail):
+    token = make_token(outbound.user, outbound.action, TOKEN_LIFETIME)
+    url = f"http://{settings.DOMAIN}{reverse(LINKS[outbound.action], args=[token])}"
+    return make_link_email(outbound.email, url, outbound.subject)
+
+
+def send_batch(batch: list, connection) -> tuple:
+    """Sends `batch` over `connection`, returns the emails sent and the (email, error) pairs of those that failed."""
+    sent, failed = [], []
+    for outbound in batch:
+        # one email per call, the SMTP backend gives up the rest of the messages after the first error.
+        try:
+            connection.open()  # a no-op unless an error closed the connection.
+            connection.send_messages([make_email(outbound)])
+        except Exception as error:
+            failed.append((outbound, error))
+            if isinstance(error, OSError) and not isinstance(error, (SMTPResponseException, SMTPRecipientsRefused)):
+                # the server did not answer, the connection may be broken.
+                connection.close()
+        else:
+            sent.append(outbound)
+    return sent, failed
+
+
+def finish_batch(sent: list, failed: list) -> Counter:
+    """Marks the emails sent, schedules the retries of the failed ones, returns their counts."""
+    now = timezone.now()
+    counts = Counter(sent=len(sent))
+    if sent:
+        OutboundEmail.objects.filter(id__in=[outbound.id for outbound in sent]).update(
+            status=OutboundEmail.SENT, sent=now, last_error=''
+        )
+    for outbound, error in failed:
+        outbound.last_error = f'{type(error).__name__}: {error}'
+        if outbound.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            outbound.status = OutboundEmail.FAILED
+            counts['failed'] += 1
+        else:
+            delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (outbound.attempts - 1)
+            outbound.next_attempt = now + timedelta(seconds=delay)
+            counts['retried'] += 1
+    if failed:
+        OutboundEmail.objects.bulk_update(
+            [outbound for outbound, _ in failed], ('status', 'next_attempt', 'last_error')
+        )
+    return counts
+
+
+def drain(batch_size: int = None, max_batches: int = None) -> dict:
+    """
+    Sends the due emails batch by batch over one SMTP connection,
+    returns the number of emails sent, retried and given up, and the seconds it took.
+    """
+    batch_size = settings.EMAIL_OUTBOX_BATCH_SIZE if batch_size is None else batch_size
+    counts, batches = Counter(), 0
+    start = time.perf_counter()
+    connection = get_connection()
+    try:
+        while max_batches is None or batches < max_batches:
+            batch = claim_batch(batch_size)
+            if not batch:
+                break
+            counts += finish_batch(*send_batch(batch, connection))
+            batches += 1
+            if len(batch) < batch_size:
+                break
+    finally:
+        connection.close()
+    seconds = time.perf_counter() - start
+    if batches:
+        record_metrics(counts, batches, seconds)
+        logger.info(
+            'email outbox: %d sent, %d retried, %d failed in %.2fs', counts['sent'], counts['retried'],
+            counts['failed'], seconds
+        )
+    return {'sent': counts['sent'], 'retried': counts['retried'], 'failed': counts['failed'], 'seconds': seconds}
+
+
+def record_metrics(counts: Counter, batches: int, seconds: float) -> None:
+    pipeline = get_redis().pipeline(transaction=False)
+    for name in ('sent', 'retried', 'failed'):
+        pipeline.hincrby(METRICS_KEY, name, counts[name])
+    pipeline.hincrby(METRICS_KEY, 'batches', batches)
+    pipeline.hincrbyfloat(METRICS_KEY, 'seconds', seconds)
+    pipeline.execute()
+
+
+def get_metrics() -> dict:
+    """
+    Totals of the drains: emails sent, retried and given up, batches and seconds spent sending,
+    with the throughput, emails sent per second of sending, and the number of pending emails.
+    """
+    totals = get_redis().hgetall(METRICS_KEY)
+    metrics = {name: int(totals.get(name.encode(), 0)) for name in ('sent', 'retried', 'failed', 'batches')}
+    metrics['seconds'] = float(totals.get(b'seconds', 0))
+    metrics['per_second'] = metrics['sent'] / metrics['seconds'] if metrics['seconds'] else 0.0
+    metrics['pending'] = OutboundEmail.objects.filter(status=OutboundEmail.PENDING).count()
+    return metrics
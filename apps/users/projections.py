@@ -0,0 +1,58 @@
+"""
+Read path of the user profile that skips model instances and serializer fields,
+see `apps.home.projections`. Keep it in sync with `apps.users.serializers.UserSerializer`.
+"""
+from django.contrib.auth.models import Group, Permission
+
+from apps.home.projections import format_datetime
+from .models import UserProfile
+
+PROFILE_FIELDS = (
+    'id', 'profile__bio', 'profile__avatar', 'profile__score',
+    'last_login', 'username', 'email', 'is_active', 'is_admin'
+)
+
+
+def format_avatar(name, request=None):
+    """Same output as `rest_framework.fields.ImageField` for the `UserProfile.avatar` file `name`."""
+    if not name:
+        return None
+    url = UserProfile._meta.get_field('avatar').storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def get_access_querysets(user_id) -> tuple:
+    """The group and permission ids of a user, in the order `format_profile` takes them."""
+    return (
+        Group.objects.filter(user=user_id).values_list('id', flat=True),
+        Permission.objects.filter(user=user_id).values_list('id', flat=True),
+    )
+
+
+def project_profile(row, request=None) -> dict:
+    """Projects a `PROFILE_FIELDS` row like `UserSerializer`, in two more queries."""
+    return format_profile(row, *get_access_querysets(row['id']), request=request)
+
+
+async def aproject_profile(row, request=None) -> dict:
+    return format_profile(
+        row, *[[pk async for pk in queryset] for queryset in get_access_querysets(row['id'])], request=request
+    )
+
+
+def format_profile(row, groups, permissions, request=None) -> dict:
+    return {
+        'id': row['id'],
+        'bio': row['profile__bio'],
+        'avatar': format_avatar(row['profile__avatar'], request),
+        'score': row['profile__score'],
+        'last_login': format_datetime(row['last_login']),
+        'username': row['username'],
+        'email': row['email'],
+        'is_active': row['is_active'],
+        'is_admin': row['is_admin'],
+        'groups': list(groups),
+        'user_permissions': list(permissions),
+    }
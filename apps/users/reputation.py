@@ -0,0 +1,195 @@
+"""
+Reputation of the users.
+
+Every change is appended to the `ReputationEvent` ledger by the action that causes it,
+`fold_events` (run by the `fold_reputation_events` Celery task) adds the events to `UserProfile.score` in batches
+and keeps the leaderboard, a Redis sorted set of the scores, up to date. Deleted users are removed from it.
+The leaderboard is seeded from `UserProfile.score` by the first read that finds it was never built, e.g. after the
+ledger migration or if Redis lost it: `rebuild_leaderboard` sets a flag the reads check in the same round trip.
+"""
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from utils.cache import bump_version_on_commit, get_redis
+from .models import ReputationEvent, UserProfile
+from .services import get_profile_cache
+
+LEADERBOARD_KEY = 'leaderboard'
+SEEDED_KEY = f'{LEADERBOARD_KEY}:seeded'
+SEEDING_KEY = f'{LEADERBOARD_KEY}:seeding'
+SEEDING_TIMEOUT = 300
+
+
+def record(*, user_id: int, kind: str, points: int = None) -> ReputationEvent:
+    """Appends an event to the ledger, worth `ReputationEvent.POINTS[kind]` points by default."""
+    points = ReputationEvent.POINTS[kind] if points is None else points
+    return ReputationEvent.objects.create(user_id=user_id, kind=kind, points=points)
+
+
+def record_undo(*, user_id: int, kind: str) -> ReputationEvent:
+    """Appends an event that takes back the points of a `kind` event."""
+    return record(user_id=user_id, kind=ReputationEvent.UNDO, points=-ReputationEvent.POINTS[kind])
+
+
+def record_switch(*, user_id: int, kind: str, opposite: str) -> list:
+    """Appends the events of a vote switched from `opposite` to `kind`, in one statement."""
+    return ReputationEvent.objects.bulk_create([
+        ReputationEvent(user_id=user_id, kind=ReputationEvent.UNDO, points=-ReputationEvent.POINTS[opposite]),
+        ReputationEvent(user_id=user_id, kind=kind, points=ReputationEvent.POINTS[kind]),
+    ])
+
+
+def add_to_scores(deltas: dict) -> None:
+    """Adds `deltas`, points by user id, to the scores of the users in one statement."""
+    if deltas:
+        UserProfile.objects.filter(owner_id__in=deltas).update(
+            score=F('score') + Case(*(When(owner_id=user_id, then=Value(points)) for user_id, points in deltas.items()))
+        )
+        for user_id in deltas:
+            bump_version_on_commit(get_profile_cache(user_id))
+
+
+@transaction.atomic
+def fold_batch(batch_size: int) -> int:
+    """Folds the `batch_size` oldest unfolded events, returns the number of folded events."""
+    # skip_locked lets several workers fold different batches at the same time.
+    events = list(
+        ReputationEvent.objects.select_for_update(skip_locked=True).filter(folded=False).order_by('id').values_list(
+            'id', 'user_id', 'points'
+        )[:batch_size]
+    )
+    if not events:
+        return 0
+    deltas = Counter()
+    for _, user_id, points in events:
+        deltas[user_id] += points
+    deltas = {user_id: points for user_id, points in deltas.items() if points}
+    add_to_scores(deltas)
+    ReputationEvent.objects.filter(id__in=[event_id for event_id, *_ in events]).update(folded=True)
+    transaction.on_commit(lambda: increment_leaderboard(deltas))
+    return len(events)
+
+
+def fold_events(batch_size: int = None, max_batches: int = None) -> int:
+    """Folds the unfolded events batch by batch, returns the number of folded events."""
+    batch_size = settings.REPUTATION_FOLD_BATCH_SIZE if batch_size is None else batch_size
+    total, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        folded = fold_batch(batch_size)
+        total += folded
+        batches += 1
+        if folded < batch_size:
+            break
+    return total
+
+
+def increment_leaderboard(deltas: dict) -> None:
+    if deltas:
+        pipeline = get_redis().pipeline(transaction=False)
+        for user_id, points in deltas.items():
+            pipeline.zincrby(LEADERBOARD_KEY, points, user_id)
+        pipeline.execute()
+
+
+def remove_from_leaderboard(user_id: int) -> None:
+    get_redis().zrem(LEADERBOARD_KEY, user_id)
+
+
+def seed_leaderboard() -> None:
+    """Builds the leaderboard from the scores, unless another process is building it."""
+    client = get_redis()
+    # the other readers get the leaderboard as it is meanwhile.
+    if client.set(SEEDING_KEY, 1, nx=True, ex=SEEDING_TIMEOUT):
+        try:
+            rebuild_leaderboard()
+        finally:
+            client.delete(SEEDING_KEY)
+
+
+def read_leaderboard(*commands) -> list:
+    """
+    Returns the results of `commands`, functions adding a command to a pipeline, run in one round trip,
+    seeding the leaderboard first if it was never built.
+    """
+    for attempt in range(2):
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.exists(SEEDED_KEY)
+        for command in commands:
+            command(pipeline)
+        seeded, *results = pipeline.execute()
+        if seeded or attempt:
+            return results
+        seed_leaderboard()
+
+
+def get_leaderboard_size() -> int:
+    size, = read_leaderboard(lambda pipeline: pipeline.zcard(LEADERBOARD_KEY))
+    return size
+
+
+def get_top(*, offset: int = 0, limit: int = 10) -> list:
+    """Returns (user id, score) pairs of the best scores, in O(log n + limit)."""
+    rows, = read_leaderboard(
+        lambda pipeline: pipeline.zrevrange(LEADERBOARD_KEY, offset, offset + limit - 1, withscores=True)
+    )
+    return [(int(user_id), int(score)) for user_id, score in rows]
+
+
+def get_rank(user_id: int):
+    """Returns the (rank, score) of a user, rank 1 being the best score, or None for users not ranked, in O(log n)."""
+    rank, score = read_leaderboard(
+        lambda pipeline: pipeline.zrevrank(LEADERBOARD_KEY, user_id),
+        lambda pipeline: pipeline.zscore(LEADERBOARD_KEY, user_id),
+    )
+    if rank is None:
+        return None
+    return rank + 1, int(score)
+
+
+def rebuild_leaderboard(batch_size: int = 1000) -> int:
+    """Recreates the leaderboard from `UserProfile.score`, returns the number of ranked users."""
+    client = get_redis()
+    staging = f'{LEADERBOARD_KEY}:rebuild'
+    client.delete(staging)
+    scores = UserProfile.objects.order_by().values_list('owner_id', 'score').iterator(chunk_size=batch_size)
+    total = 0
+    while batch := dict(islice(scores, batch_size)):
+        client.zadd(staging, batch)
+        total += len(batch)
+    if total:
+        client.rename(staging, LEADERBOARD_KEY)
+    else:
+        client.delete(LEADERBOARD_KEY)
+    client.set(SEEDED_KEY, 1)
+    return total
+
+
+@transaction.atomic
+def rebuild_scores(batch_size: int = 1000) -> int:
+    """
+    Recomputes every score from the whole ledger, flags all the events as folded and rebuilds the leaderboard.
+    Returns the number of profiles whose score was wrong.
+    """
+    ReputationEvent.objects.filter(folded=False).update(folded=True)
+    totals = dict(
+        ReputationEvent.objects.order_by().values('user').annotate(total=Sum('points')).values_list('user', 'total')
+    )
+    wrong = iter([
+        (owner_id, totals.get(owner_id, 0))
+        for owner_id, score in UserProfile.objects.order_by().values_list('owner_id', 'score').iterator()
+        if totals.get(owner_id, 0) != score
+    ])
+    fixed = 0
+    while batch := dict(islice(wrong, batch_size)):
+        UserProfile.objects.filter(owner_id__in=batch).update(
+            score=Case(*(When(owner_id=user_id, then=Value(score)) for user_id, score in batch.items()))
+        )
+        for user_id in batch:
+            bump_version_on_commit(get_profile_cache(user_id))
+        fixed += len(batch)
+    transaction.on_commit(lambda: rebuild_leaderboard(batch_size))
+    return fixed
@@ -1,11 +1,15 @@
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from .blacklist import RefreshToken
 from .models import User
 
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RefreshToken
+
     @classmethod
     def get_token(cls, user, lifetime=None):
         token = super().get_token(user)
@@ -28,6 +32,11 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    # checks the blacklist through the filter of `apps.users.blacklist`.
+    token_class = RefreshToken
+
+
 class UserSerializer(serializers.ModelSerializer):
     bio = serializers.CharField(source='profile.bio', required=False)
     avatar = serializers.ImageField(source='profile.avatar', required=False)
@@ -164,3 +173,15 @@ class ResetPasswordSerializer(serializers.Serializer):
 
 class TokenSerializer(serializers.Serializer):
     refresh = serializers.CharField(required=True, write_only=True)
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    page = serializers.IntegerField(required=False, min_value=1, default=1)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100, default=10)
+
+
+class LeaderboardEntrySerializer(serializers.Serializer):
+    rank = serializers.IntegerField()
+    user_id = serializers.IntegerField()
+    username = serializers.CharField(allow_null=True)
+    score = serializers.IntegerField()
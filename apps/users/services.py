@@ -2,6 +2,11 @@ from .models import User, UserProfile
 from django.db import transaction
 
 
+def get_profile_cache(user_id) -> str:
+    """cache namespace of a user profile, see `utils.cache.conditional_response`."""
+    return f'profile:{user_id}'
+
+
 def create_user(*, username: str, email: str, password) -> User:
     return User.objects.create_user(username, email, password)
 
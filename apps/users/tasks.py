@@ -1,18 +1,33 @@
-from datetime import timedelta
-
 from celery import shared_task
-from django.conf import settings
-from django.urls import reverse
+from django.core.cache import cache
 
-from apps.users.models import User
-from utils import JWT_token, send_email
+from apps.users import blacklist, outbox
+from apps.users.reputation import fold_events
 
 
 @shared_task
 def send_verification_email(email_address: str, user_id: int, action: str, message: str):
-    user = User.objects.get(id=user_id)
-    token = JWT_token.generate_activation_token(user, timedelta(minutes=1))
-    url = f"http://{settings.DOMAIN}{reverse('users:user-register-verify', args=[token])}"
-    if action == 'reset_password':
-        url = f"http://{settings.DOMAIN}{reverse('users:set-password', args=[token])}"
-    send_email.send_link(email_address, url, message)
+    # kept for the tasks queued before the outbox, the emails are sent by `drain_email_outbox` now.
+    outbox.enqueue(user_id=user_id, email=email_address, action=action, subject=message)
+
+
+@shared_task
+def drain_email_outbox():
+    # the emails enqueued from now on need a drain of their own.
+    cache.delete(outbox.DRAIN_SCHEDULED_KEY)
+    return outbox.drain()
+
+
+@shared_task
+def fold_reputation_events():
+    return fold_events()
+
+
+@shared_task
+def rebuild_blacklist_filter():
+    return blacklist.rebuild()
+
+
+@shared_task
+def purge_expired_tokens():
+    return blacklist.purge_expired()
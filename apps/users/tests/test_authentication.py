@@ -0,0 +1,173 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import redis
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from apps.users import blacklist
+from apps.users.authentication import CachedJWTAuthentication, local_cache
+from apps.users.blacklist import RefreshToken
+from apps.users.models import User
+
+
+class TestCachedJWTAuthentication(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = baker.make(User, is_active=True)
+        self.user.set_password('Abc@1234')
+        self.user.save()
+        token = RefreshToken.for_user(self.user).access_token
+        self.request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def authenticate(self):
+        return CachedJWTAuthentication().authenticate(self.request)[0]
+
+    def test_cached(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual((user.id, user.username, user.is_active), (self.user.id, self.user.username, True))
+        local_cache.clear()
+        # from Redis.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(), self.user)
+
+    def test_password_not_cached(self):
+        self.authenticate()
+        user = self.authenticate()
+        self.assertIn('password', user.get_deferred_fields())
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('Abc@1234'))
+
+    def test_deactivated(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaisesMessage(AuthenticationFailed, 'User is inactive'):
+            self.authenticate()
+
+    def test_password_changed(self):
+        self.authenticate()
+        self.user.set_password('Xyz@1234')
+        self.user.save()
+        local_cache.clear()
+        # the snapshot of Redis belongs to the previous generation of the user.
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    @override_settings(AUTH_CACHE_LOCAL_SIZE=1)
+    def test_local_cache_bounded(self):
+        self.authenticate()
+        other = baker.make(User, is_active=True)
+        token = RefreshToken.for_user(other).access_token
+        CachedJWTAuthentication().authenticate(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+        self.assertEqual([user_id for _, user_id, _ in local_cache.entries.values()], [other.id])
+
+    def test_authenticated_request(self):
+        self.authenticate()
+        url = reverse('users:change-password')
+        data = {'old_password': 'Abc@1234', 'new_password': 'asdF@123', 'confirm_new_password': 'asdF@123'}
+        response = self.client.put(url, data, HTTP_AUTHORIZATION=self.request.META['HTTP_AUTHORIZATION'])
+        self.assertEqual(response.status_code, 200)
+        response = self.client.put(url, data, HTTP_AUTHORIZATION=self.request.META['HTTP_AUTHORIZATION'])
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('asdF@123'))
+
+
+@override_settings(BLACKLIST_FILTER_CAPACITY=1000, BLACKLIST_FILTER_ERROR_RATE=0.01)
+class TestBlacklistFilter(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = baker.make(User, is_active=True)
+        self.token = str(RefreshToken.for_user(self.user))
+
+    def block(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('users:token-block'), {'refresh': token})
+
+    def test_shape(self):
+        self.assertEqual(blacklist.get_shape(1000000, 0.001), (14377588, 10))
+        self.assertEqual(blacklist.get_filter(), ('blacklist:filter:9586:7', 9586, 7))
+
+    def test_looked_up_until_built(self):
+        with self.assertNumQueries(1):
+            RefreshToken(self.token)
+        self.assertEqual(blacklist.rebuild(), 0)
+        with self.assertNumQueries(0):
+            RefreshToken(self.token)
+
+    def test_blacklisted(self):
+        blacklist.rebuild()
+        self.block(self.token)
+        with self.assertRaisesMessage(TokenError, 'Token is blacklisted'):
+            RefreshToken(self.token)
+        self.assertEqual(blacklist.rebuild(), 1)
+        with self.assertRaisesMessage(TokenError, 'Token is blacklisted'):
+            RefreshToken(self.token)
+
+    def test_refresh_rotation(self):
+        blacklist.rebuild()
+        url = reverse('users:token-refresh')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'refresh': self.token})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(blacklist.might_be_blacklisted(RefreshToken(self.token, verify=False)['jti']))
+        self.assertEqual(self.client.post(url, {'refresh': self.token}).status_code, 401)
+        with self.assertNumQueries(0):
+            RefreshToken(response.data['refresh'])
+
+    def test_expired_dropped(self):
+        token = baker.make(OutstandingToken, user=self.user, jti='expired', expires_at=timezone.now() - timedelta(1))
+        BlacklistedToken.objects.create(token=token)
+        self.block(self.token)
+        self.assertEqual(blacklist.rebuild(), 1)
+
+    def test_redis_down(self):
+        blacklist.rebuild()
+        with patch('redis.client.Pipeline.execute', side_effect=redis.ConnectionError):
+            self.assertTrue(blacklist.might_be_blacklisted('jti'))
+
+
+class TestPurgeExpiredTokens(APITestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.tokens = [
+            baker.make(OutstandingToken, jti=f'jti{i}', expires_at=now + timedelta(days=1 if i % 3 == 0 else -1))
+            for i in range(10)
+        ]
+        for token in self.tokens[:6]:
+            BlacklistedToken.objects.create(token=token)
+
+    def test_purge_in_batches(self):
+        # 4 batches of up to 3 tokens, the expired ones of 3 of them deleted with their blacklist entries.
+        with self.assertNumQueries(4 + 3 * 4):
+            purged = blacklist.purge_expired(batch_size=3)
+        self.assertEqual(purged, {'outstanding': 6, 'blacklisted': 4})
+        jtis = OutstandingToken.objects.order_by('id').values_list('jti', flat=True)
+        self.assertEqual(list(jtis), ['jti0', 'jti3', 'jti6', 'jti9'])
+        self.assertEqual(list(BlacklistedToken.objects.values_list('token__jti', flat=True)), ['jti0', 'jti3'])
+
+    def test_max_batches(self):
+        self.assertEqual(blacklist.purge_expired(batch_size=3, max_batches=1), {'outstanding': 2, 'blacklisted': 2})
+
+    def test_command(self):
+        out = StringIO()
+        call_command('purge_tokens', '--dry-run', stdout=out)
+        self.assertIn('Would delete 6 expired tokens, 4 of them blacklisted.', out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 10)
+        call_command('purge_tokens', '--batch-size', '4', stdout=out)
+        self.assertIn('Deleted 6 expired tokens, 4 of them blacklisted.', out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 4)
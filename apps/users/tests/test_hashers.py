@@ -0,0 +1,91 @@
+import threading
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.test import override_settings
+from django.urls import reverse
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from apps.users.models import User
+from utils import hashers
+
+ARGON2_FIRST = ['utils.hashers.Argon2PasswordHasher', 'utils.hashers.PBKDF2PasswordHasher']
+PBKDF2_FIRST = ['utils.hashers.PBKDF2PasswordHasher', 'utils.hashers.Argon2PasswordHasher']
+SCRYPT_FIRST = ['utils.hashers.ScryptPasswordHasher', 'utils.hashers.Argon2PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=ARGON2_FIRST)
+class TestPasswordHashing(APITestCase):
+    def setUp(self):
+        self.user = baker.make(User, email='user@gmail.com', is_active=True)
+        self.user.set_password('Abc@1234')
+        self.user.save()
+        self.url = reverse('users:token-obtain-pair')
+
+    def login(self, password='Abc@1234'):
+        return self.client.post(self.url, {'email': 'user@gmail.com', 'password': password})
+
+    def get_algorithm(self):
+        self.user.refresh_from_db()
+        return identify_hasher(self.user.password).algorithm
+
+    def test_policy_hasher(self):
+        self.assertEqual(self.get_algorithm(), 'argon2')
+        with self.settings(PASSWORD_HASHERS=SCRYPT_FIRST):
+            self.assertTrue(make_password('Abc@1234').startswith('scrypt$16384$'))
+        with self.settings(PASSWORD_HASHERS=PBKDF2_FIRST, PASSWORD_PBKDF2_ITERATIONS=1000):
+            self.assertTrue(make_password('Abc@1234').startswith('pbkdf2_sha256$1000$'))
+
+    def test_rehash_on_login(self):
+        with self.settings(PASSWORD_HASHERS=PBKDF2_FIRST, PASSWORD_PBKDF2_ITERATIONS=1000):
+            self.user.set_password('Abc@1234')
+            self.user.save()
+        self.assertEqual(self.get_algorithm(), 'pbkdf2_sha256')
+        self.assertEqual(self.login(password='wrong').status_code, 401)
+        self.assertEqual(self.get_algorithm(), 'pbkdf2_sha256')
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.get_algorithm(), 'argon2')
+        self.assertEqual(self.login().status_code, 200)
+
+    @override_settings(PASSWORD_ARGON2_TIME_COST=3)
+    def test_rehash_on_new_parameters(self):
+        self.assertIn('t=2', self.user.password)
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertIn('t=3', self.user.password)
+
+
+class TestHashingPool(APITestCase):
+    @override_settings(PASSWORD_HASHING_THREADS=2)
+    def test_offloaded(self):
+        self.assertTrue(hashers.offload(lambda: threading.current_thread().name).startswith('hashing'))
+        # nested calls run on the pool thread they are made on.
+        self.assertEqual(
+            hashers.offload(lambda: hashers.offload(threading.current_thread)),
+            hashers.offload(threading.current_thread),
+        )
+        user = baker.make(User)
+        user.set_password('Abc@1234')
+        self.assertTrue(user.check_password('Abc@1234'))
+
+    def test_not_offloaded(self):
+        self.assertIs(hashers.offload(threading.current_thread), threading.current_thread())
+
+    @override_settings(PASSWORD_HASHING_THREADS=1, PASSWORD_HASHING_QUEUE=0)
+    def test_busy(self):
+        started, release = threading.Event(), threading.Event()
+
+        def hash_slowly():
+            started.set()
+            release.wait()
+
+        thread = threading.Thread(target=hashers.offload, args=(hash_slowly,))
+        thread.start()
+        started.wait()
+        try:
+            response = self.client.post(reverse('users:token-obtain-pair'), {'email': 'a@gmail.com', 'password': 'x'})
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data['detail'].code, 'hashing_busy')
@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from apps.users import outbox, verification
+from apps.users.models import OutboundEmail, User
+from apps.users.tasks import drain_email_outbox
+from utils.smtp_sink import SMTPSink
+
+
+@override_settings(EMAIL_OUTBOX_RETRY_DELAY=30, EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+class TestOutbox(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = baker.make(User, is_active=False, _quantity=3)
+
+    def enqueue(self, user, action=OutboundEmail.VERIFICATION):
+        return outbox.enqueue(user_id=user.id, email=user.email, action=action, subject='Verification URL')
+
+    def make_due(self):
+        OutboundEmail.objects.update(next_attempt=timezone.now())
+
+    def test_register_enqueues(self):
+        data = {'username': 'user', 'email': 'user@gmail.com', 'password': 'Abc@1234', 'password2': 'Abc@1234'}
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse('users:user-register'), data)
+        outbound = OutboundEmail.objects.get()
+        self.assertEqual((outbound.email, outbound.action), ('user@gmail.com', OutboundEmail.VERIFICATION))
+        self.assertIn(outbox.schedule_drain, callbacks)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_one_drain_scheduled(self):
+        self.assertTrue(cache.add(outbox.DRAIN_SCHEDULED_KEY, 1))
+        # a drain is already scheduled, the task is not queued again.
+        outbox.schedule_drain()
+        drain_email_outbox.apply()
+        self.assertIsNone(cache.get(outbox.DRAIN_SCHEDULED_KEY))
+
+    def test_drain_in_batches(self):
+        for user in self.users:
+            self.enqueue(user)
+        self.enqueue(self.users[0], OutboundEmail.RESET_PASSWORD)
+        result = outbox.drain(batch_size=3)
+        self.assertEqual((result['sent'], result['retried'], result['failed']), (4, 0, 0))
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(
+            set(OutboundEmail.objects.values_list('status', 'attempts')), {(OutboundEmail.SENT, 1)}
+        )
+        self.assertEqual(outbox.drain()['sent'], 0)
+
+    def test_fresh_links(self):
+        self.enqueue(self.users[0])
+        self.enqueue(self.users[1], OutboundEmail.RESET_PASSWORD)
+        outbox.drain()
+        verify, reset = mail.outbox
+        self.assertEqual((verify.to, verify.subject), ([self.users[0].email], 'Verification URL'))
+        token = verify.alternatives[0][0].split('/verify/')[1].split('/')[0]
+        self.assertEqual(verification.read(token, OutboundEmail.VERIFICATION).user_id, self.users[0].id)
+        self.assertIn('/set/', reset.alternatives[0][0])
+        self.assertIn('Activate your account', reset.body)
+
+    def test_retry_with_backoff(self):
+        rejected, accepted = self.users[:2]
+        self.enqueue(rejected)
+        self.enqueue(accepted)
+        with SMTPSink(reject={rejected.email: '451 Try again later'}) as sink, override_settings(**sink.settings):
+            start = timezone.now()
+            self.assertEqual(outbox.drain()['retried'], 1)
+            outbound = OutboundEmail.objects.get(email=rejected.email)
+            self.assertEqual((outbound.status, outbound.attempts), (OutboundEmail.PENDING, 1))
+            self.assertIn('SMTPRecipientsRefused', outbound.last_error)
+            self.assertGreaterEqual(outbound.next_attempt, start + timedelta(seconds=30))
+            # not due yet.
+            self.assertEqual(outbox.drain()['retried'], 0)
+
+            self.make_due()
+            self.assertEqual(outbox.drain()['failed'], 1)
+            outbound.refresh_from_db()
+            self.assertEqual((outbound.status, outbound.attempts), (OutboundEmail.FAILED, 2))
+        self.assertEqual([message['To'] for message in sink.messages], [accepted.email])
+        self.assertEqual(OutboundEmail.objects.get(email=accepted.email).status, OutboundEmail.SENT)
+
+    def test_one_connection_per_drain(self):
+        for user in self.users:
+            self.enqueue(user)
+        with SMTPSink() as sink, override_settings(**sink.settings):
+            self.assertEqual(outbox.drain(batch_size=2)['sent'], 3)
+            self.assertEqual(outbox.drain()['sent'], 0)
+        self.assertEqual(len(sink.messages), 3)
+        # the second drain had nothing to send and never connected.
+        self.assertEqual(sink.connections, 1)
+
+    def test_server_down(self):
+        self.enqueue(self.users[0])
+        with SMTPSink() as sink:
+            settings = sink.settings
+        with override_settings(**settings):
+            self.assertEqual(outbox.drain()['retried'], 1)
+        self.assertIn('ConnectionRefusedError', OutboundEmail.objects.get().last_error)
+
+    def test_claimed_skipped(self):
+        self.enqueue(self.users[0])
+        claimed = outbox.claim_batch(10)
+        self.assertEqual(len(claimed), 1)
+        # a drain running meanwhile leaves the claimed emails alone.
+        self.assertEqual(outbox.claim_batch(10), [])
+
+    def test_metrics(self):
+        for user in self.users:
+            self.enqueue(user)
+        outbox.drain(batch_size=2)
+        self.enqueue(self.users[0])
+        metrics = outbox.get_metrics()
+        self.assertEqual(
+            {name: metrics[name] for name in ('sent', 'retried', 'failed', 'batches', 'pending')},
+            {'sent': 3, 'retried': 0, 'failed': 0, 'batches': 2, 'pending': 1},
+        )
+        self.assertGreater(metrics['per_second'], 0)
@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from apps.home.models import Answer
+from apps.home.services import toggle_vote
+from apps.users import reputation
+from apps.users.models import ReputationEvent, UserProfile
+
+
+class TestReputation(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.profiles = baker.make(UserProfile, _quantity=3)
+        self.users = [profile.owner for profile in self.profiles]
+
+    def get_scores(self):
+        return [UserProfile.objects.get(id=profile.id).score for profile in self.profiles]
+
+    def test_votes_recorded(self):
+        answer = baker.make(Answer, owner=self.users[0])
+        toggle_vote(owner=self.users[1], answer_id=answer.id, is_like=True)
+        toggle_vote(owner=self.users[2], answer_id=answer.id, is_like=False)
+        toggle_vote(owner=self.users[2], answer_id=answer.id, is_like=True)
+        toggle_vote(owner=self.users[1], answer_id=answer.id, is_like=True)
+        kinds = list(ReputationEvent.objects.filter(user=self.users[0]).values_list('kind', 'points'))
+        self.assertEqual(kinds, [('like', 1), ('dislike', -1), ('undo', 1), ('like', 1), ('undo', -1)])
+        reputation.fold_events()
+        self.assertEqual(self.get_scores(), [1, 0, 0])
+
+    def test_fold_in_batches(self):
+        for i, user in enumerate(self.users):
+            for _ in range(i + 1):
+                reputation.record(user_id=user.id, kind=ReputationEvent.ACCEPT)
+        reputation.record(user_id=self.users[2].id, kind=ReputationEvent.DISLIKE)
+        # one query for the batch, one update of the scores, one for the events, wrapped in a savepoint.
+        with self.assertNumQueries(5):
+            self.assertEqual(reputation.fold_batch(4), 4)
+        self.assertEqual(reputation.fold_events(batch_size=2, max_batches=1), 2)
+        self.assertEqual(reputation.fold_events(batch_size=2), 1)
+        self.assertFalse(ReputationEvent.objects.filter(folded=False).exists())
+        self.assertEqual(self.get_scores(), [1, 2, 2])
+
+    def test_leaderboard(self):
+        reputation.rebuild_leaderboard()
+        for i, user in enumerate(self.users):
+            reputation.record(user_id=user.id, kind=ReputationEvent.LIKE, points=i * 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            reputation.fold_events()
+        self.assertEqual(reputation.get_leaderboard_size(), 3)
+        self.assertEqual(reputation.get_top(limit=2), [(self.users[2].id, 20), (self.users[1].id, 10)])
+        self.assertEqual(reputation.get_top(offset=2, limit=2), [(self.users[0].id, 0)])
+        self.assertEqual(reputation.get_rank(self.users[1].id), (2, 10))
+        self.assertIsNone(reputation.get_rank(0))
+
+    def test_deleted_user_removed(self):
+        reputation.rebuild_leaderboard()
+        user_id = self.users[0].id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[0].delete()
+        self.assertEqual(reputation.get_leaderboard_size(), 2)
+        self.assertIsNone(reputation.get_rank(user_id))
+
+    def test_leaderboard_seeded(self):
+        # scores from before the ledger, the leaderboard was never built.
+        UserProfile.objects.filter(owner=self.users[1]).update(score=42)
+        reputation.record(user_id=self.users[1].id, kind=ReputationEvent.ACCEPT)
+        self.assertEqual(reputation.get_rank(self.users[1].id), (1, 42))
+        with self.captureOnCommitCallbacks(execute=True):
+            reputation.fold_events()
+        self.assertEqual(reputation.get_top(limit=1), [(self.users[1].id, 43)])
+        self.assertEqual(reputation.get_leaderboard_size(), 3)
+
+    def test_rebuild_command(self):
+        user = self.users[0]
+        reputation.record(user_id=user.id, kind=ReputationEvent.ACCEPT)
+        reputation.record(user_id=user.id, kind=ReputationEvent.ACCEPT)
+        UserProfile.objects.filter(owner=self.users[1]).update(score=42)
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_reputation', stdout=out)
+        self.assertIn('Fixed the score of 2 users', out.getvalue())
+        self.assertEqual(self.get_scores(), [2, 0, 0])
+        self.assertFalse(ReputationEvent.objects.filter(folded=False).exists())
+        self.assertEqual(reputation.get_rank(user.id), (1, 2))
@@ -53,3 +53,12 @@ class TestUrls(APISimpleTestCase):
     def test_user_list_url(self):
         user_list_url = reverse('users:users-list')
         self.assertEqual(resolve(user_list_url).func.view_class, views.UsersListAPI)
+
+    # Leaderboard
+    def test_leaderboard_url(self):
+        leaderboard_url = reverse('users:leaderboard')
+        self.assertEqual(resolve(leaderboard_url).func.view_class, views.LeaderboardAPI)
+
+    def test_leaderboard_rank_url(self):
+        leaderboard_rank_url = reverse('users:leaderboard-rank', args=(21,))
+        self.assertEqual(resolve(leaderboard_rank_url).func.view_class, views.LeaderboardRankAPI)
@@ -1,12 +1,14 @@
 import os
-from datetime import timedelta, datetime
+from datetime import timedelta
 from unittest.mock import patch
 from urllib.parse import urlencode
 
-import jwt
-from django.conf import settings
+import redis
+from django.core.cache import cache
+from django.contrib.auth.models import Group, Permission
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.shortcuts import Http404
+from django.test import override_settings
+from django.utils import timezone
 from django.urls import reverse
 from model_bakery import baker
 from rest_framework import status
@@ -14,9 +16,9 @@ from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from apps.users.models import User, UserProfile
+from apps.users import reputation, verification
+from apps.users.models import OutboundEmail, User, UserProfile
 from apps.users.views import UsersListAPI
-from utils import JWT_token
 
 
 class TestUsersListAPI(APITestCase):
@@ -102,19 +104,17 @@ class TestUserRegisterAPI(APITestCase):
 
 class TestUserRegisterVerificationAPI(APITestCase):
     def setUp(self):
+        cache.clear()
         self.url = reverse('users:user-register-verify', args=['invalid_token'])
         self.user = baker.make(User, is_active=False)
-        self.token = JWT_token.generate_activation_token(self.user, timedelta(minutes=1))
+        self.token = verification.make_token(self.user, OutboundEmail.VERIFICATION, timedelta(minutes=1))
 
     def create_expired_token(self):
-        payload = {
-            'user_id': self.user.id,
-            'exp': datetime.now() - timedelta(days=34)
-        }
-        return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+        return verification.make_token(self.user, OutboundEmail.VERIFICATION, timedelta(days=-34))
 
     def test_account_activation_success(self):
-        response = self.client.get(self.url.replace('invalid_token', self.token))
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url.replace('invalid_token', self.token))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('message', response.data)
         self.assertEqual(response.data['message'], 'Account activated successfully.')
@@ -129,9 +129,8 @@ class TestUserRegisterVerificationAPI(APITestCase):
         self.assertIn('message', response.data)
         self.assertEqual(response.data['message'], 'this account already is active.')
 
-    @patch('apps.users.views.JWT_token.get_object_or_404')
-    def test_activation_url_invalid(self, mock_jwt_decode_token):
-        mock_jwt_decode_token.side_effect = Http404
+    def test_activation_url_invalid(self):
+        self.user.delete()
         response = self.client.get(self.url.replace('invalid_token', self.token))
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertIn('error', response.data)
@@ -145,11 +144,32 @@ class TestUserRegisterVerificationAPI(APITestCase):
 
     def test_expired_token(self):
         expired_token = self.create_expired_token()
-        response = self.client.get(self.url.replace('invalid_token', expired_token))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url.replace('invalid_token', expired_token))
         self.assertEqual(response.status_code, 400)
         self.assertIn('error', response.data)
         self.assertEqual(response.data['error'], 'Activation link has expired!')
 
+    def test_reset_password_token(self):
+        token = verification.make_token(self.user, OutboundEmail.RESET_PASSWORD)
+        response = self.client.get(self.url.replace('invalid_token', token))
+        self.assertEqual(response.data['error'], 'Activation link is invalid!')
+
+    def test_used_once(self):
+        url = self.url.replace('invalid_token', self.token)
+        self.client.get(url)
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Activation link has already been used!')
+
+    def test_redis_down(self):
+        url = self.url.replace('invalid_token', self.token)
+        with patch('redis.Redis.set', side_effect=redis.ConnectionError):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_409_CONFLICT)
+
 
 class TestResendVerificationEmailAPI(APITestCase):
     def setUp(self):
@@ -216,27 +236,48 @@ class TestChangePasswordAPI(APITestCase):
 
 class TestSetPasswordAPI(APITestCase):
     def setUp(self):
+        cache.clear()
         self.user = baker.make(User, is_active=True)
-        self.token = JWT_token.generate_activation_token(self.user, timedelta(minutes=1))
+        self.token = verification.make_token(self.user, OutboundEmail.RESET_PASSWORD, timedelta(minutes=1))
         self.url = reverse('users:set-password', args=[self.token])
+        self.data = {'new_password': 'asdF@123', 'confirm_new_password': 'asdF@123'}
 
     def test_successful_set_password(self):
-        data = {'new_password': 'asdF@123', 'confirm_new_password': 'asdF@123'}
-        response = self.client.post(self.url, data)
+        with self.assertNumQueries(2):
+            response = self.client.post(self.url, self.data)
         self.user.refresh_from_db()
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['message'], 'Password changed successfully.')
-        self.assertTrue(self.user.check_password(data['new_password']))
+        self.assertTrue(self.user.check_password(self.data['new_password']))
 
-    @patch('apps.users.views.JWT_token.get_object_or_404')
-    def test_invalid_token_user(self, mock_not_found):
-        data = {'new_password': 'asdF@123', 'confirm_new_password': 'asdF@123'}
-        mock_not_found.side_effect = Http404
-        response = self.client.post(self.url, data)
-        self.user.refresh_from_db()
+    def test_invalid_token_user(self):
+        self.user.delete()
+        response = self.client.post(self.url, self.data)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(response.data['error'], 'Activation URL is invalid')
-        self.assertFalse(self.user.check_password(data['new_password']))
+
+    def test_invalid_password(self):
+        response = self.client.post(self.url, {'new_password': 'asdF@123', 'confirm_new_password': 'other'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('new_password', response.data['errors'])
+        # the link is not used up.
+        self.assertEqual(self.client.post(self.url, self.data).status_code, 200)
+
+    def test_used_once(self):
+        self.client.post(self.url, self.data)
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {'new_password': 'qwer@A123', 'confirm_new_password': 'qwer@A123'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Activation link has already been used!')
+
+    def test_password_changed(self):
+        other = verification.make_token(self.user, OutboundEmail.RESET_PASSWORD, timedelta(minutes=2))
+        self.client.post(self.url, self.data)
+        response = self.client.post(reverse('users:set-password', args=[other]), self.data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Activation link is invalid!')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password(self.data['new_password']))
 
 
 class TestResetPasswordAPI(APITestCase):
@@ -292,6 +333,17 @@ class TestUserProfileAPI(APITestCase):
         self.assertEqual(response.data['username'], self.user.username)
         self.assertEqual(response.data['score'], 0)
 
+    def test_retrieve_user_profile_not_modified(self):
+        url = reverse('users:user-profile', args=[self.user.id])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.user.profile.score = 10
+        self.user.profile.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['score'], 10)
+
     def test_retrieve_user_profile_not_found(self):
         url = reverse('users:user-profile', args=[23])
         response = self.client.get(url)
@@ -318,12 +370,14 @@ class TestUserProfileAPI(APITestCase):
         self.assertEqual(self.user.username, 'new_username')
         self.assertTrue(self.user.profile.avatar.name.endswith('avatar.png'))
 
-    @patch('apps.users.views.send_verification_email.delay_on_commit')
-    def test_update_email(self, mock_send_email_task):
+    def test_update_email(self):
         data = {'email': 'email@email.com'}
         url = reverse('users:user-profile', args=[1])
         response = self.client.patch(url, data, HTTP_AUTHORIZATION='Bearer ' + self.token)
-        mock_send_email_task.assert_called_once()
+        self.assertEqual(
+            list(OutboundEmail.objects.values_list('user', 'email', 'action')),
+            [(self.user.id, 'email@email.com', OutboundEmail.VERIFICATION)],
+        )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.user.refresh_from_db()
         self.assertFalse(self.user.is_active)
@@ -335,3 +389,92 @@ class TestUserProfileAPI(APITestCase):
         response = self.client.delete(url, HTTP_AUTHORIZATION='Bearer ' + self.token)
         self.assertEqual(response.status_code, 204)
         self.assertNotIn(self.user, User.objects.all())
+
+
+class TestUserProfileProjectionParity(APITestCase):
+    def assertSameResponse(self, url):
+        with override_settings(FAST_READ_PATH=False):
+            expected = self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+
+    def test_profile(self):
+        user = baker.make(User, is_active=True, username=' سارا', last_login=timezone.now())
+        baker.make(UserProfile, owner=user, bio='bio', score=7, avatar='avatars/a.png')
+        user.groups.add(baker.make(Group), baker.make(Group))
+        user.user_permissions.add(*Permission.objects.all()[:3])
+        self.assertSameResponse(reverse('users:user-profile', args=[user.id]))
+
+    def test_profile_without_profile(self):
+        user = baker.make(User, is_active=True)
+        self.assertSameResponse(reverse('users:user-profile', args=[user.id]))
+
+    def test_not_found(self):
+        self.assertSameResponse(reverse('users:user-profile', args=[0]))
+
+
+class TestAsyncUserProfile(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = baker.make(User, is_active=True, last_login=timezone.now())
+        baker.make(UserProfile, owner=self.user, bio='bio', score=7)
+        self.user.groups.add(baker.make(Group))
+
+    def test_same_as_profile(self):
+        response = self.client.get(reverse('async:user-profile', args=[self.user.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.content, self.client.get(reverse('users:user-profile', args=[self.user.id])).content
+        )
+
+    def test_not_modified(self):
+        url = reverse('async:user-profile', args=[self.user.id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.user.profile.bio = 'changed'
+        self.user.profile.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_inactive(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('async:user-profile', args=[self.user.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class TestLeaderboardAPI(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = baker.make(User, _quantity=3)
+        for i, user in enumerate(self.users):
+            baker.make(UserProfile, owner=user, score=i)
+        reputation.rebuild_leaderboard()
+
+    def test_top(self):
+        response = self.client.get(reverse('users:leaderboard'), {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['pagination']['items_count'], 3)
+        self.assertTrue(response.data['pagination']['has_next'])
+        self.assertEqual(
+            [(entry['rank'], entry['username'], entry['score']) for entry in response.data['data']],
+            [(1, self.users[2].username, 2), (2, self.users[1].username, 1)],
+        )
+        response = self.client.get(reverse('users:leaderboard'), {'limit': 2, 'page': 2})
+        self.assertEqual([entry['rank'] for entry in response.data['data']], [3])
+        self.assertFalse(response.data['pagination']['has_next'])
+
+    def test_invalid_query(self):
+        response = self.client.get(reverse('users:leaderboard'), {'limit': 1000})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rank(self):
+        response = self.client.get(reverse('users:leaderboard-rank', args=[self.users[1].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['rank'], 2)
+        self.assertEqual(response.data['data']['score'], 1)
+
+    def test_rank_not_ranked(self):
+        user = baker.make(User)
+        self.assertEqual(self.client.get(reverse('users:leaderboard-rank', args=[user.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('users:leaderboard-rank', args=[0])).status_code, 404)
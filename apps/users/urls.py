@@ -23,6 +23,8 @@ urlpatterns = [
     path('register/verify/<str:token>/', views.UserRegisterVerifyAPI.as_view(), name='user-register-verify'),
     path('resend-email/', views.ResendVerificationEmailAPI.as_view(), name='user-register-resend-email'),
     path('profile/<int:id>/', views.UserProfileAPI.as_view(), name='user-profile'),
+    path('leaderboard/', views.LeaderboardAPI.as_view(), name='leaderboard'),
+    path('leaderboard/<int:id>/', views.LeaderboardRankAPI.as_view(), name='leaderboard-rank'),
     path('token/', include(token)),
     path('password/', include(password))
 ]
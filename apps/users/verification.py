@@ -0,0 +1,109 @@
+"""
+Single-use links of the verification and password reset emails.
+
+A link carries a token signed with SECRET_KEY, salted by the action of its email, holding the id of the user,
+its expiry and a fingerprint of the password hash and `is_active` of the user when it was made.
+Forged, expired and used tokens are rejected before any query: `read` checks the signature and the expiry,
+and every token used is recorded in Redis until it expires, under a key the second use of the link finds.
+`activate` is a single UPDATE of the user if still inactive, and `set_password` replaces the password hash only
+while it is the one of the fingerprint, so a link is used once even if Redis fails, and a password reset link
+stops working once the password changed.
+"""
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+import redis
+from django.contrib.auth.hashers import make_password
+from django.core import signing
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework import status
+
+from utils.cache import get_redis
+from .models import User
+from .signals import user_changed
+
+KEY_SALT = 'apps.users.verification'
+TOKEN_LIFETIME = timedelta(minutes=5)
+
+
+class LinkError(Exception):
+    def __init__(self, message: str, status_code: int = status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass(frozen=True)
+class Link:
+    token: str
+    user_id: int
+    expires: int
+    fingerprint: str
+
+
+def get_signer(action: str) -> signing.Signer:
+    # a token of one action is not valid for the other.
+    return signing.Signer(salt=f'{KEY_SALT}.{action}')
+
+
+def get_fingerprint(password: str, is_active: bool) -> str:
+    return salted_hmac(KEY_SALT, f'{password}{is_active:d}', algorithm='sha256').hexdigest()[:16]
+
+
+def make_token(user: User, action: str, lifetime: timedelta = TOKEN_LIFETIME) -> str:
+    return get_signer(action).sign_object({
+        'u': user.id,
+        'e': int(time.time() + lifetime.total_seconds()),
+        'f': get_fingerprint(user.password, user.is_active),
+    })
+
+
+def read(token: str, action: str) -> Link:
+    """Returns the link of `token`, raises `LinkError` if it is forged or expired."""
+    try:
+        payload = get_signer(action).unsign_object(token)
+    except signing.BadSignature:
+        raise LinkError('Activation link is invalid!')
+    if payload['e'] < time.time():
+        raise LinkError('Activation link has expired!')
+    return Link(token, payload['u'], payload['e'], payload['f'])
+
+
+def claim(link: Link) -> None:
+    """Records `link` as used, raises `LinkError` if it was used already."""
+    # the signature tells the tokens apart.
+    key = f'verification:used:{link.token.rsplit(":", 1)[1]}'
+    try:
+        added = get_redis().set(key, 1, nx=True, exat=link.expires + 1)
+    except redis.RedisError:
+        # the conditional updates still let the link be used once.
+        return
+    if not added:
+        raise LinkError('Activation link has already been used!')
+
+
+def activate(link: Link) -> bool:
+    """Activates the user of `link`, returns False if it was active already."""
+    claim(link)
+    if User.objects.filter(id=link.user_id, is_active=False).update(is_active=True):
+        # an update sends no post_save.
+        user_changed(sender=User, instance=User(id=link.user_id))
+        return True
+    if User.objects.filter(id=link.user_id).exists():
+        return False
+    raise LinkError('Activation URL is invalid', status.HTTP_404_NOT_FOUND)
+
+
+def set_password(link: Link, password: str) -> None:
+    """Sets the password of the user of `link`, if its password did not change since the link was made."""
+    claim(link)
+    current = User.objects.filter(id=link.user_id).values_list('password', 'is_active').first()
+    if current is None:
+        raise LinkError('Activation URL is invalid', status.HTTP_404_NOT_FOUND)
+    if not constant_time_compare(get_fingerprint(*current), link.fingerprint):
+        raise LinkError('Activation link is invalid!')
+    # written only if the password is still the one read.
+    if not User.objects.filter(id=link.user_id, password=current[0]).update(password=make_password(password)):
+        raise LinkError('Activation link is invalid!')
+    user_changed(sender=User, instance=User(id=link.user_id))
+
@@ -1,19 +1,26 @@
+from functools import partial
+
+from django.conf import settings
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework import status
-from rest_framework.generics import ListAPIView, CreateAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.generics import ListAPIView, CreateAPIView, RetrieveUpdateDestroyAPIView, get_object_or_404
 from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.tokens import TokenError
 
 from docs.serializers.doc_serializers import MessageSerializer
 from permissions import permissions
-from utils import JWT_token
 from utils.bucket import Bucket
-from . import serializers
-from .models import User
-from .services import register
-from .tasks import send_verification_email
+from utils.cache import conditional_response
+from utils.renderers import FastJSONRenderer
+from . import outbox, reputation, serializers, verification
+from .blacklist import RefreshToken
+from .docs.doc_serializers import DocLeaderboardRankSerializer, DocLeaderboardSerializer
+from .models import OutboundEmail, User
+from .projections import PROFILE_FIELDS, project_profile
+from .services import get_profile_cache, register
 
 
 class UsersListAPI(ListAPIView):
@@ -43,8 +50,8 @@ class UserRegisterAPI(CreateAPIView):
         if serializer.is_valid():
             vd = serializer.validated_data
             user = register(username=vd['username'], email=vd['email'], password=vd['password'])
-            send_verification_email.delay_on_commit(vd['email'], user.id, 'verification',
-                                                    'Verification URL from AskTech')
+            outbox.enqueue(user_id=user.id, email=vd['email'], action=OutboundEmail.VERIFICATION,
+                           subject='Verification URL from AskTech')
             return Response(
                 data={'data': {'message': 'We`ve sent you an activation link via email.'}},
                 status=status.HTTP_201_CREATED,
@@ -65,13 +72,12 @@ class UserRegisterVerifyAPI(APIView):
     serializer_class = MessageSerializer
 
     def get(self, request, token):
-        token_result: User = JWT_token.get_user(token)
-        if not isinstance(token_result, User):
-            return token_result
-        if token_result.is_active:
+        try:
+            activated = verification.activate(verification.read(token, OutboundEmail.VERIFICATION))
+        except verification.LinkError as error:
+            return Response(data={'error': str(error)}, status=error.status_code)
+        if not activated:
             return Response(data={'message': 'this account already is active.'}, status=status.HTTP_409_CONFLICT)
-        token_result.is_active = True
-        token_result.save()
         return Response(
             data={'message': 'Account activated successfully.'},
             status=status.HTTP_200_OK
@@ -91,8 +97,8 @@ class ResendVerificationEmailAPI(APIView):
         srz_data = self.serializer_class(data=request.data)
         if srz_data.is_valid():
             user: User = srz_data.validated_data['user']
-            send_verification_email.delay_on_commit(user.email, user.id, 'verification',
-                                                    'Verification URL from AskTech')
+            outbox.enqueue(user_id=user.id, email=user.email, action=OutboundEmail.VERIFICATION,
+                           subject='Verification URL from AskTech')
             return Response(
                 data={"message": "We`ve resent the activation link to your email."},
                 status=status.HTTP_202_ACCEPTED,
@@ -135,15 +141,14 @@ class SetPasswordAPI(APIView):
     })
     def post(self, request, token):
         srz_data = self.serializer_class(data=request.data)
-        token_result: User = JWT_token.get_user(token)
-        if not isinstance(token_result, User):
-            return token_result
-        if srz_data.is_valid():
-            new_password = srz_data.validated_data['new_password']
-            token_result.set_password(new_password)
-            token_result.save()
-            return Response(data={'message': 'Password changed successfully.'}, status=status.HTTP_200_OK)
-        return Response(data={'errors': srz_data.errors}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            link = verification.read(token, OutboundEmail.RESET_PASSWORD)
+            if not srz_data.is_valid():
+                return Response(data={'errors': srz_data.errors}, status=status.HTTP_400_BAD_REQUEST)
+            verification.set_password(link, srz_data.validated_data['new_password'])
+        except verification.LinkError as error:
+            return Response(data={'error': str(error)}, status=error.status_code)
+        return Response(data={'message': 'Password changed successfully.'}, status=status.HTTP_200_OK)
 
 
 class ResetPasswordAPI(APIView):
@@ -164,7 +169,8 @@ class ResetPasswordAPI(APIView):
                 user: User = User.objects.get(email=srz_data.validated_data['email'])
             except User.DoesNotExist:
                 return Response(data={'errors': 'user with this Email not found.'}, status=status.HTTP_404_NOT_FOUND)
-            send_verification_email.delay_on_commit(user.email, user.id, 'reset_password', 'Reset Password Link:')
+            outbox.enqueue(user_id=user.id, email=user.email, action=OutboundEmail.RESET_PASSWORD,
+                           subject='Reset Password Link:')
             return Response(
                 data={'message': 'A password reset link has been sent to your email.'},
                 status=status.HTTP_202_ACCEPTED
@@ -215,6 +221,18 @@ class UserProfileAPI(RetrieveUpdateDestroyAPIView):
     lookup_field = 'id'
     queryset = User.objects.filter(is_active=True)
     http_method_names = ['get', 'patch', 'delete', 'head', 'options']
+    renderer_classes = [FastJSONRenderer]
+
+    def retrieve(self, request, *args, **kwargs):
+        namespace = get_profile_cache(kwargs[self.lookup_url_kwarg])
+        return conditional_response(request, namespace, partial(self.get_profile, request, *args, **kwargs))
+
+    def get_profile(self, request, *args, **kwargs):
+        if not settings.FAST_READ_PATH:
+            return super().retrieve(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).values(*PROFILE_FIELDS)
+        user = get_object_or_404(queryset, **{self.lookup_field: kwargs[self.lookup_url_kwarg]})
+        return Response(project_profile(user, request))
 
     def patch(self, request, *args, **kwargs):
         user: User = self.get_object()
@@ -225,8 +243,8 @@ class UserProfileAPI(RetrieveUpdateDestroyAPIView):
             if email_changed:
                 user.is_active = False
                 user.save()
-                send_verification_email.delay_on_commit(serializer.validated_data['email'], user.id, 'verification',
-                                                        'Verification URL from AskTech.')
+                outbox.enqueue(user_id=user.id, email=serializer.validated_data['email'],
+                               action=OutboundEmail.VERIFICATION, subject='Verification URL from AskTech.')
                 message += ' A verification link has been sent to your new email address.'
 
             serializer.save()
@@ -239,3 +257,63 @@ class UserProfileAPI(RetrieveUpdateDestroyAPIView):
         if user.profile.avatar:
             Bucket().delete_object(self.get_object().profile.avatar.name)
         return super().destroy(request, *args, **kwargs)
+
+
+class LeaderboardAPI(APIView):
+    """
+    Users with the best scores, best first.\n
+    allowed methods: GET.
+    """
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        parameters=[serializers.LeaderboardQuerySerializer],
+        responses={200: DocLeaderboardSerializer}
+    )
+    def get(self, request, *args, **kwargs):
+        srz_query = serializers.LeaderboardQuerySerializer(data=request.query_params)
+        if not srz_query.is_valid():
+            return Response(data={'errors': srz_query.errors}, status=status.HTTP_400_BAD_REQUEST)
+        page, limit = srz_query.validated_data['page'], srz_query.validated_data['limit']
+        offset = (page - 1) * limit
+        top = reputation.get_top(offset=offset, limit=limit)
+        usernames = dict(User.objects.filter(id__in=[user_id for user_id, _ in top]).values_list('id', 'username'))
+        entries = [
+            {'rank': offset + i, 'user_id': user_id, 'username': usernames.get(user_id), 'score': score}
+            for i, (user_id, score) in enumerate(top, start=1)
+        ]
+        items_count = reputation.get_leaderboard_size()
+        pages_count = max(1, -(-items_count // limit))
+        return Response(data={
+            'pagination': {
+                'current_page': page,
+                'items_count': items_count,
+                'pages_count': pages_count,
+                'previous_page': self.build_page_link(page - 1) if page > 1 else None,
+                'next_page': self.build_page_link(page + 1) if page < pages_count else None,
+                'has_previous': page > 1,
+                'has_next': page < pages_count,
+            },
+            'data': serializers.LeaderboardEntrySerializer(entries, many=True).data
+        }, status=status.HTTP_200_OK)
+
+    def build_page_link(self, page):
+        return replace_query_param(self.request.build_absolute_uri(), 'page', page)
+
+
+class LeaderboardRankAPI(APIView):
+    """
+    Rank and score of a user in the leaderboard.\n
+    allowed methods: GET.
+    """
+    permission_classes = [AllowAny]
+
+    @extend_schema(responses={200: DocLeaderboardRankSerializer})
+    def get(self, request, *args, **kwargs):
+        user = get_object_or_404(User.objects.values('id', 'username'), id=kwargs['id'])
+        ranked = reputation.get_rank(user['id'])
+        if ranked is None:
+            return Response(data={'errors': 'user is not ranked yet.'}, status=status.HTTP_404_NOT_FOUND)
+        rank, score = ranked
+        entry = {'rank': rank, 'user_id': user['id'], 'username': user['username'], 'score': score}
+        return Response(data={'data': serializers.LeaderboardEntrySerializer(entry).data}, status=status.HTTP_200_OK)
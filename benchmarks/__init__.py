@@ -0,0 +1,56 @@
+"""
+Standalone benchmarks, run them from the project root, e.g. `python -m benchmarks.pagination`.
+Each benchmark runs against a throwaway test database and the Redis database of the tests,
+so your development data and cache are never touched.
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.django.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """A throwaway test database, and the Redis database of the tests, which the benchmarks clear."""
+    from utils.test_runner import TestRunner
+
+    runner = TestRunner(verbosity=0)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+
+def measure(func, repeat: int = 20, warmup: int = 2, prepare=None) -> dict:
+    """
+    Calls `func` `repeat` times and returns its latency percentiles in milliseconds.
+    `prepare`, if given, is called untimed before every call and its result is passed to `func`.
+    """
+    timings = []
+    for i in range(warmup + repeat):
+        args = () if prepare is None else (prepare(),)
+        start = time.perf_counter()
+        func(*args)
+        if i >= warmup:
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'p50': statistics.median(timings),
+        'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def report(title: str, rows: dict):
+    print(f'\n{title}')
+    for name, result in rows.items():
+        print(f'  {name:<40} ' + '  '.join(f'{key}={value:8.2f}ms' for key, value in result.items()))
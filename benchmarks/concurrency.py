@@ -0,0 +1,137 @@
+"""
+Requests per second of the read-heavy endpoints against their async versions (`apps.home.async_views`),
+with many concurrent connections on the ASGI application of `core.asgi`, driven in process.
+Network and HTTP parsing are left out, so the numbers only compare how one worker schedules the requests:
+Django gives the sync code of every request in flight a thread of its own, while the async views stay on the
+event loop and only send their queries to a thread.
+Requests are anonymous and the caches are warmed first, as for the bulk of the read traffic.
+usage: python -m benchmarks.concurrency [--connections 1000] [--requests 5000] [--size small]
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from benchmarks import setup, test_database
+
+# sync endpoint and its async version, the `{}` are filled with the ids of the seeded objects.
+PAIRS = {
+    'home feed': ('/', '/async/'),
+    'question detail': ('/questions/{question}/', '/async/questions/{question}/'),
+    'user profile': ('/users/profile/{user}/', '/async/users/profile/{user}/'),
+}
+
+
+def get_scope(path: str) -> dict:
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+
+
+async def request(application, path: str) -> tuple:
+    """Sends one GET to `application`, returns its status code and latency in milliseconds."""
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    status = None
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # the client stays connected, Django cancels this wait once the response is sent.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    start = time.perf_counter()
+    await application(get_scope(path), receive, send)
+    return status, (time.perf_counter() - start) * 1000
+
+
+async def load(application, path: str, connections: int, requests: int) -> dict:
+    """
+    Sends `requests` GETs to `path` over `connections` concurrent connections, one request at a time each.
+    Answers other than 200 are counted as errors, the latencies are those of the successful requests.
+    """
+    latencies, remaining, errors = [], requests, 0
+
+    async def connection():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            status, latency = await request(application, path)
+            if status == 200:
+                latencies.append(latency)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latencies) or [0.0]
+    return {
+        'rps': (requests - errors) / elapsed,
+        'errors': errors,
+        'p50': statistics.median(latencies),
+        'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+async def run(size: str, connections: int, requests: int):
+    from asgiref.sync import sync_to_async
+    from django.core.cache import cache
+
+    from apps.home.models import Question
+    from apps.home.seed import ForumSeeder
+    from benchmarks.endpoints import SIZES
+    from core.asgi import application
+
+    # the traces of the slow and failed requests would flood the output, the failures are counted instead.
+    logging.getLogger('utils.profiling').setLevel(logging.WARNING)
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    await sync_to_async(ForumSeeder(**SIZES[size]).run)()
+    await sync_to_async(cache.clear)()
+    question = await Question.objects.order_by('id').afirst()
+    ids = {'question': question.id, 'user': question.owner_id}
+
+    print(f'{connections} concurrent connections, {requests} requests per endpoint, {size} forum')
+    print(
+        f'  {"endpoint":<20} {"sync rps":>10} {"async rps":>10}   {"sync p50/p95":>18} {"async p50/p95":>18}'
+        f'  {"errors":>11}'
+    )
+    for name, paths in PAIRS.items():
+        results = []
+        for path in paths:
+            path = path.format(**ids)
+            await load(application, path, min(connections, 10), 50)  # warms the caches and the code paths.
+            results.append(await load(application, path, connections, requests))
+        sync, async_ = results
+        print(
+            f'  {name:<20} {sync["rps"]:10.1f} {async_["rps"]:10.1f}   '
+            f'{sync["p50"]:8.1f}/{sync["p95"]:7.1f}ms {async_["p50"]:8.1f}/{async_["p95"]:7.1f}ms'
+            f'  {sync["errors"]:5}/{async_["errors"]:<5}  (x{async_["rps"] / max(sync["rps"], 0.001):.2f})'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--size', default='small')
+    args = parser.parse_args()
+    setup()
+    with test_database():
+        asyncio.run(run(args.size, args.connections, args.requests))
@@ -0,0 +1,434 @@
+"""
+Runs every endpoint of `apps/home/urls.py` and `apps/users/urls.py` against forums seeded by `ForumSeeder`
+in several sizes and records, by endpoint, the p50 and p95 latency, the number of SQL queries and their time,
+and the peak memory allocated while answering. Results are written as JSON and compared to the budgets of
+`benchmarks/baselines/endpoints.json`: more queries than budgeted, or a latency or the peak memory over
+its budget by more than the tolerance of the baseline, fails the run with exit status 1.
+`--update-baseline` writes the results as the new budgets, commit them with the change that moves them.
+
+Every URL name must have a benchmark or be listed in EXCLUDED, so new endpoints cannot be forgotten.
+Requests are authenticated unless the endpoint is for anonymous users, so the response cache of anonymous
+requests is not involved. Celery tasks run eagerly and emails go to the in-memory backend of the tests.
+
+usage: python -m benchmarks.endpoints [--sizes small medium] [--repeat 20] [--only home:home ...]
+                                      [--output benchmarks/results/endpoints.json] [--update-baseline]
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from pathlib import Path
+
+from benchmarks import measure, setup, test_database
+
+ROOT = Path(__file__).parent
+BASELINE = ROOT / 'baselines' / 'endpoints.json'
+RESULTS = ROOT / 'results' / 'endpoints.json'
+# ForumSeeder options of the dataset sizes.
+SIZES = {
+    'small': dict(users=100, tags=20, questions=500, answers=1500, comments=2000, replies=2000, votes=5000),
+    'medium': dict(users=1000, tags=100, questions=5000, answers=15000, comments=20000, replies=20000, votes=50000),
+    'large': dict(
+        users=10000, tags=500, questions=50000, answers=150000, comments=200000, replies=200000, votes=500000
+    ),
+}
+# URL names without a benchmark, with the reason.
+EXCLUDED = {
+    'home:answer-viewset-list': 'the answer routes only allow PUT and DELETE on the detail route.',
+    'home:comments-list': 'the comment routes only allow PUT and DELETE on the detail route.',
+    'home:reply-list': 'the reply routes only allow PUT and DELETE on the detail route.',
+}
+PASSWORD = 'Vq7#benchmark-password'
+BATCH = 10
+# allowed growth over the budgets by metric. The p95 of 20 calls is their slowest one, on shared machines
+# it only catches gross regressions, queries and the p50 are the tight budgets.
+DEFAULT_BASELINE = {
+    'tolerance': {'p50_ms': 0.5, 'p95_ms': 2.0, 'peak_memory_kb': 0.25},
+    'slack_ms': 5,
+    'sizes': {},
+}
+
+
+def get_url_names() -> set:
+    """Returns the namespaced names of every URL of the home and users apps."""
+    from apps.home import urls as home_urls
+    from apps.users import urls as users_urls
+
+    def walk(patterns):
+        for pattern in patterns:
+            if hasattr(pattern, 'url_patterns'):
+                yield from walk(pattern.url_patterns)
+            elif pattern.name:
+                yield pattern.name
+
+    return {f'{module.app_name}:{name}' for module in (home_urls, users_urls) for name in walk(module.urlpatterns)}
+
+
+class QueryRecorder:
+    """`connection.execute_wrapper` counting the queries it sees and their time."""
+
+    def __init__(self):
+        self.count, self.time = 0, 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - start
+
+
+class Fixtures:
+    """The rows the benchmarks request, read from the seeded forum or created for them."""
+
+    def __init__(self):
+        from apps.home.models import Question, Answer, Comment, CommentReply, Tag
+        from apps.users.models import User
+
+        self.numbers = count()
+        # the first ranks of the Zipf law: the most active user and the busiest thread.
+        self.user = User.objects.get(username='seed0')
+        self.member = User.objects.get(username='seed1')
+        self.password = self.member.password
+        self.admin = User.objects.create(
+            username='benchmark-admin', email='benchmark-admin@example.com', is_active=True, is_admin=True
+        )
+        self.inactive = User.objects.create(username='benchmark-inactive', email='benchmark-inactive@example.com')
+        self.tag = Tag.objects.order_by('id').first()
+        self.question = Question.objects.order_by('id').first()
+        self.answer = Answer.objects.filter(question=self.question).order_by('id').first()
+        self.comment = Comment.objects.order_by('id').first()
+        self.reply = CommentReply.objects.filter(comment=self.comment).order_by('id').first()
+        self.own_question = self.new_question()
+        self.own_answer = self.new_answer()
+        self.own_comment = self.new_comment()
+        self.own_reply = self.new_reply()
+
+    def new_question(self):
+        from apps.home.models import Question
+
+        return Question.objects.create(owner=self.user, title='benchmark question', body='body', slug='benchmark')
+
+    def new_answer(self, question=None):
+        from apps.home.models import Answer
+
+        return Answer.objects.create(owner=self.user, question=question or self.question, body='benchmark answer')
+
+    def new_comment(self):
+        from apps.home.models import Comment
+
+        return Comment.objects.create(owner=self.user, answer=self.answer, body='benchmark comment')
+
+    def new_reply(self):
+        from apps.home.models import CommentReply
+
+        return CommentReply.objects.create(owner=self.user, comment=self.comment, body='benchmark reply')
+
+    def new_user(self, is_active: bool = True):
+        from apps.users.models import User, UserProfile
+
+        number = next(self.numbers)
+        user = User.objects.create(
+            username=f'benchmark{number}', email=f'benchmark{number}@example.com', is_active=is_active
+        )
+        UserProfile.objects.create(owner=user)
+        return user
+
+    def reset_member_password(self) -> None:
+        self.member.password = self.password
+        type(self.member).objects.filter(id=self.member.id).update(password=self.password)
+
+
+def get_endpoints(fixtures: Fixtures) -> dict:
+    """
+    Returns the benchmarks by '<METHOD> <URL name>', each a function called untimed before every request
+    and returning its (path, data, user), None for anonymous requests.
+    """
+    from django.urls import reverse
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from apps.users.models import OutboundEmail
+    from apps.users.verification import make_token
+
+    f = fixtures
+
+    def register():
+        number = next(f.numbers)
+        return reverse('users:user-register'), {
+            'username': f'register{number}', 'email': f'register{number}@example.com',
+            'password': PASSWORD, 'password2': PASSWORD,
+        }, None
+
+    def set_password():
+        # a link is valid for the password it was made for and used once, the links made within the same second
+        # for the same password are one, their expiries tell them apart.
+        f.reset_member_password()
+        token = make_token(f.member, OutboundEmail.RESET_PASSWORD, timedelta(minutes=5, seconds=next(f.numbers)))
+        return reverse('users:set-password', args=[token]), {
+            'new_password': PASSWORD, 'confirm_new_password': PASSWORD
+        }, None
+
+    def change_password():
+        f.reset_member_password()
+        return reverse('users:change-password'), {
+            'old_password': 'password', 'new_password': PASSWORD, 'confirm_new_password': PASSWORD
+        }, f.member
+
+    def delete_profile():
+        user = f.new_user()
+        return reverse('users:user-profile', args=[user.id]), None, user
+
+    return {
+        # home
+        'GET home:api-root': lambda: (reverse('home:api-root'), None, f.user),
+        'GET home:home': lambda: (reverse('home:home'), None, f.user),
+        'GET home:search': lambda: (reverse('home:search'), {'q': 'django cache'}, f.user),
+        'GET home:tag-tree': lambda: (reverse('home:tag-tree'), None, f.user),
+        'GET home:tag-trending': lambda: (reverse('home:tag-trending'), None, f.user),
+        'GET home:export': lambda: (reverse('home:export'), {'type': 'questions'}, f.admin),
+        'GET home:metrics': lambda: (reverse('home:metrics'), None, f.admin),
+        'GET home:question-list': lambda: (reverse('home:question-list'), None, f.user),
+        'POST home:question-list': lambda: (reverse('home:question-list'), {
+            'title': 'benchmark question', 'body': 'body', 'tag': [f.tag.name],
+        }, f.user),
+        'GET home:question-detail': lambda: (reverse('home:question-detail', args=[f.question.id]), None, f.user),
+        'PATCH home:question-detail': lambda: (
+            reverse('home:question-detail', args=[f.own_question.id]), {'body': 'edited'}, f.user
+        ),
+        'DELETE home:question-detail': lambda: (
+            reverse('home:question-detail', args=[f.new_question().id]), None, f.user
+        ),
+        'POST home:answer-create': lambda: (
+            reverse('home:answer-create', args=[f.question.id]), {'body': 'benchmark answer'}, f.user
+        ),
+        'POST home:answer-batch-create': lambda: (reverse('home:answer-batch-create'), [
+            {'question': f.question.id, 'body': 'benchmark answer'} for _ in range(BATCH)
+        ], f.user),
+        'PUT home:answer-viewset-detail': lambda: (
+            reverse('home:answer-viewset-detail', args=[f.own_answer.id]), {'body': 'edited'}, f.user
+        ),
+        'DELETE home:answer-viewset-detail': lambda: (
+            reverse('home:answer-viewset-detail', args=[f.new_answer().id]), None, f.user
+        ),
+        'GET home:answer-like': lambda: (reverse('home:answer-like', args=[f.answer.id]), None, f.member),
+        'GET home:answer-dislike': lambda: (reverse('home:answer-dislike', args=[f.answer.id]), None, f.member),
+        'GET home:answer-accept': lambda: (
+            reverse('home:answer-accept', args=[f.new_answer(f.new_question()).id]), None, f.user
+        ),
+        'POST home:comment-create': lambda: (
+            reverse('home:comment-create', args=[f.answer.id]), {'body': 'benchmark comment'}, f.user
+        ),
+        'POST home:comment-batch-create': lambda: (reverse('home:comment-batch-create'), [
+            {'answer': f.answer.id, 'body': 'benchmark comment'} for _ in range(BATCH)
+        ], f.user),
+        'PUT home:comments-detail': lambda: (
+            reverse('home:comments-detail', args=[f.own_comment.id]), {'body': 'edited'}, f.user
+        ),
+        'DELETE home:comments-detail': lambda: (
+            reverse('home:comments-detail', args=[f.new_comment().id]), None, f.user
+        ),
+        'POST home:reply-create': lambda: (
+            reverse('home:reply-create', args=[f.comment.id]), {'body': 'benchmark reply'}, f.user
+        ),
+        'POST home:reply-create-reply': lambda: (
+            reverse('home:reply-create-reply', args=[f.comment.id, f.reply.id]), {'body': 'benchmark reply'}, f.user
+        ),
+        'POST home:reply-batch-create': lambda: (reverse('home:reply-batch-create'), [
+            {'comment': f.comment.id, 'reply': f.reply.id, 'body': 'benchmark reply'} for _ in range(BATCH)
+        ], f.user),
+        'PUT home:reply-detail': lambda: (
+            reverse('home:reply-detail', args=[f.own_reply.id]), {'body': 'edited'}, f.user
+        ),
+        'DELETE home:reply-detail': lambda: (reverse('home:reply-detail', args=[f.new_reply().id]), None, f.user),
+        # users
+        'GET users:users-list': lambda: (reverse('users:users-list'), None, f.admin),
+        'POST users:user-register': register,
+        'GET users:user-register-verify': lambda: (reverse('users:user-register-verify', args=[
+            make_token(f.new_user(is_active=False), OutboundEmail.VERIFICATION)
+        ]), None, None),
+        'POST users:user-register-resend-email': lambda: (
+            reverse('users:user-register-resend-email'), {'email': f.inactive.email}, None
+        ),
+        'GET users:user-profile': lambda: (reverse('users:user-profile', args=[f.user.id]), None, f.user),
+        'PATCH users:user-profile': lambda: (
+            reverse('users:user-profile', args=[f.user.id]), {'bio': 'benchmark'}, f.user
+        ),
+        'DELETE users:user-profile': delete_profile,
+        'GET users:leaderboard': lambda: (reverse('users:leaderboard'), None, f.user),
+        'GET users:leaderboard-rank': lambda: (reverse('users:leaderboard-rank', args=[f.user.id]), None, f.user),
+        'POST users:token-obtain-pair': lambda: (
+            reverse('users:token-obtain-pair'), {'email': f.user.email, 'password': 'password'}, None
+        ),
+        'POST users:token-refresh': lambda: (
+            reverse('users:token-refresh'), {'refresh': str(RefreshToken.for_user(f.user))}, None
+        ),
+        'POST users:token-block': lambda: (
+            reverse('users:token-block'), {'refresh': str(RefreshToken.for_user(f.user))}, None
+        ),
+        'PUT users:change-password': change_password,
+        'POST users:set-password': set_password,
+        'POST users:reset-password': lambda: (reverse('users:reset-password'), {'email': f.user.email}, None),
+    }
+
+
+def send(client, name: str, request: tuple) -> QueryRecorder:
+    """Sends a request of the benchmark `name`, reading streamed responses out, and returns its queries."""
+    from django.core.cache import cache
+    from django.db import connection
+
+    from apps.users import outbox
+
+    # a drain counts as scheduled, the emails are sent by a worker, not by the eager task within the request,
+    # and the flag left by the requests before, or by another run, does not change what is measured.
+    cache.set(outbox.DRAIN_SCHEDULED_KEY, 1)
+    method, path, (data, user) = name.split()[0].lower(), request[0], request[1:]
+    client.force_authenticate(user)
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        if method == 'get':
+            response = client.get(path, data)
+        else:
+            response = getattr(client, method)(path, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+    if response.status_code >= 400:
+        raise RuntimeError(f'{name} answered {response.status_code}: {response.content[:500]!r}')
+    return recorder
+
+
+def run_size(size: str, repeat: int, only: list = None) -> dict:
+    from django.core.cache import cache
+    from rest_framework.test import APIClient
+
+    from apps.home.seed import ForumSeeder
+
+    cache.clear()
+    start = time.perf_counter()
+    rows = ForumSeeder(**SIZES[size]).run()
+    print(f'\nseeded {size}: {sum(rows.values())} rows in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+    endpoints = get_endpoints(Fixtures())
+    client = APIClient()
+    results = {}
+    for name, prepare in endpoints.items():
+        if only and name.split()[1] not in only:
+            continue
+        recorders = []
+        # like timeit, collections are left out of the timings, they depend on what ran before.
+        gc.collect()
+        gc.disable()
+        try:
+            latency = measure(lambda request: recorders.append(send(client, name, request)), repeat, prepare=prepare)
+        finally:
+            gc.enable()
+        recorders = recorders[-repeat:]
+        request = prepare()
+        tracemalloc.start()
+        send(client, name, request)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {
+            'p50_ms': round(latency['p50'], 3),
+            'p95_ms': round(latency['p95'], 3),
+            # the most queries of a call, calls alternating between paths (votes toggling) differ.
+            'queries': max(recorder.count for recorder in recorders),
+            'query_ms': round(sum(recorder.time for recorder in recorders) * 1000 / len(recorders), 3),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+    return {'rows': rows, 'endpoints': results}
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """
+    Returns the budgets of `baseline` the results go over: queries exactly, latencies and memory beyond
+    their `tolerance`, latencies also beyond the `slack_ms` of the baseline as fast endpoints are noisy.
+    """
+    failures, unbudgeted = [], []
+    for size, result in results.items():
+        budgets = baseline['sizes'].get(size, {})
+        for name, measured in result['endpoints'].items():
+            if name not in budgets:
+                unbudgeted.append(f'{size} {name}')
+                continue
+            budget = budgets[name]
+            if measured['queries'] > budget['queries']:
+                failures.append(f'{size} {name}: {measured["queries"]} queries, budget {budget["queries"]}')
+            for key, tolerance in baseline['tolerance'].items():
+                slack = baseline['slack_ms'] if key.endswith('_ms') else 0
+                if measured[key] > budget[key] * (1 + tolerance) + slack:
+                    failures.append(f'{size} {name}: {key} {measured[key]}, budget {budget[key]} (+{tolerance:.0%})')
+    if unbudgeted:
+        print(f'no budget for {", ".join(unbudgeted)}, run with --update-baseline to add them.', file=sys.stderr)
+    return failures
+
+
+def report(results: dict):
+    for size, result in results.items():
+        print(f'\nendpoints, {size} forum ({sum(result["rows"].values())} rows)')
+        print(f'  {"endpoint":<40} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8} {"query ms":>9} {"peak kB":>9}')
+        for name, measured in result['endpoints'].items():
+            print(
+                f'  {name:<40} {measured["p50_ms"]:9.2f} {measured["p95_ms"]:9.2f} {measured["queries"]:8d} '
+                f'{measured["query_ms"]:9.2f} {measured["peak_memory_kb"]:9.1f}'
+            )
+
+
+def main(args) -> int:
+    setup()
+    from django.db import connection
+
+    from core import app as celery_app
+
+    # the fixtures are only read when the requests are prepared.
+    names = {name.split()[1] for name in get_endpoints(None)}
+    missing = get_url_names() - names - set(EXCLUDED)
+    if missing:
+        print(f'no benchmark for {", ".join(sorted(missing))}, add them to get_endpoints or EXCLUDED.')
+        return 1
+
+    celery_app.conf.task_always_eager = True
+    results = {}
+    for size in args.sizes:
+        with test_database():
+            results[size] = run_size(size, args.repeat, args.only)
+    report(results)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps({
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        'repeat': args.repeat,
+        'sizes': results,
+    }, indent=2) + '\n')
+    print(f'\nresults written to {args.output}')
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else DEFAULT_BASELINE
+    if args.update_baseline:
+        for size, result in results.items():
+            budgets = baseline['sizes'].setdefault(size, {})
+            for name, measured in result['endpoints'].items():
+                budgets[name] = {key: measured[key] for key in ('queries', *baseline['tolerance'])}
+        BASELINE.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print(f'baseline written to {BASELINE}')
+        return 0
+    failures = compare(results, baseline)
+    for failure in failures:
+        print(f'REGRESSION {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', choices=SIZES, default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', nargs='+', help='URL names to benchmark, e.g. home:question-detail.')
+    parser.add_argument('--output', type=Path, default=RESULTS)
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new budgets.')
+    sys.exit(main(parser.parse_args()))
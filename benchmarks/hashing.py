@@ -0,0 +1,59 @@
+"""
+Logins per second under every password hashing policy of `utils.hashers`, with their default parameters.
+A login is a POST to the login endpoint through the test client, one at a time, i.e. on one core.
+The burst is `--threads` threads checking passwords at once, on the hashing pool when `--pool` threads are given,
+reported per core of the machine.
+usage: python -m benchmarks.hashing [--logins 50] [--threads 16] [--pool 4]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import measure, setup, test_database
+
+PASSWORD = 'Abc@1234'
+
+
+def burst(encoded: str, threads: int, logins: int) -> float:
+    """Logins per second of `threads` threads checking `logins` passwords in all."""
+    from django.contrib.auth.hashers import check_password
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: check_password(PASSWORD, encoded), range(logins)))
+    return logins / (time.perf_counter() - start)
+
+
+def run(logins: int, threads: int, pool: int):
+    from django.conf import settings
+    from django.test import Client, override_settings
+    from django.urls import reverse
+
+    from apps.users.models import User
+
+    cores = os.cpu_count()
+    url = reverse('users:token-obtain-pair')
+    print(f'{cores} cores, bursts of {threads} threads' + (f' on a pool of {pool}' if pool else ''))
+    print(f'  {"policy":<10} {"login p50":>10} {"logins/s/core":>14} {"burst logins/s/core":>20}')
+    for policy, hasher in settings.PASSWORD_HASHER_CLASSES.items():
+        hashers = [hasher, *(other for other in settings.PASSWORD_HASHER_CLASSES.values() if other != hasher)]
+        with override_settings(PASSWORD_HASHERS=hashers, PASSWORD_HASHING_THREADS=pool):
+            user = User.objects.create_user(username=policy, email=f'{policy}@example.com', password=PASSWORD)
+            User.objects.filter(id=user.id).update(is_active=True)
+            client = Client()
+            data = {'email': user.email, 'password': PASSWORD}
+            latency = measure(lambda: client.post(url, data), repeat=logins)['p50']
+            rate = burst(user.password, threads, logins) / cores
+        print(f'  {policy:<10} {latency:8.1f}ms {1000 / latency:14.1f} {rate:20.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--pool', type=int, default=0, help='threads of the hashing pool, 0 for none')
+    args = parser.parse_args()
+    setup()
+    with test_database():
+        run(args.logins, args.threads, args.pool)
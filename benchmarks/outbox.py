@@ -0,0 +1,73 @@
+"""
+Verification emails sent per second, one `send_mail` per email as the `send_verification_email` task did before
+the outbox, against `apps.users.outbox.drain` sending them in batches over one connection.
+Both send to the local SMTP sink of `utils.smtp_sink`, whose replies are delayed by `--latency` milliseconds
+to stand for the round trips to a remote server, every new connection costs three of them.
+usage: python -m benchmarks.outbox [--emails 2000] [--latency 2] [--batch-size 100]
+"""
+import argparse
+import time
+
+from benchmarks import setup, test_database
+
+
+def send_one(user_id: int, message: str):
+    """The `send_verification_email` task before the outbox."""
+    from django.conf import settings
+    from django.core.mail import send_mail
+    from django.template.loader import render_to_string
+    from django.urls import reverse
+    from django.utils.html import strip_tags
+
+    from apps.users.models import OutboundEmail, User
+    from apps.users.outbox import TOKEN_LIFETIME
+    from apps.users.verification import make_token
+
+    user = User.objects.get(id=user_id)
+    token = make_token(user, OutboundEmail.VERIFICATION, TOKEN_LIFETIME)
+    url = f"http://{settings.DOMAIN}{reverse('users:user-register-verify', args=[token])}"
+    html_message = render_to_string('activation_link.html', {'receiver': user.email, 'Activation_link': url,
+                                                             'message': message})
+    send_mail(subject=message, message=strip_tags(html_message), from_email=settings.EMAIL_HOST_USER,
+              recipient_list=[user.email], html_message=html_message)
+
+
+def run(emails: int, latency: float, batch_size: int):
+    from django.test import override_settings
+
+    from apps.users.models import OutboundEmail, User
+    from apps.users.outbox import drain
+    from utils.smtp_sink import SMTPSink
+
+    users = User.objects.bulk_create(
+        User(username=f'user{i}', email=f'user{i}@example.com', password='!') for i in range(emails)
+    )
+    message = 'Verification URL from AskTech'
+    print(f'{emails} emails, {latency * 1000:.1f}ms per SMTP reply, batches of {batch_size}')
+    print(f'  {"":<24} {"emails/s":>10} {"connections":>12}')
+
+    with SMTPSink(latency=latency) as sink, override_settings(**sink.settings):
+        start = time.perf_counter()
+        for user in users:
+            send_one(user.id, message)
+        elapsed = time.perf_counter() - start
+        print(f'  {"send_mail per email":<24} {emails / elapsed:10.1f} {sink.connections:12}')
+
+    OutboundEmail.objects.bulk_create(
+        OutboundEmail(user=user, email=user.email, action=OutboundEmail.VERIFICATION, subject=message)
+        for user in users
+    )
+    with SMTPSink(latency=latency) as sink, override_settings(**sink.settings):
+        result = drain(batch_size=batch_size)
+        print(f'  {"outbox drain":<24} {result["sent"] / result["seconds"]:10.1f} {sink.connections:12}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--emails', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=2, help='milliseconds')
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+    setup()
+    with test_database():
+        run(args.emails, args.latency / 1000, args.batch_size)
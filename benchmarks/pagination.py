@@ -0,0 +1,54 @@
+"""
+Compares page number and cursor pagination of the home feed on the first and the 5,000th page.
+usage: python -m benchmarks.pagination [--questions 50010]
+"""
+import argparse
+
+from benchmarks import measure, report, setup, test_database
+
+
+def seed(count: int):
+    from apps.home.models import Question
+    from apps.users.models import User
+
+    owner = User.objects.create(username='benchmark', email='benchmark@example.com')
+    Question.objects.bulk_create(
+        (Question(owner=owner, title=f'question {i}', body='body', slug=f'question-{i}') for i in range(count)),
+        batch_size=5000,
+    )
+
+
+def run(questions: int):
+    from django.urls import reverse
+    from rest_framework.test import APIClient, APIRequestFactory
+
+    from apps.home.models import Question
+    from utils.paginators import NeatCursorPagination
+
+    seed(questions)
+    client = APIClient()
+    url = reverse('home:home')
+    deep_page = min(5000, questions // 10)
+
+    # the cursor of the deep page starts after the last row of the page before it.
+    paginator = NeatCursorPagination()
+    paginator.request = APIRequestFactory().get(url, {'pagination': 'cursor'})
+    paginator.fields = ['modified', 'created', 'id']
+    last_row = Question.objects.order_by(*paginator.ordering)[(deep_page - 1) * 10 - 1]
+    deep_cursor = paginator.encode_cursor(last_row, reverse=False)
+
+    report(f'home feed, {questions} questions', {
+        'page number, page 1': measure(lambda: client.get(url)),
+        f'page number, page {deep_page}': measure(lambda: client.get(url, {'page': deep_page})),
+        'cursor, page 1': measure(lambda: client.get(url, {'pagination': 'cursor'})),
+        f'cursor, page {deep_page}': measure(lambda: client.get(deep_cursor)),
+    })
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--questions', type=int, default=50010)
+    args = parser.parse_args()
+    setup()
+    with test_database():
+        run(args.questions)
@@ -0,0 +1,74 @@
+"""
+Compares the serializer read path with the fast read path (FAST_READ_PATH) on the hot endpoints.
+Requests are authenticated, so the response cache of anonymous requests is not involved.
+usage: python -m benchmarks.rendering [--answers 50] [--comments 5] [--replies 10]
+"""
+import argparse
+
+from benchmarks import measure, report, setup, test_database
+
+
+def seed(answers: int, comments: int, replies: int):
+    from apps.home.models import Question, Answer, Comment, CommentReply, Tag
+    from apps.users.models import User, UserProfile
+
+    owner = User.objects.create(username='benchmark', email='benchmark@example.com', is_active=True)
+    UserProfile.objects.create(owner=owner, bio='bio')
+    tags = Tag.objects.bulk_create(Tag(name=f'tag {i}', slug=f'tag-{i}') for i in range(5))
+    questions = Question.objects.bulk_create(
+        Question(owner=owner, title=f'question {i}', body='body ' * 50, slug=f'question-{i}') for i in range(20)
+    )
+    Question.tag.through.objects.bulk_create(
+        Question.tag.through(question=question, tag=tag) for question in questions for tag in tags[:3]
+    )
+    thread = questions[0]
+    for answer in Answer.objects.bulk_create(
+            Answer(owner=owner, question=thread, body='answer ' * 50) for _ in range(answers)
+    ):
+        for comment in Comment.objects.bulk_create(
+                Comment(owner=owner, answer=answer, body='comment ' * 20) for _ in range(comments)
+        ):
+            parent = None
+            for _ in range(replies):
+                # chains of four nested replies.
+                parent = CommentReply.objects.create(owner=owner, comment=comment, reply=parent, body='reply')
+                parent = parent if parent.depth < 3 else None
+    return owner, thread
+
+
+def run(answers: int, comments: int, replies: int):
+    from django.test import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    owner, thread = seed(answers, comments, replies)
+    client = APIClient()
+    client.force_authenticate(owner)
+    urls = {
+        'home feed': reverse('home:home'),
+        'question list': reverse('home:question-list'),
+        'question detail': reverse('home:question-detail', args=[thread.id]),
+        'user profile': reverse('users:user-profile', args=[owner.id]),
+    }
+    results = {}
+    for name, url in urls.items():
+        with override_settings(FAST_READ_PATH=False):
+            results[f'{name}, serializers'] = measure(lambda: client.get(url))
+        results[f'{name}, fast path'] = measure(lambda: client.get(url))
+    report(f'read path, thread of {answers} answers x {comments} comments x {replies} replies', results)
+
+    print('\nthroughput (requests per second at p50)')
+    for name in urls:
+        slow, fast = results[f'{name}, serializers']['p50'], results[f'{name}, fast path']['p50']
+        print(f'  {name:<40} {1000 / slow:8.1f} -> {1000 / fast:8.1f}  (x{slow / fast:.2f})')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--answers', type=int, default=50)
+    parser.add_argument('--comments', type=int, default=5)
+    parser.add_argument('--replies', type=int, default=10)
+    args = parser.parse_args()
+    setup()
+    with test_database():
+        run(args.answers, args.comments, args.replies)
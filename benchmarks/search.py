@@ -0,0 +1,82 @@
+"""
+Measures full-text search latency against the old `icontains` search on a generated corpus.
+usage: python -m benchmarks.search [--questions 1000000] [--answers-per-question 2] [--seed 1]
+"""
+import argparse
+import random
+from itertools import accumulate
+
+from benchmarks import measure, report, setup, test_database
+
+VOCABULARY_SIZE = 20000
+
+
+def make_vocabulary(rng: random.Random) -> list:
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add(''.join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+def generate_corpus(questions: int, answers_per_question: int, seed: int, batch_size: int = 5000):
+    """
+    Bulk inserts `questions` questions with their answers, words follow a Zipf distribution
+    like natural text, so a few words are very common and most of them are rare.
+    """
+    from apps.home.models import Question, Answer
+    from apps.users.models import User
+
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    cum_weights = list(accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    def text(words):
+        return ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=words))
+
+    owner = User.objects.create(username='benchmark', email='benchmark@example.com')
+    created = 0
+    while created < questions:
+        count = min(batch_size, questions - created)
+        batch = Question.objects.bulk_create(
+            Question(owner=owner, title=text(8), body=text(60), slug='question') for _ in range(count)
+        )
+        Answer.objects.bulk_create(
+            Answer(owner=owner, question=question, body=text(40))
+            for question in batch for _ in range(answers_per_question)
+        )
+        created += count
+    return vocabulary
+
+
+def run(questions: int, answers_per_question: int, seed: int):
+    from apps.home.models import Question
+    from apps.home.search import rebuild_index, search
+
+    vocabulary = generate_corpus(questions, answers_per_question, seed)
+    rebuild_index(batch_size=5000)
+    common, rare = vocabulary[0], vocabulary[-1]
+    queries = {
+        'common word': common,
+        'rare word': rare,
+        'two words': f'{common} {vocabulary[len(vocabulary) // 2]}',
+    }
+
+    rows = {}
+    for name, query in queries.items():
+        rows[f'full-text, {name}'] = measure(lambda: search(query), repeat=10)
+        rows[f'icontains (unranked), {name}'] = measure(
+            lambda: list(Question.objects.filter(title__icontains=query.split()[0])[:10]), repeat=10
+        )
+    report(f'search, {questions} questions, {questions * answers_per_question} answers', rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--questions', type=int, default=1_000_000)
+    parser.add_argument('--answers-per-question', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    setup()
+    with test_database():
+        run(args.questions, args.answers_per_question, args.seed)
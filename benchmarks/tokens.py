@@ -0,0 +1,83 @@
+"""
+Latency of the token refresh endpoint with `--tokens` outstanding tokens, most of them expired and blacklisted as
+logins, rotations and logouts leave them, before and after `apps.users.blacklist.purge_expired` deletes the expired.
+The blacklist filter is left unbuilt, so every refresh looks its token up in the database as it would without it.
+usage: python -m benchmarks.tokens [--tokens 10000000] [--expired 0.9] [--blacklisted 0.5]
+"""
+import argparse
+import time
+import uuid
+from datetime import timedelta
+
+from benchmarks import measure, report, setup, test_database
+
+CHUNK = 100000
+
+
+def seed(tokens: int, expired: float, blacklisted: float):
+    """Inserts the tokens with plain `executemany`, the ORM would take most of the run."""
+    from django.db import connection, transaction
+    from django.utils import timezone
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+    now = timezone.now()
+    outstanding = OutstandingToken._meta.db_table
+    blacklist = BlacklistedToken._meta.db_table
+    for start in range(0, tokens, CHUNK):
+        rows = []
+        for i in range(start, min(start + CHUNK, tokens)):
+            lifetime = timedelta(days=-1 if i % 1000 < expired * 1000 else 15)
+            rows.append((uuid.uuid4().hex, 'token', now + lifetime - timedelta(days=15), now + lifetime))
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {outstanding} (jti, token, created_at, expires_at) VALUES (%s, %s, %s, %s)', rows
+            )
+            cursor.execute(
+                f'INSERT INTO {blacklist} (token_id, blacklisted_at) SELECT id, %s FROM {outstanding} '
+                f'WHERE id > %s AND id %% 1000 < %s',
+                [now, start, blacklisted * 1000],
+            )
+
+
+def run(tokens: int, expired: float, blacklisted: float):
+    from django.core.cache import cache
+    from django.test import Client, override_settings
+    from django.urls import reverse
+    from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+    from apps.users.blacklist import RefreshToken, purge_expired
+    from apps.users.models import User
+
+    cache.clear()
+    start = time.perf_counter()
+    seed(tokens, expired, blacklisted)
+    print(f'seeded {OutstandingToken.objects.count()} tokens in {time.perf_counter() - start:.1f}s')
+    user = User.objects.create_user(username='user', email='user@example.com', password='Abc@1234')
+    client, url = Client(), reverse('users:token-refresh')
+
+    def refresh(token):
+        assert client.post(url, {'refresh': token}).status_code == 200
+
+    def prepare():
+        return str(RefreshToken.for_user(user))
+
+    # a small filter, the refreshes still set the bits of the tokens they blacklist.
+    with override_settings(BLACKLIST_FILTER_CAPACITY=1000):
+        before = measure(refresh, repeat=200, prepare=prepare)
+        start = time.perf_counter()
+        purged = purge_expired()
+        elapsed = time.perf_counter() - start
+        after = measure(refresh, repeat=200, prepare=prepare)
+    print(f'purged {purged["outstanding"]} expired tokens, {purged["blacklisted"]} blacklisted, in {elapsed:.1f}s')
+    report('token refresh', {f'{tokens} tokens': before, 'after the purge': after})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tokens', type=int, default=10000000)
+    parser.add_argument('--expired', type=float, default=0.9, help='share of the tokens expired')
+    parser.add_argument('--blacklisted', type=float, default=0.5, help='share of the tokens blacklisted')
+    args = parser.parse_args()
+    setup()
+    with test_database():
+        run(args.tokens, args.expired, args.blacklisted)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from datetime import timedelta
 from pathlib import Path
+from urllib.parse import urlsplit
 
 from decouple import config
 
@@ -57,6 +58,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.profiling.QueryProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -97,13 +99,19 @@ DATABASES = {
     }
 }
 
+REDIS_LOCATION = config('REDIS_LOCATION', default="redis://127.0.0.1:6379")
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": config('REDIS_LOCATION', default="redis://127.0.0.1:6379"),
+        "LOCATION": REDIS_LOCATION,
     }
 }
 
+# Tests, see `utils.test_runner`
+# the tests and the benchmarks clear the cache, which flushes its whole Redis database, so they get their own.
+TEST_RUNNER = 'utils.test_runner.TestRunner'
+REDIS_TEST_LOCATION = config('REDIS_TEST_LOCATION', default=urlsplit(REDIS_LOCATION)._replace(path='/15').geturl())
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -122,6 +130,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing, see `utils.hashers`
+# the hasher of the policy hashes the new passwords, the others still check the old ones and the passwords are
+# rehashed with the policy on the next login.
+PASSWORD_HASHING_POLICY = config('PASSWORD_HASHING_POLICY', default='argon2')  # argon2, scrypt or pbkdf2
+PASSWORD_HASHER_CLASSES = {
+    'argon2': 'utils.hashers.Argon2PasswordHasher',
+    'scrypt': 'utils.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'utils.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_CLASSES[PASSWORD_HASHING_POLICY],
+    *(hasher for policy, hasher in PASSWORD_HASHER_CLASSES.items() if policy != PASSWORD_HASHING_POLICY),
+]
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', cast=int, default=2)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', cast=int, default=19456)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', cast=int, default=1)
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', cast=int, default=2 ** 14)
+PASSWORD_SCRYPT_BLOCK_SIZE = config('PASSWORD_SCRYPT_BLOCK_SIZE', cast=int, default=8)
+PASSWORD_SCRYPT_PARALLELISM = config('PASSWORD_SCRYPT_PARALLELISM', cast=int, default=5)
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', cast=int, default=720000)
+# hashing runs on a pool of this many threads, 0 hashes on the request thread.
+PASSWORD_HASHING_THREADS = config('PASSWORD_HASHING_THREADS', cast=int, default=0)
+# hashes waiting for a thread of the pool, past them the login is answered with a 503.
+PASSWORD_HASHING_QUEUE = config('PASSWORD_HASHING_QUEUE', cast=int, default=64)
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -151,6 +184,89 @@ CORS_ALLOW_HEADERS = [
     # Other headers
 ]
 
+# Response cache of anonymous requests
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', cast=int, default=300)
+RESPONSE_CACHE_LOCK_TIMEOUT = config('RESPONSE_CACHE_LOCK_TIMEOUT', cast=int, default=10)
+RESPONSE_CACHE_WAIT = config('RESPONSE_CACHE_WAIT', cast=float, default=2)
+
+# Async views, see `apps.home.async_views`
+# connections of the async Redis client of each event loop, the requests wait for a free one past that.
+ASYNC_REDIS_MAX_CONNECTIONS = config('ASYNC_REDIS_MAX_CONNECTIONS', cast=int, default=50)
+
+# Pagination
+PAGINATION_COUNT_CACHE_TIMEOUT = config('PAGINATION_COUNT_CACHE_TIMEOUT', cast=int, default=30)
+PAGINATION_ESTIMATED_COUNT = config('PAGINATION_ESTIMATED_COUNT', cast=bool, default=False)
+PAGINATION_ESTIMATE_THRESHOLD = config('PAGINATION_ESTIMATE_THRESHOLD', cast=int, default=100_000)
+
+# Reply trees
+REPLY_TREE_MAX_DEPTH = config('REPLY_TREE_MAX_DEPTH', cast=int, default=20)
+REPLY_TREE_MAX_CHILDREN = config('REPLY_TREE_MAX_CHILDREN', cast=int, default=50)
+
+# Fast read path of the hot endpoints, see `apps.home.projections` and `utils.renderers.FastJSONRenderer`
+FAST_READ_PATH = config('FAST_READ_PATH', cast=bool, default=True)
+
+# Reputation
+REPUTATION_FOLD_BATCH_SIZE = config('REPUTATION_FOLD_BATCH_SIZE', cast=int, default=1000)
+REPUTATION_FOLD_INTERVAL = config('REPUTATION_FOLD_INTERVAL', cast=int, default=10)
+
+# Email outbox, see `apps.users.outbox`
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', cast=int, default=100)
+EMAIL_OUTBOX_DRAIN_DELAY = config('EMAIL_OUTBOX_DRAIN_DELAY', cast=int, default=2)
+EMAIL_OUTBOX_INTERVAL = config('EMAIL_OUTBOX_INTERVAL', cast=int, default=30)
+EMAIL_OUTBOX_LEASE = config('EMAIL_OUTBOX_LEASE', cast=int, default=300)
+EMAIL_OUTBOX_RETRY_DELAY = config('EMAIL_OUTBOX_RETRY_DELAY', cast=int, default=30)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', cast=int, default=5)
+
+# Authentication, see `apps.users.authentication` and `apps.users.blacklist`
+AUTH_CACHE_TIMEOUT = config('AUTH_CACHE_TIMEOUT', cast=int, default=300)
+AUTH_CACHE_LOCAL_TIMEOUT = config('AUTH_CACHE_LOCAL_TIMEOUT', cast=int, default=5)
+AUTH_CACHE_LOCAL_SIZE = config('AUTH_CACHE_LOCAL_SIZE', cast=int, default=10000)
+BLACKLIST_FILTER_CAPACITY = config('BLACKLIST_FILTER_CAPACITY', cast=int, default=1000000)
+BLACKLIST_FILTER_ERROR_RATE = config('BLACKLIST_FILTER_ERROR_RATE', cast=float, default=0.001)
+BLACKLIST_FILTER_INTERVAL = config('BLACKLIST_FILTER_INTERVAL', cast=int, default=3600)
+TOKEN_PURGE_BATCH_SIZE = config('TOKEN_PURGE_BATCH_SIZE', cast=int, default=5000)
+TOKEN_PURGE_INTERVAL = config('TOKEN_PURGE_INTERVAL', cast=int, default=3600)
+
+# Trending tags, see `apps.home.tags`
+TRENDING_TAGS_WINDOW = config('TRENDING_TAGS_WINDOW', cast=int, default=24)
+TRENDING_TAGS_DECAY = config('TRENDING_TAGS_DECAY', cast=float, default=0.9)
+TRENDING_TAGS_INTERVAL = config('TRENDING_TAGS_INTERVAL', cast=int, default=60)
+
+# Batch endpoints
+BATCH_MAX_SIZE = config('BATCH_MAX_SIZE', cast=int, default=1000)
+
+# Exports, see `apps.home.export`
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', cast=int, default=2000)
+EXPORT_WATERMARK_LAG = config('EXPORT_WATERMARK_LAG', cast=int, default=60)
+
+# Query profiling, see `utils.profiling`
+QUERY_PROFILING = config('QUERY_PROFILING', cast=bool, default=True)
+QUERY_PROFILING_N_PLUS_ONE = config('QUERY_PROFILING_N_PLUS_ONE', cast=int, default=5)
+QUERY_PROFILING_SLOW_REQUEST_MS = config('QUERY_PROFILING_SLOW_REQUEST_MS', cast=float, default=500)
+QUERY_PROFILING_SAMPLE_RATE = config('QUERY_PROFILING_SAMPLE_RATE', cast=float, default=0.1)
+# the header tells any client the queries and timings of the request, it is for development and internal deployments.
+QUERY_PROFILING_SERVER_TIMING = config('QUERY_PROFILING_SERVER_TIMING', cast=bool, default=False)
+QUERY_PROFILING_FLUSH_INTERVAL = config('QUERY_PROFILING_FLUSH_INTERVAL', cast=int, default=10)
+
+# Logging, the slow request traces of `utils.profiling` are one JSON object per line
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'traces': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'utils.profiling': {
+            'handlers': ['traces'],
+            'level': config('QUERY_PROFILING_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # Media Files
 MEDIA_URL = '/media/'
 
@@ -159,7 +275,7 @@ AUTH_USER_MODEL = 'users.User'
 # Rest_Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
@@ -11,3 +11,25 @@ task_serializer = 'json'
 result_serializer = 'pickle'
 accept_content = ['json', 'pickle']
 result_expire = timedelta(minutes=1)
+beat_schedule = {
+    'fold-reputation-events': {
+        'task': 'apps.users.tasks.fold_reputation_events',
+        'schedule': timedelta(seconds=config('REPUTATION_FOLD_INTERVAL', cast=int, default=10)),
+    },
+    'drain-email-outbox': {
+        'task': 'apps.users.tasks.drain_email_outbox',
+        'schedule': timedelta(seconds=config('EMAIL_OUTBOX_INTERVAL', cast=int, default=30)),
+    },
+    'rebuild-blacklist-filter': {
+        'task': 'apps.users.tasks.rebuild_blacklist_filter',
+        'schedule': timedelta(seconds=config('BLACKLIST_FILTER_INTERVAL', cast=int, default=3600)),
+    },
+    'purge-expired-tokens': {
+        'task': 'apps.users.tasks.purge_expired_tokens',
+        'schedule': timedelta(seconds=config('TOKEN_PURGE_INTERVAL', cast=int, default=3600)),
+    },
+    'rollup-trending-tags': {
+        'task': 'apps.home.tasks.rollup_trending_tags',
+        'schedule': timedelta(seconds=config('TRENDING_TAGS_INTERVAL', cast=int, default=60)),
+    },
+}
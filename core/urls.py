@@ -3,16 +3,27 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
+from apps.home import async_views as home_async_views
+from apps.users import async_views as users_async_views
+
 documents = [
     path('', SpectacularAPIView.as_view(), name='schema'),
     path('swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
 ]
 
+# async versions of the read-heavy endpoints, for the deployments served by `core.asgi`.
+async_views = [
+    path('', home_async_views.home, name='home'),
+    path('questions/<int:pk>/', home_async_views.question_detail, name='question-detail'),
+    path('users/profile/<int:id>/', users_async_views.user_profile, name='user-profile'),
+]
+
 urlpatterns = [
     path('KhatMan/', admin.site.urls),
     path('', include('apps.home.urls', namespace='home')),
     path('users/', include('apps.users.urls', namespace='users')),
+    path('async/', include((async_views, 'async'))),
     path('schema/', include(documents))
 ]
 
@@ -0,0 +1,207 @@
+import asyncio
+import pickle
+import time
+import weakref
+from functools import cache as memoize
+from hashlib import md5
+from urllib.parse import urlencode
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+@memoize
+def get_redis() -> redis.Redis:
+    """Client of the Redis server behind the default cache, for the data structures the cache API has no room for."""
+    return redis.Redis.from_url(settings.CACHES['default']['LOCATION'])
+
+
+# async clients by event loop, with the location they connect to, their connections can not be shared between loops.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """
+    Async client of the Redis server behind the default cache, for the async views.
+    Its pool holds up to ASYNC_REDIS_MAX_CONNECTIONS connections, a burst of requests does not open one each.
+    """
+    loop, location = asyncio.get_running_loop(), settings.CACHES['default']['LOCATION']
+    location_client = _async_clients.get(loop)
+    if location_client is None or location_client[0] != location:
+        pool = redis.asyncio.BlockingConnectionPool.from_url(
+            location, max_connections=settings.ASYNC_REDIS_MAX_CONNECTIONS
+        )
+        location_client = _async_clients[loop] = location, redis.asyncio.Redis(connection_pool=pool)
+    return location_client[1]
+
+
+@receiver(setting_changed)
+def reset_client(setting, **kwargs):
+    # the client is built on the location of the cache, e.g. moved by `utils.test_runner`.
+    if setting == 'CACHES':
+        get_redis.cache_clear()
+
+
+def get_version(namespace: str) -> int:
+    """Returns the current cache generation of `namespace`, cache keys built on it expire on `bump_version`."""
+    return cache.get_or_set(f'version:{namespace}', time.time_ns(), timeout=None)
+
+
+def bump_version(namespace: str) -> None:
+    """Starts a new cache generation for `namespace`, entries of older generations are left to expire."""
+    try:
+        cache.incr(f'version:{namespace}')
+    except ValueError:
+        cache.add(f'version:{namespace}', time.time_ns(), timeout=None)
+
+
+def bump_version_on_commit(namespace: str) -> None:
+    """
+    Bumps `namespace` now and once more after the current transaction commits,
+    so a reader racing the transaction can not keep its old state cached.
+    """
+    bump_version(namespace)
+    transaction.on_commit(lambda: bump_version(namespace))
+
+
+def get_response_key(request, namespace: str) -> str:
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return f'response:{namespace}:{getattr(request, "version", None)}:{digest}'
+
+
+def cached_response(request, namespace: str, build, timeout: int = None) -> Response:
+    """
+    Returns the cached data of `request` if it belongs to the current generation of `namespace`,
+    otherwise calls `build` to make the response and caches its data.
+    Only one request rebuilds an entry at a time: the others serve the stale entry meanwhile,
+    or wait for the rebuild for up to RESPONSE_CACHE_WAIT seconds when there is no entry at all.
+    """
+    timeout = settings.RESPONSE_CACHE_TIMEOUT if timeout is None else timeout
+    version = get_version(namespace)
+    key = get_response_key(request, namespace)
+    entry = cache.get(key)
+    if entry is not None and entry[0] == version:
+        return Response(data=entry[1], headers={'X-Cache': 'HIT'})
+
+    if cache.add(f'{key}:lock', 1, timeout=settings.RESPONSE_CACHE_LOCK_TIMEOUT):
+        try:
+            response = build()
+            if response.status_code == 200:
+                cache.set(key, (version, response.data), timeout=timeout)
+            response['X-Cache'] = 'MISS'
+            return response
+        finally:
+            cache.delete(f'{key}:lock')
+
+    if entry is not None:
+        return Response(data=entry[1], headers={'X-Cache': 'STALE'})
+    deadline = time.monotonic() + settings.RESPONSE_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            return Response(data=entry[1], headers={'X-Cache': 'HIT'})
+    response = build()
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def conditional_response(request, namespace: str, build) -> Response:
+    """
+    Handles conditional GETs with an ETag built on the cache generation of `namespace`:
+    answers 304 Not Modified when the client already has the current generation, otherwise calls `build`.
+    The generation is read before building, so a response is never tagged newer than its content.
+    `If-None-Match: *` matches only a resource that exists, it is answered once `build` returned 2xx.
+    """
+    etag = 'W/' + quote_etag(f'{namespace}-{request.version}-{get_version(namespace)}')
+    client_etags = parse_etags(request.headers.get('If-None-Match', '')) if request.method in ('GET', 'HEAD') else []
+    if etag in client_etags or etag[2:] in client_etags:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    response = build()
+    if '*' in client_etags and status.is_success(response.status_code):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    if response.status_code == 200:
+        response['ETag'] = etag
+    return response
+
+
+async def aget_version(namespace: str) -> int:
+    """
+    Async `get_version` on `get_async_redis`. Reads the same keys as the cache API, which stores integers as is,
+    so the generations bumped by the sync code are seen right away.
+    """
+    client = get_async_redis()
+    key = cache.make_and_validate_key(f'version:{namespace}')
+    version = await client.get(key)
+    if version is None:
+        await client.set(key, time.time_ns(), nx=True)
+        version = await client.get(key)
+    return int(version)
+
+
+def json_response(content: bytes, status: int = 200, **headers) -> HttpResponse:
+    return HttpResponse(content, status=status, content_type='application/json', headers=headers)
+
+
+async def acached_response(request, namespace: str, build, timeout: int = None) -> HttpResponse:
+    """
+    `cached_response` of the async views, `build` is a coroutine function returning a rendered response.
+    Entries are the rendered bytes, so a hit is not rendered again.
+    """
+    timeout = settings.RESPONSE_CACHE_TIMEOUT if timeout is None else timeout
+    client = get_async_redis()
+    response_key = get_response_key(request, namespace)
+    key, lock = cache.make_and_validate_key(response_key), cache.make_and_validate_key(f'{response_key}:lock')
+    # a hit costs one round trip, the generation is read along with the entry.
+    version, entry = await client.mget(cache.make_and_validate_key(f'version:{namespace}'), key)
+    version = await aget_version(namespace) if version is None else int(version)
+    entry = None if entry is None else pickle.loads(entry)
+    if entry is not None and entry[0] == version:
+        return json_response(entry[1], **{'X-Cache': 'HIT'})
+
+    if await client.set(lock, 1, nx=True, ex=settings.RESPONSE_CACHE_LOCK_TIMEOUT):
+        try:
+            response = await build()
+            if response.status_code == 200:
+                await client.set(key, pickle.dumps((version, response.content), pickle.HIGHEST_PROTOCOL), ex=timeout)
+            response['X-Cache'] = 'MISS'
+            return response
+        finally:
+            await client.delete(lock)
+
+    if entry is not None:
+        return json_response(entry[1], **{'X-Cache': 'STALE'})
+    deadline = time.monotonic() + settings.RESPONSE_CACHE_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await client.get(key)
+        entry = None if entry is None else pickle.loads(entry)
+        if entry is not None and entry[0] == version:
+            return json_response(entry[1], **{'X-Cache': 'HIT'})
+    response = await build()
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+async def aconditional_response(request, namespace: str, build) -> HttpResponse:
+    """`conditional_response` of the async views, `build` is a coroutine function."""
+    etag = 'W/' + quote_etag(f'{namespace}-{getattr(request, "version", None)}-{await aget_version(namespace)}')
+    client_etags = parse_etags(request.headers.get('If-None-Match', '')) if request.method in ('GET', 'HEAD') else []
+    if etag in client_etags or etag[2:] in client_etags:
+        return HttpResponseNotModified(headers={'ETag': etag})
+    response = await build()
+    if '*' in client_etags and status.is_success(response.status_code):
+        return HttpResponseNotModified(headers={'ETag': etag})
+    if response.status_code == 200:
+        response['ETag'] = etag
+    return response
@@ -0,0 +1,102 @@
+"""
+Password hashers of the PASSWORD_HASHING_POLICY, see the "Password hashing" settings.
+
+Their parameters are read from the settings when a password is hashed, so tuning them needs no new hasher:
+a password hashed with other parameters, or by a hasher other than the policy's, is rehashed by Django the next
+time it is checked with the right password, i.e. on login.
+
+With PASSWORD_HASHING_THREADS set, the hashing runs on a pool of that many threads. Argon2, scrypt and PBKDF2
+release the GIL while hashing, so a burst of logins hashes on at most that many cores while the waiting request
+threads sleep, and the requests that are not logins keep being served. At most PASSWORD_HASHING_QUEUE hashes wait
+for the pool, the logins past them are answered right away with a 503 instead of piling up.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_local = threading.local()
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many passwords are being checked right now, try again in a moment.'
+    default_code = 'hashing_busy'
+
+
+def mark_pool_thread():
+    # the hashers call each other, e.g. `verify` calls `encode`, the nested calls run where they are.
+    _local.in_pool = True
+
+
+@cache
+def get_pool(threads: int, queue: int) -> tuple:
+    """The pool and the semaphore bounding the hashes it runs or queues, one per configuration."""
+    pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='hashing', initializer=mark_pool_thread)
+    return pool, threading.BoundedSemaphore(threads + queue)
+
+
+def offload(func, *args, **kwargs):
+    """Calls `func` on the hashing pool and waits for its result, or calls it right here without a pool."""
+    threads = settings.PASSWORD_HASHING_THREADS
+    if not threads or getattr(_local, 'in_pool', False):
+        return func(*args, **kwargs)
+    pool, slots = get_pool(threads, settings.PASSWORD_HASHING_QUEUE)
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return pool.submit(func, *args, **kwargs).result()
+    finally:
+        slots.release()
+
+
+class OffloadedHasherMixin:
+    def encode(self, password, salt, *args, **kwargs):
+        return offload(super().encode, password, salt, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return offload(super().verify, password, encoded)
+
+
+class Argon2PasswordHasher(OffloadedHasherMixin, hashers.Argon2PasswordHasher):
+    """Argon2id, its default parameters are the first ones recommended by OWASP, far cheaper than Django's."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class ScryptPasswordHasher(OffloadedHasherMixin, hashers.ScryptPasswordHasher):
+    # a bound only, scrypt takes 128 * work_factor * block_size bytes. OpenSSL refuses over 32MB without it,
+    # a larger work factor, or a hash made with one, would fail.
+    maxmem = 1024 ** 3
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+
+class PBKDF2PasswordHasher(OffloadedHasherMixin, hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
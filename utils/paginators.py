@@ -1,14 +1,210 @@
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.response import Response
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from hashlib import md5
 from urllib.parse import urlencode
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .cache import aget_version, get_async_redis, get_version
+
+
+def estimate_count(queryset: QuerySet):
+    """
+    Reads the row count of an unfiltered queryset from the planner statistics,
+    returns None when the queryset is filtered or the database has no statistics for it.
+    """
+    if queryset.query.where or queryset.query.distinct:
+        return None
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)'
+    elif connection.vendor == 'sqlite':
+        # the first number of every index statistic is the row count of the table, filled by ANALYZE.
+        sql = "SELECT CAST(substr(stat, 1, instr(stat || ' ', ' ') - 1) AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s"
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def get_count_key(queryset: QuerySet, version: int) -> str:
+    sql, params = queryset.query.sql_with_params()
+    return f'count:{queryset.model._meta.label_lower}:{version}:{md5(f"{sql}{params}".encode()).hexdigest()}'
+
+
+async def acount(queryset: QuerySet) -> int:
+    """
+    `CachedCountPaginator.count` of the async views, on `utils.cache.get_async_redis`.
+    The cache API stores integers as is, so the entries are shared with the sync paginator.
+    """
+    if settings.PAGINATION_ESTIMATED_COUNT:
+        estimated = await sync_to_async(estimate_count)(queryset)
+        if estimated is not None and estimated >= settings.PAGINATION_ESTIMATE_THRESHOLD:
+            return estimated
+
+    client = get_async_redis()
+    key = get_count_key(queryset, await aget_version(queryset.model._meta.label_lower))
+    key = cache.make_and_validate_key(key)
+    count = await client.get(key)
+    if count is None:
+        count = await queryset.acount()
+        await client.set(key, count, ex=settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return int(count)
+
+
+class CachedCountPaginator(DjangoPaginator):
+    """
+    Django paginator which caches the count of a queryset for `PAGINATION_COUNT_CACHE_TIMEOUT` seconds.
+    Keys are built on the SQL of the queryset, so the same filters and search share one entry no matter
+    how the query string is written, and on the cache generation of the model which signals bump on writes.
+    With `PAGINATION_ESTIMATED_COUNT` enabled, large unfiltered tables are counted from the planner statistics.
+    """
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+
+        if settings.PAGINATION_ESTIMATED_COUNT:
+            estimated = estimate_count(self.object_list)
+            if estimated is not None and estimated >= settings.PAGINATION_ESTIMATE_THRESHOLD:
+                return estimated
+
+        key = get_count_key(self.object_list, get_version(self.object_list.model._meta.label_lower))
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, timeout=settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class NeatCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a composite, descending `ordering`.
+    Each cursor carries the ordering values of the row it starts after, so any page costs one index range scan.
+    """
+    page_size = 10
+    max_page_size = 20
+    page_size_query_param = 'limit'
+    ordering = ('-modified', '-created', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.reverse, position = self.decode_cursor(request, queryset.model)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+        if self.reverse:
+            queryset = queryset.reverse()
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_position_filter(self, position):
+        lookup = 'gt' if self.reverse else 'lt'
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            equal = dict(zip(self.fields[:i], position[:i]))
+            condition |= Q(**equal, **{f'{field}__{lookup}': position[i]})
+        # the redundant range on the leading field lets the database seek the index instead of scanning it.
+        return Q(**{f'{self.fields[0]}__{lookup}e': position[0]}) & condition
+
+    def decode_cursor(self, request, model=None):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return False, None
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii'), altchars=b'-_', validate=True))
+            position = [
+                model._meta.get_field(field).to_python(value) for field, value in zip(self.fields, cursor['p'])
+            ]
+            if len(position) != len(self.fields):
+                raise ValueError
+            return bool(cursor['r']), position
+        except (BinasciiError, ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        position = [obj[field] if isinstance(obj, dict) else getattr(obj, field) for field in self.fields]
+        position = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        cursor = json.dumps({'r': int(reverse), 'p': position}, separators=(',', ':'))
+        encoded = b64encode(cursor.encode('ascii'), altchars=b'-_').decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'pagination': {
+                'previous_page': self.get_previous_link(),
+                'next_page': self.get_next_link(),
+                'has_previous': self.has_previous,
+                'has_next': self.has_next,
+            },
+            'data': data
+        })
+
 
 class NeatPagination(PageNumberPagination):
+    django_paginator_class = CachedCountPaginator
     page_size = 10
     max_page_size = 20
     page_size_query_param = 'limit'
 
+    # switches to `cursor_pagination_class` when the client asks for `?pagination=cursor`.
+    cursor_pagination_class = None
+    pagination_query_param = 'pagination'
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        mode = request.query_params.get(self.pagination_query_param)
+        if self.cursor_pagination_class is not None and mode == 'cursor':
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
     def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+
         current_page = self.page.number
         paginator = self.page.paginator
 
@@ -71,6 +267,21 @@ class NeatPagination(PageNumberPagination):
             },
         }
 
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        if self.cursor_pagination_class is not None:
+            parameters += [
+                {
+                    'name': self.pagination_query_param,
+                    'required': False,
+                    'in': 'query',
+                    'description': 'Set to `cursor` to paginate with cursors instead of page numbers.',
+                    'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+                },
+                *self.cursor_pagination_class().get_schema_operation_parameters(view)[:1],
+            ]
+        return parameters
+
     def get_first_link(self):
         if self.page.number == 1:
             return None
@@ -86,3 +297,8 @@ class NeatPagination(PageNumberPagination):
         query_params = self.request.GET.copy()
         query_params['page'] = page_number
         return f'{url}?{urlencode(query_params)}'
+
+
+class FeedPagination(NeatPagination):
+    """Page number pagination which also supports `?pagination=cursor` for deep pages."""
+    cursor_pagination_class = NeatCursorPagination
@@ -0,0 +1,248 @@
+"""
+Always-on SQL profiling of the requests.
+
+`QueryProfilingMiddleware` counts the queries of every request and their time by SQL template, adds a
+`Server-Timing` header if QUERY_PROFILING_SERVER_TIMING is set, off by default as any client can read it,
+and flags N+1 patterns: a template run more than QUERY_PROFILING_N_PLUS_ONE times in one request.
+Every connection runs `profile_query`, which records into the profile of the current request held in a context
+variable, so queries are counted under WSGI and ASGI alike, including those async views run on the thread pool.
+QUERY_PROFILING_SAMPLE_RATE of the slow or flagged requests are logged as one JSON trace each to the
+`utils.profiling` logger.
+
+The counters by view are summed in process memory and added to Redis hashes every
+QUERY_PROFILING_FLUSH_INTERVAL seconds, so requests do not pay a round trip; `get_view_metrics` reads them back.
+Queries run while a streamed response is read, after the middleware returned, are not counted.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+import orjson
+import redis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from .cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = 'metrics:views'
+# counters of a view, in the order of `record`.
+COUNTERS = ('requests', 'queries', 'db_ms', 'duration_ms', 'n_plus_one', 'slow')
+# placeholder lists of `IN (%s, %s, ...)`, one template whatever their length.
+PLACEHOLDER_LIST = re.compile(r'%s(?:, %s)+')
+
+# counters by view name not flushed to Redis yet, and the time of the last flush.
+_counters = {}
+_counters_lock = threading.Lock()
+_flushed_at = time.monotonic()
+# profile of the current request, copied into the threads of `sync_to_async` and `async_to_sync` by asgiref.
+_profile = ContextVar('query_profile', default=None)
+
+
+def get_template(sql: str) -> str:
+    return PLACEHOLDER_LIST.sub('%s, ...', sql)
+
+
+class QueryProfile:
+    """`connection.execute_wrapper` recording the number and time of the queries it sees by SQL."""
+
+    def __init__(self):
+        self.count, self.time = 0, 0.0
+        # sql: [count, time], templates are only worked out when asked for.
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.time += elapsed
+            stats = self.queries.setdefault(sql, [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def get_templates(self) -> dict:
+        """Returns [count, time] by SQL template."""
+        templates = {}
+        for sql, (count, elapsed) in self.queries.items():
+            stats = templates.setdefault(get_template(sql), [0, 0.0])
+            stats[0] += count
+            stats[1] += elapsed
+        return templates
+
+    def get_repeated(self, threshold: int) -> list:
+        """Returns the (template, count) run more than `threshold` times, most repeated first."""
+        repeated = [(sql, count) for sql, (count, _) in self.get_templates().items() if count > threshold]
+        return sorted(repeated, key=lambda item: item[1], reverse=True)
+
+    def get_slowest(self, limit: int = 5) -> list:
+        """Returns the (template, count, time in ms) of the `limit` templates taking the most time."""
+        slowest = sorted(self.get_templates().items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [(sql, count, round(elapsed * 1000, 3)) for sql, (count, elapsed) in slowest]
+
+
+def profile_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection, records the query into the profile of the current request if any."""
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def install(sender=None, connection=connection, **kwargs) -> None:
+    # first of the wrappers, so the `connection.execute_wrapper` blocks of other code still pop their own.
+    if profile_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, profile_query)
+
+
+connection_created.connect(install)
+
+
+def record(view: str, *values) -> bool:
+    """
+    Adds the `COUNTERS` of a request to those of `view`,
+    returns True when QUERY_PROFILING_FLUSH_INTERVAL passed since the last `flush`.
+    """
+    with _counters_lock:
+        counters = _counters.setdefault(view, [0] * len(COUNTERS))
+        for i, value in enumerate(values):
+            counters[i] += value
+        return time.monotonic() - _flushed_at >= settings.QUERY_PROFILING_FLUSH_INTERVAL
+
+
+def flush() -> None:
+    """Adds the counters of this process to the Redis hash of their view, they are dropped if Redis is down."""
+    global _counters, _flushed_at
+    with _counters_lock:
+        counters, _counters, _flushed_at = _counters, {}, time.monotonic()
+    if not counters:
+        return
+    pipeline = get_redis().pipeline(transaction=False)
+    for view, values in counters.items():
+        pipeline.sadd(METRICS_KEY, view)
+        for counter, value in zip(COUNTERS, values):
+            if isinstance(value, float):
+                pipeline.hincrbyfloat(f'{METRICS_KEY}:{view}', counter, value)
+            else:
+                pipeline.hincrby(f'{METRICS_KEY}:{view}', counter, value)
+    try:
+        pipeline.execute()
+    except redis.RedisError:
+        logger.exception('could not flush the view metrics.')
+
+
+def get_view_metrics() -> list:
+    """Returns the counters and averages of every view, the views spending the most time on the database first."""
+    flush()
+    client = get_redis()
+    views = sorted(view.decode() for view in client.smembers(METRICS_KEY))
+    pipeline = client.pipeline(transaction=False)
+    for view in views:
+        pipeline.hgetall(f'{METRICS_KEY}:{view}')
+    metrics = []
+    for view, counters in zip(views, pipeline.execute()):
+        counters = {counter: float(counters.get(counter.encode(), 0)) for counter in COUNTERS}
+        requests = counters['requests'] or 1
+        metrics.append({
+            'view': view,
+            **{counter: int(value) for counter, value in counters.items() if not counter.endswith('_ms')},
+            'db_ms': round(counters['db_ms'], 3),
+            'avg_queries': round(counters['queries'] / requests, 2),
+            'avg_db_ms': round(counters['db_ms'] / requests, 3),
+            'avg_duration_ms': round(counters['duration_ms'] / requests, 3),
+        })
+    return sorted(metrics, key=lambda view_metrics: view_metrics['db_ms'], reverse=True)
+
+
+def reset_view_metrics() -> None:
+    global _counters
+    with _counters_lock:
+        _counters = {}
+    client = get_redis()
+    views = [view.decode() for view in client.smembers(METRICS_KEY)]
+    client.delete(METRICS_KEY, *(f'{METRICS_KEY}:{view}' for view in views))
+
+
+def format_server_timing(profile: QueryProfile, duration: float, repeated: list) -> str:
+    timings = [f'db;dur={profile.time * 1000:.3f};desc="{profile.count} queries"', f'app;dur={duration:.3f}']
+    if repeated:
+        timings.append(f'n-plus-one;desc="{len(repeated)} repeated queries"')
+    return ', '.join(timings)
+
+
+class QueryProfilingMiddleware:
+    """Profiles the queries of every request, see the module docstring. Turned off by QUERY_PROFILING."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # the connections opened before this module was imported missed `connection_created`.
+        install()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        install()
+        profile = QueryProfile()
+        token = _profile.set(profile)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _profile.reset(token)
+        if self.process(request, response, profile, start):
+            flush()
+        return response
+
+    async def __acall__(self, request):
+        profile = QueryProfile()
+        token = _profile.set(profile)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _profile.reset(token)
+        if self.process(request, response, profile, start):
+            await sync_to_async(flush, thread_sensitive=False)()
+        return response
+
+    def process(self, request, response, profile: QueryProfile, start: float) -> bool:
+        """Records, times and logs the request, returns True when the counters are due for a `flush`."""
+        duration = (time.perf_counter() - start) * 1000
+        repeated = profile.get_repeated(settings.QUERY_PROFILING_N_PLUS_ONE)
+        slow = duration >= settings.QUERY_PROFILING_SLOW_REQUEST_MS
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = resolver_match.view_name if resolver_match else 'unresolved'
+
+        due = record(view, 1, profile.count, profile.time * 1000, duration, int(bool(repeated)), int(slow))
+        if settings.QUERY_PROFILING_SERVER_TIMING:
+            response['Server-Timing'] = format_server_timing(profile, duration, repeated)
+        if (slow or repeated) and random.random() < settings.QUERY_PROFILING_SAMPLE_RATE:
+            logger.info(orjson.dumps({
+                'event': 'slow_request' if slow else 'n_plus_one',
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'duration_ms': round(duration, 3),
+                'db_ms': round(profile.time * 1000, 3),
+                'queries': profile.count,
+                'n_plus_one': [{'sql': sql, 'count': count} for sql, count in repeated],
+                'slowest': [{'sql': sql, 'count': count, 'ms': ms} for sql, count, ms in profile.get_slowest()],
+            }).decode())
+        return due
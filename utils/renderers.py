@@ -0,0 +1,27 @@
+import orjson
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renders the same bytes as `JSONRenderer` with orjson, which is several times faster than the json module.
+    Types orjson does not handle like DRF (datetimes, decimals, lazy strings...) go through DRF's encoder,
+    and anything orjson refuses, like integers above 64 bits, is rendered by `JSONRenderer` itself.
+    Floats are written in orjson's own notation (`1e16`, not `1e+16`), so only use it for payloads without floats.
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if not settings.FAST_READ_PATH or indent or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # same as JSONRenderer, these two characters are valid JSON but not valid javascript.
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -1,25 +1,34 @@
+from functools import cache
+
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
 from django.utils.html import strip_tags
 
 
-def send_link(email: str, link: str, message: str):
+@cache
+def get_link_template():
+    # compiled once per process, rendering it is all that is left for every email.
+    return get_template('activation_link.html')
+
+
+def make_link_email(email: str, link: str, message: str, connection=None) -> EmailMultiAlternatives:
     context = {
         'receiver': email,
         'Activation_link': link,
         'message': message
     }
-    template_name = 'activation_link.html'
-    convert_to_html_context = render_to_string(
-        template_name=template_name,
-        context=context,
-    )
-    plain_message = strip_tags(convert_to_html_context)
-    send_mail(
+    html_message = get_link_template().render(context)
+    mail = EmailMultiAlternatives(
         subject=message,
-        message=plain_message,
+        body=strip_tags(html_message),
         from_email=settings.EMAIL_HOST_USER,
-        recipient_list=[email],
-        html_message=convert_to_html_context,
+        to=[email],
+        connection=connection,
     )
+    mail.attach_alternative(html_message, 'text/html')
+    return mail
+
+
+def send_link(email: str, link: str, message: str):
+    make_link_email(email, link, message).send()
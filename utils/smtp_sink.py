@@ -0,0 +1,104 @@
+"""
+Local SMTP server that keeps the messages it receives in memory, a stand-in for the real one in the tests and
+benchmarks of `apps.users.outbox`. It speaks just enough SMTP for `smtplib`, without TLS or authentication.
+
+    with SMTPSink() as sink, override_settings(**sink.settings):
+        ...
+    sink.messages, sink.connections
+"""
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        time.sleep(self.server.sink.latency)
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        self.reply('220 localhost SMTP sink')
+        recipients = []
+        while line := self.rfile.readline():
+            command, _, argument = line.decode().strip().partition(' ')
+            command = command.upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipient = argument.partition(':')[2].strip('<> ')
+                if recipient in sink.reject:
+                    self.reply(sink.reject[recipient])
+                else:
+                    recipients.append(recipient)
+                    self.reply('250 OK')
+            elif command == 'DATA' and not recipients:
+                self.reply('503 No valid recipients')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while (line := self.rfile.readline()) not in (b'.\r\n', b''):
+                    lines.append(line)
+                with sink.lock:
+                    sink.messages.append(message_from_bytes(b''.join(lines)))
+                self.reply('250 OK')
+            elif command == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'NOOP':
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                break
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    SMTP server on a free local port, running in a thread while the sink is open.
+    `reject` maps the recipients to refuse to the reply they get, e.g. '451 Try again later',
+    `latency` is the seconds every reply takes, the round trip to a remote server.
+    """
+
+    def __init__(self, reject: dict = None, latency: float = 0):
+        self.reject = reject or {}
+        self.latency = latency
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    @property
+    def settings(self) -> dict:
+        """Email settings sending to the sink."""
+        return {
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': '127.0.0.1',
+            'EMAIL_PORT': self.server.server_address[1],
+            'EMAIL_HOST_USER': '',
+            'EMAIL_HOST_PASSWORD': '',
+            'EMAIL_USE_TLS': False,
+            'EMAIL_USE_SSL': False,
+        }
+
+    def __enter__(self):
+        self.server = SMTPServer(('127.0.0.1', 0), SMTPHandler)
+        self.server.sink = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
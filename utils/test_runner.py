@@ -0,0 +1,32 @@
+"""
+Test runner of the project, set as TEST_RUNNER.
+
+The tests run against the Redis database of REDIS_TEST_LOCATION instead of the one of the cache: `cache.clear()`
+flushes a whole database, which would drop the leaderboard, the trending tags and the metrics of the project.
+The benchmarks use it too, see `benchmarks.test_database`.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def use_test_redis() -> override_settings:
+    """Returns the override of the cache pointing it to REDIS_TEST_LOCATION, to `enable` and `disable`."""
+    if settings.REDIS_TEST_LOCATION == settings.CACHES['default']['LOCATION']:
+        raise ImproperlyConfigured('REDIS_TEST_LOCATION must not be the Redis database of the cache.')
+    return override_settings(CACHES={
+        **settings.CACHES,
+        'default': {**settings.CACHES['default'], 'LOCATION': settings.REDIS_TEST_LOCATION},
+    })
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_redis = use_test_redis()
+        self.test_redis.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_redis.disable()
+        super().teardown_test_environment(**kwargs)